@@ -0,0 +1,204 @@
+# futsalApp/archive.py
+import logging
+from datetime import date, datetime, time
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection, transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
+
+from .cache import DashboardCache
+from .models import ArchivedBookingMonth, Booking, BookingReminder, FacilityImage, Payment
+from .partitions import add_range_partition
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_STATUSES = ('completed', 'canceled')
+
+# Archived months are written once and only ever appended to
+ARCHIVE_PARTITION_OPTIONS = {'fillfactor': 100}
+
+# What BookingSerializer reads from a booking; images in the order the flat serializer uses
+SERIALIZER_PREFETCH = ('slot', 'customer', Prefetch('facility__images', queryset=FacilityImage.objects.order_by('pk')))
+
+# Moves one batch of finished bookings older than the cutoff, with their
+# payments, in a single statement, appending them to the JSON array of their
+# facility and month. Their reminder markers are dropped, not archived. The
+# foreign keys of Payment and BookingReminder to Booking are deferred, so
+# deleting all sides together is consistent at commit.
+ARCHIVE_SQL = """
+    WITH batch AS (
+        SELECT id FROM {booking}
+        WHERE date < %(cutoff)s AND created_at < %(cutoff_at)s AND status IN %(statuses)s
+        ORDER BY id
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    ), payments AS (
+        DELETE FROM {payment} WHERE booking_id IN (SELECT id FROM batch)
+        RETURNING *
+    ), reminders AS (
+        DELETE FROM {reminder} WHERE booking_id IN (SELECT id FROM batch)
+    ), bookings AS (
+        DELETE FROM {booking} WHERE id IN (SELECT id FROM batch)
+        RETURNING *
+    ), moved AS (
+        SELECT b.id, b.customer_id, b.facility_id, date_trunc('month', b.date)::date AS month,
+               to_jsonb(b) || jsonb_build_object(
+                   'payment', CASE WHEN p.id IS NULL THEN NULL ELSE to_jsonb(p) - 'booking_id' END
+               ) AS row
+        FROM bookings AS b LEFT JOIN payments AS p ON p.booking_id = b.id
+    ), archived AS (
+        INSERT INTO {archive} AS archive (
+            facility_id, month, customer_ids, first_id, last_id, count, bookings, archived_at
+        )
+        SELECT facility_id, month, array_agg(DISTINCT customer_id), min(id), max(id), count(*),
+               jsonb_agg(row ORDER BY id), %(now)s
+        FROM moved
+        GROUP BY facility_id, month
+        ON CONFLICT (facility_id, month) DO UPDATE SET
+            customer_ids = ARRAY(SELECT DISTINCT unnest(archive.customer_ids || EXCLUDED.customer_ids)),
+            first_id = LEAST(archive.first_id, EXCLUDED.first_id),
+            last_id = GREATEST(archive.last_id, EXCLUDED.last_id),
+            count = archive.count + EXCLUDED.count,
+            bookings = archive.bookings || EXCLUDED.bookings,
+            archived_at = EXCLUDED.archived_at
+        RETURNING facility_id
+    )
+    SELECT (SELECT count(*) FROM moved), ARRAY(SELECT DISTINCT facility_id FROM archived)
+"""
+
+
+class BookingArchive:
+    """
+    Moves completed and canceled bookings older than a cutoff out of the hot
+    Booking table into ArchivedBookingMonth rows, one per facility and month,
+    whose JSON arrays PostgreSQL stores compressed. The archive is
+    range-partitioned by year. Every batch is its own transaction and claims
+    rows with SKIP LOCKED, so archiving runs alongside normal traffic.
+    """
+
+    @staticmethod
+    def cutoff(months, today=None):
+        """First day of the month `months` months before today's month."""
+        today = today or timezone.localdate()
+        index = today.year * 12 + today.month - 1 - months
+        return date(index // 12, index % 12 + 1, 1)
+
+    @staticmethod
+    def candidates(cutoff):
+        """Bookings the archive would move for this cutoff."""
+        return Booking.objects.filter(
+            date__lt=cutoff,
+            created_at__lt=timezone.make_aware(datetime.combine(cutoff, time.min)),
+            status__in=ARCHIVED_STATUSES,
+        )
+
+    @staticmethod
+    def ensure_partitions(first_year, last_year):
+        parent = ArchivedBookingMonth._meta.db_table
+        for year in range(first_year, last_year + 1):
+            add_range_partition(
+                parent, f'{parent}_y{year}', date(year, 1, 1), date(year + 1, 1, 1), 'month',
+                ARCHIVE_PARTITION_OPTIONS,
+            )
+
+    @staticmethod
+    def run(cutoff, batch_size=None):
+        """Archive every eligible booking before the cutoff date. Returns (bookings archived, batches)."""
+        batch_size = batch_size or settings.BOOKING_ARCHIVE_BATCH_SIZE
+        oldest = BookingArchive.candidates(cutoff).order_by('date').values_list('date', flat=True).first()
+        if oldest is None:
+            return 0, 0
+        BookingArchive.ensure_partitions(oldest.year, cutoff.year)
+
+        quote = connection.ops.quote_name
+        sql = ARCHIVE_SQL.format(
+            booking=quote(Booking._meta.db_table),
+            payment=quote(Payment._meta.db_table),
+            reminder=quote(BookingReminder._meta.db_table),
+            archive=quote(ArchivedBookingMonth._meta.db_table),
+        )
+        params = {
+            'cutoff': cutoff,
+            'cutoff_at': timezone.make_aware(datetime.combine(cutoff, time.min)),
+            'statuses': ARCHIVED_STATUSES,
+            'now': timezone.now(),
+            'limit': batch_size,
+        }
+        total = batches = 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                moved, facility_ids = cursor.fetchone()
+                if moved:
+                    DashboardCache.invalidate_for_facilities(facility_ids)
+            total += moved
+            batches += 1
+            if moved < batch_size:
+                break
+        logger.info(f"Archived {total} bookings before {cutoff} in {batches} batches")
+        return total, batches
+
+
+def archived_bookings(customer=None, owner=None, facility_id=None, booking_id=None,
+                      date_from=None, date_to=None, status=None, prefetch=SERIALIZER_PREFETCH):
+    """
+    Yield the archived bookings matching the filters as unsaved Bookings, a
+    facility month at a time (months in order, ids in order within each),
+    with `prefetch` applied to every month. The filters pick the months
+    first, so only the partitions and rows that can match are read.
+    """
+    months = ArchivedBookingMonth.objects.all()
+    if customer is not None:
+        months = months.filter(customer_ids__contains=[customer.id])
+    if owner is not None:
+        months = months.filter(facility__created_by=owner)
+    if facility_id is not None:
+        months = months.filter(facility_id=facility_id)
+    if booking_id is not None:
+        months = months.filter(first_id__lte=booking_id, last_id__gte=booking_id)
+    if date_from is not None:
+        months = months.filter(month__gte=date_from.replace(day=1))
+    if date_to is not None:
+        months = months.filter(month__lte=date_to)
+
+    for rows in months.order_by('month', 'facility_id').values_list('bookings', flat=True).iterator(chunk_size=20):
+        bookings = [
+            ArchivedBookingMonth.as_booking(row) for row in sorted(rows, key=lambda row: row['id'])
+            if (customer is None or row['customer_id'] == customer.id)
+            and (booking_id is None or row['id'] == booking_id)
+            and (status is None or row['status'] == status)
+        ]
+        bookings = [
+            booking for booking in bookings
+            if (date_from is None or booking.date >= date_from) and (date_to is None or booking.date <= date_to)
+        ]
+        if prefetch:
+            prefetch_related_objects(bookings, *prefetch)
+        yield from bookings
+
+
+def get_booking(booking_id, customer, queryset=None):
+    """
+    The customer's live booking (from `queryset`, to load its relations
+    along), else its archived copy; raises Booking.DoesNotExist.
+    """
+    try:
+        return (Booking.objects.all() if queryset is None else queryset).get(id=booking_id, customer=customer)
+    except Booking.DoesNotExist:
+        booking = next(archived_bookings(customer=customer, booking_id=booking_id), None)
+        if booking is None:
+            raise
+        return booking
+
+
+def resolve(obj, path):
+    """Follow a values()-style path such as 'payment__amount' on a model instance; None if a link is missing."""
+    for name in path.split('__'):
+        try:
+            obj = getattr(obj, name)
+        except ObjectDoesNotExist:
+            return None
+        if obj is None:
+            return None
+    return obj
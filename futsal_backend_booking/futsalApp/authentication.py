@@ -0,0 +1,32 @@
+# futsalApp/authentication.py
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .tokens import decode_access_token, user_from_claims
+
+
+class JWTAuthentication(BaseAuthentication):
+    """
+    Authenticates signed access tokens: the signature is checked in-process
+    against the key named by the token's `kid`, and the user is built from
+    its claims plus its role and flags, read at most once per
+    AUTH_USER_STATE_TTL in each worker (see tokens.user_from_claims). Accepts `Bearer <token>`, and
+    `Token <token>` for clients written against Knox; opaque Knox tokens are
+    left to knox.auth.TokenAuthentication, which follows this class.
+    """
+    keywords = (b'bearer', b'token')
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() not in self.keywords:
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed("Invalid Authorization header")
+        token = auth[1].decode('latin-1')
+        if token.count('.') != 2:
+            return None  # a Knox token
+        claims = decode_access_token(token)
+        return user_from_claims(claims), claims
+
+    def authenticate_header(self, request):
+        return 'Bearer'
@@ -0,0 +1,108 @@
+# futsalApp/batch.py
+import json
+import logging
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+# Request headers a sub-request may set itself (conditional GETs); every
+# other header, the credentials included, comes from the batch request
+SUB_REQUEST_HEADERS = {
+    'if-none-match': 'HTTP_IF_NONE_MATCH',
+    'if-modified-since': 'HTTP_IF_MODIFIED_SINCE',
+}
+
+# Batch request headers that describe the batch itself, not its sub-requests
+BATCH_ONLY_META = ('CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE',
+                   'HTTP_IDEMPOTENCY_KEY')
+
+# Response headers passed back with each sub-response
+SUB_RESPONSE_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+
+def sub_request_key(url, headers=None):
+    """
+    The identity of a GET sub-request: its path, its query parameters in
+    sorted order and the headers it sets. Sub-requests with the same key get
+    the same response, so each key is only executed once.
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    headers = tuple(sorted((name.lower(), value) for name, value in (headers or {}).items()))
+    return parts.path, query, headers
+
+
+def _error(status_code, detail):
+    return {'status': status_code, 'headers': {}, 'body': {'status': 'error', 'message': detail, 'data': {}}}
+
+
+def _sub_request(request, path, query, headers):
+    """A GET HttpRequest for `path` carrying the batch request's user, host and headers."""
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = path
+    sub.META = {key: value for key, value in request.META.items() if key not in BATCH_ONLY_META}
+    sub.META.update({'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query})
+    for name, value in headers:
+        sub.META[SUB_REQUEST_HEADERS[name]] = value
+    sub.GET = QueryDict(query)
+    sub.COOKIES = request.COOKIES
+    # The batch request is authenticated once; DRF hands its user and token to the sub-request's view
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    sub.user = request.user
+    return sub
+
+
+def execute(request, path, query, headers):
+    """Run one GET sub-request in process and return its {'status', 'headers', 'body'} entry."""
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return _error(404, 'Not found')
+    if iscoroutinefunction(match.func) or getattr(match.func, 'cls', None) is None:
+        return _error(400, 'This endpoint cannot be batched')
+    sub = _sub_request(request, path, query, headers)
+    sub.resolver_match = match
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception(f"Batched GET {path} failed")
+        return _error(500, 'An unexpected error occurred')
+
+    if response.streaming:
+        response.close()
+        return _error(406, 'Streaming responses cannot be batched')
+    if isinstance(response, Response):
+        body = response.data
+    elif not response.content:
+        body = None
+    elif response.get('Content-Type', '').split(';')[0].strip() == 'application/json':
+        body = json.loads(response.content)
+    else:
+        return _error(406, 'Only JSON responses can be batched')
+    return {
+        'status': response.status_code,
+        'headers': {name: response[name] for name in SUB_RESPONSE_HEADERS if response.has_header(name)},
+        'body': body,
+    }
+
+
+def run_batch(request, sub_requests):
+    """
+    Execute GET sub-requests ({'url', 'id'?, 'headers'?}) one after another
+    within the batch request and return one entry per sub-request, in order,
+    each with its own status code. Identical sub-requests are executed once.
+    """
+    responses = {}
+    results = []
+    for index, sub_request in enumerate(sub_requests):
+        key = sub_request_key(sub_request['url'], sub_request.get('headers'))
+        if key not in responses:
+            responses[key] = execute(request, *key)
+        results.append({'id': sub_request.get('id', str(index)), **responses[key]})
+    return results
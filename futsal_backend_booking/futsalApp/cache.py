@@ -0,0 +1,105 @@
+# futsalApp/cache.py
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardCache:
+    """
+    Stale-while-revalidate cache for per-owner dashboard payloads.
+
+    Entries are keyed by (owner, period, generation) in the shared cache
+    (CACHES['default']), so every web worker and management command sees the
+    same entries and generations. Within the soft TTL an entry is served as
+    is; past it, the stale entry is still served while one refresh, claimed
+    through the cache, recomputes it on a small per-process thread pool. When
+    DASHBOARD_REFRESH_QUEUE refreshes are already waiting, the stale entry is
+    served without one and a later request retries. Booking, payment and
+    review writes bump the owner's generation, which hard-invalidates every
+    period at once. Code that writes those tables with queryset.update() must
+    call invalidate_for_facilities() itself.
+    """
+    REFRESH_LOCK_TIMEOUT = 60
+    _executor = None
+    _executor_lock = threading.Lock()
+    _pending = threading.BoundedSemaphore(settings.DASHBOARD_REFRESH_QUEUE)
+
+    @staticmethod
+    def _generation_key(owner_id):
+        return f'dashboard:generation:{owner_id}'
+
+    @staticmethod
+    def _generation(owner_id):
+        key = DashboardCache._generation_key(owner_id)
+        generation = cache.get(key)
+        if generation is None:
+            cache.add(key, time.time_ns(), timeout=None)
+            generation = cache.get(key)
+        return generation
+
+    @staticmethod
+    def _build(key, builder):
+        entry = {
+            'data': builder(),
+            'generated_at': timezone.now().isoformat(),
+            'expires_at': time.time() + settings.DASHBOARD_CACHE_SOFT_TTL,
+        }
+        cache.set(key, entry, timeout=settings.DASHBOARD_CACHE_HARD_TTL)
+        return entry
+
+    @staticmethod
+    def _refresh(key, builder):
+        try:
+            DashboardCache._build(key, builder)
+        except Exception:
+            logger.exception(f"Background dashboard refresh failed for {key}")
+        finally:
+            cache.delete(f'{key}:refreshing')
+            DashboardCache._pending.release()
+            connections.close_all()
+
+    @staticmethod
+    def _schedule_refresh(key, builder):
+        if not DashboardCache._pending.acquire(blocking=False):
+            cache.delete(f'{key}:refreshing')
+            return
+        with DashboardCache._executor_lock:
+            if DashboardCache._executor is None:
+                DashboardCache._executor = ThreadPoolExecutor(
+                    max_workers=settings.DASHBOARD_REFRESH_WORKERS, thread_name_prefix='dashboard-refresh',
+                )
+        DashboardCache._executor.submit(DashboardCache._refresh, key, builder)
+
+    @staticmethod
+    def get(owner_id, period, builder):
+        """Return a cache entry ({'data', 'generated_at', ...}) for the owner and period."""
+        key = f'dashboard:{owner_id}:{period}:{DashboardCache._generation(owner_id)}'
+        entry = cache.get(key)
+        if entry is None:
+            return DashboardCache._build(key, builder)
+        if entry['expires_at'] <= time.time() and cache.add(f'{key}:refreshing', True, DashboardCache.REFRESH_LOCK_TIMEOUT):
+            DashboardCache._schedule_refresh(key, builder)
+        return entry
+
+    @staticmethod
+    def invalidate(owner_id):
+        cache.set(DashboardCache._generation_key(owner_id), time.time_ns(), timeout=None)
+
+    @staticmethod
+    def invalidate_for_facilities(facility_ids):
+        """Invalidate the dashboards of the owners of the given facilities once the transaction commits."""
+        from .models import Facility
+
+        def invalidate():
+            owner_ids = Facility.objects.filter(pk__in=facility_ids).values_list('created_by_id', flat=True).distinct()
+            for owner_id in owner_ids:
+                DashboardCache.invalidate(owner_id)
+
+        transaction.on_commit(invalidate)
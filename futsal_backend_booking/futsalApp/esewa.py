@@ -0,0 +1,265 @@
+# futsalApp/esewa.py
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import logging
+import zlib
+from decimal import Decimal, InvalidOperation
+import requests
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .eventlog import booking_event, payment_event, record
+from .events import publish_booking_event
+from .models import Booking, Payment, PaymentCallback, TimeSlot
+from .services import BookingService
+
+logger = logging.getLogger(__name__)
+
+# A signature only vouches for the fields it names, so these must be among them
+REQUIRED_SIGNED_FIELDS = {'transaction_uuid', 'status', 'total_amount'}
+
+# Statuses eSewa reports for a transaction; only the failures may arrive unsigned
+FAILURE_STATUSES = {'PENDING', 'AMBIGUOUS', 'NOT_FOUND', 'CANCELED'}
+STATUSES = FAILURE_STATUSES | {'COMPLETE', 'FULL_REFUND', 'PARTIAL_REFUND'}
+
+
+def parse_callback(encoded):
+    """The payload of a callback: a base64-encoded JSON object. Raises ValueError."""
+    try:
+        data = json.loads(base64.b64decode(encoded, validate=True))
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid data format")
+    if not isinstance(data, dict) or not isinstance(data.get('transaction_uuid'), str):
+        raise ValueError("Invalid data format")
+    return data
+
+
+def callback_signature(data):
+    """HMAC-SHA256 over the fields listed in signed_field_names, as eSewa signs them."""
+    names = str(data.get('signed_field_names', '')).split(',')
+    message = ','.join(f"{name}={data.get(name, '')}" for name in names)
+    digest = hmac.new(settings.ESEWA_SECRET_KEY.encode('utf-8'), message.encode('utf-8'), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode('utf-8')
+
+
+def has_valid_signature(data):
+    signature = data.get('signature')
+    signed = set(str(data.get('signed_field_names', '')).split(','))
+    return (
+        isinstance(signature, str)
+        and REQUIRED_SIGNED_FIELDS <= signed
+        and hmac.compare_digest(callback_signature(data), signature)
+    )
+
+
+def record_callback(data, source):
+    """Add a verified callback to the inbox, unless its (transaction_uuid, status) is already there."""
+    PaymentCallback.objects.bulk_create([
+        PaymentCallback(
+            transaction_uuid=data['transaction_uuid'], status=str(data.get('status', ''))[:20],
+            source=source, payload=data,
+        ),
+    ], ignore_conflicts=True)
+
+
+def paid_amount(verified):
+    """The total_amount of a status check response as a Decimal, or None if it has none."""
+    try:
+        amount = Decimal(str(verified.get('total_amount')))
+    except InvalidOperation:
+        return None
+    return amount if amount.is_finite() else None
+
+
+def check_status(transaction_uuid, total_amount):
+    """Ask eSewa for the transaction's status. Raises requests.RequestException or ValueError."""
+    response = requests.get(settings.ESEWA_STATUS_CHECK_URL, params={
+        'product_code': settings.ESEWA_PRODUCT_CODE,
+        'total_amount': total_amount,
+        'transaction_uuid': transaction_uuid,
+    }, timeout=settings.ESEWA_STATUS_CHECK_TIMEOUT)
+    return response.json()
+
+
+class PaymentCallbackWorker:
+    """
+    Applies the callbacks in the PaymentCallback inbox to their payments and
+    bookings, in the order they arrived. A run holds a PostgreSQL advisory
+    lock, so only one worker applies callbacks at a time.
+
+    Applying is idempotent: a payment that is Fully Paid is never moved back
+    (a late or out-of-order failure is ignored), and a transition to the
+    state the payment is already in changes nothing. A COMPLETE callback is
+    only applied once eSewa's status check confirms it; if the check fails
+    or eSewa still reports the payment as pending, the callback is retried
+    on later runs, up to PAYMENT_CALLBACK_MAX_ATTEMPTS, and the later
+    callbacks of the same payment wait for it. The check asks about the
+    payment's own total_amount, never the one the callback claims, and a
+    confirmation for any other amount marks the payment Refund Due.
+    """
+    LOCK_KEY = zlib.crc32(b'futsalApp.payment_callbacks')
+    RETRY_STATUSES = ('PENDING', 'AMBIGUOUS')
+
+    @staticmethod
+    def run(batch_size=None):
+        """Process the pending callbacks. Returns how many were finished, or None if another worker holds the lock."""
+        batch_size = batch_size or settings.PAYMENT_CALLBACK_BATCH_SIZE
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [PaymentCallbackWorker.LOCK_KEY])
+            if not cursor.fetchone()[0]:
+                logger.info("Payment callback run skipped: another run holds the lock")
+                return None
+        finished = 0
+        waiting = set()  # payments with a callback left for a later run
+        last_id = 0
+        try:
+            while True:
+                callbacks = list(
+                    PaymentCallback.objects.filter(processed_at__isnull=True, id__gt=last_id).order_by('id')[:batch_size]
+                )
+                for callback in callbacks:
+                    last_id = callback.id
+                    if callback.transaction_uuid in waiting:
+                        continue
+                    if PaymentCallbackWorker.process(callback):
+                        finished += 1
+                    else:
+                        waiting.add(callback.transaction_uuid)
+                if len(callbacks) < batch_size:
+                    return finished
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [PaymentCallbackWorker.LOCK_KEY])
+
+    @staticmethod
+    def process(callback):
+        """Apply one callback. Returns False if it has to be retried later."""
+        verified = None
+        total_amount = Payment.objects.filter(transaction_uuid=callback.transaction_uuid).values_list('total_amount', flat=True).first()
+        if callback.status == 'COMPLETE' and total_amount is not None:
+            # The outbound call is made before any row is locked
+            try:
+                verified = check_status(callback.transaction_uuid, total_amount)
+            except (requests.RequestException, ValueError) as e:
+                return PaymentCallbackWorker._retry(callback, f"Status check failed: {e}")
+            if verified.get('status') in PaymentCallbackWorker.RETRY_STATUSES:
+                return PaymentCallbackWorker._retry(callback, f"Status check returned {verified.get('status')}")
+
+        with transaction.atomic():
+            payment = (
+                Payment.objects.select_for_update(of=('self',)).select_related('booking')
+                .filter(transaction_uuid=callback.transaction_uuid).first()
+            )
+            if payment is None:
+                result = "Payment not found"
+            elif verified is not None and verified.get('status') == 'COMPLETE':
+                result = PaymentCallbackWorker._confirm(
+                    payment, callback.payload.get('transaction_code'), verified.get('ref_id'), paid_amount(verified),
+                )
+            elif verified is not None:
+                result = PaymentCallbackWorker._release(payment, 'esewa_status_check')
+            else:
+                result = PaymentCallbackWorker._release(payment, 'esewa_failure')
+            callback.attempts += 1
+            callback.processed_at = timezone.now()
+            callback.result = result
+            callback.save(update_fields=['attempts', 'processed_at', 'result'])
+        return True
+
+    @staticmethod
+    def _retry(callback, reason):
+        callback.attempts += 1
+        callback.result = reason
+        if callback.attempts >= settings.PAYMENT_CALLBACK_MAX_ATTEMPTS:
+            logger.error(f"Giving up on payment callback {callback.id} ({callback.transaction_uuid}): {reason}")
+            callback.processed_at = timezone.now()
+        callback.save(update_fields=['attempts', 'processed_at', 'result'])
+        return callback.processed_at is not None
+
+    @staticmethod
+    def _confirm(payment, transaction_code, ref_id, amount):
+        """
+        Confirm the bookings the payment covers. Their slots are locked first,
+        as when booking, and the bookings after them; if eSewa confirmed an
+        amount other than the payment's total, if one has been canceled
+        meanwhile (the pending booking expired, say) or its slot and date have
+        been booked by someone else, nothing is confirmed and the payment is
+        marked Refund Due instead, to be refunded or settled by hand.
+        """
+        booking = payment.booking
+        if payment.payment_status == "Fully Paid":
+            return "Already confirmed"
+        if payment.payment_status == "Refund Due":
+            return "Already marked for refund"
+        covered = Booking.objects.filter(series_id=booking.series_id) if booking.series_id else Booking.objects.filter(id=booking.id)
+        slot_ids = set(covered.exclude(slot_id=None).values_list('slot_id', flat=True))
+        # Locked as booking locks them, so nobody can book them until this commits
+        list(TimeSlot.objects.select_for_update().filter(id__in=slot_ids).order_by('id').values_list('id', flat=True))
+        statuses = dict(covered.select_for_update().order_by('id').values_list('id', 'status'))
+        pairs = set(covered.values_list('slot_id', 'date'))
+        taken = Booking.objects.filter(
+            slot_id__in=slot_ids, date__in={day for _, day in pairs}, status__in=BookingService.ACTIVE_STATUSES,
+        ).exclude(id__in=statuses).values_list('slot_id', 'date')
+        if amount != payment.total_amount:
+            problem = f"eSewa confirmed {amount} rather than {payment.total_amount}"
+        elif 'canceled' in statuses.values():
+            problem = "the booking has been canceled"
+        elif pairs & set(taken):
+            problem = "the slot has been booked by someone else"
+        else:
+            problem = None
+
+        previous_payment_status, previous_status = payment.payment_status, statuses[booking.id]
+        payment.transaction_code = transaction_code
+        payment.ref_id = ref_id
+        if problem:
+            logger.warning(f"Payment {payment.transaction_uuid} completed but {problem}: marked for refund")
+            payment.payment_status = "Refund Due"
+            payment.save()
+            record(payment_event(payment, booking.facility_id, previous_payment_status, 'esewa_success'))
+            return f"Refund due: {problem}"
+        payment.payment_status = "Fully Paid"
+        payment.save()
+        booking.status = "confirmed"
+        booking.save()
+        record(
+            payment_event(payment, booking.facility_id, previous_payment_status, 'esewa_success'),
+            booking_event(booking, previous_status, 'esewa_success'),
+        )
+        if booking.series_id:
+            # The payment covers every booking of the series
+            BookingService.update_series_status(booking.series, "confirmed", source='esewa_success')
+        if booking.slot_id:
+            time_slot = booking.slot
+            time_slot.status = "booked"
+            time_slot.save()
+        publish_booking_event(booking)
+        return "Confirmed"
+
+    @staticmethod
+    def _release(payment, source):
+        booking = payment.booking
+        if payment.payment_status == "Fully Paid":
+            return "Ignored: the payment is already confirmed"
+        if payment.payment_status == "Refund Due":
+            return "Ignored: the payment is marked for refund"
+        if payment.payment_status == "Pending Payment" and booking.status in ("pending", "canceled"):
+            return "Nothing to release"
+        previous_payment_status, previous_status = payment.payment_status, booking.status
+        payment.payment_status = "Pending Payment"
+        payment.save()
+        events = [payment_event(payment, booking.facility_id, previous_payment_status, source)]
+        # A canceled booking stays canceled: its slot may have been booked by someone else since
+        if booking.status != "canceled":
+            booking.status = "pending"
+            booking.save()
+            events.append(booking_event(booking, previous_status, source))
+        record(*events)
+        if booking.series_id:
+            BookingService.update_series_status(booking.series, "pending", 'released', source=source, keep=("canceled",))
+        publish_booking_event(booking, 'released')
+        return "Released"
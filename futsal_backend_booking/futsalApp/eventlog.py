@@ -0,0 +1,90 @@
+# futsalApp/eventlog.py
+from datetime import date
+from django.utils import timezone
+
+from .models import BookingEvent
+from .partitions import add_range_partition
+
+EVENT_COLUMNS = (
+    'id', 'created_at', 'kind', 'booking_id', 'payment_id', 'facility_id',
+    'from_status', 'to_status', 'amount', 'actor_id', 'source',
+)
+
+
+def booking_event(booking, from_status, source, actor=None):
+    """Unsaved event for a booking whose status is now booking.status."""
+    return BookingEvent(
+        kind='booking',
+        booking_id=booking.id,
+        payment_id=None,
+        facility_id=booking.facility_id,
+        from_status=from_status,
+        to_status=booking.status,
+        amount=booking.price,
+        actor_id=getattr(actor, 'id', None),
+        source=source,
+    )
+
+
+def payment_event(payment, facility_id, from_status, source, actor=None):
+    """Unsaved event for a payment whose status is now payment.payment_status."""
+    return BookingEvent(
+        kind='payment',
+        booking_id=payment.booking_id,
+        payment_id=payment.id,
+        facility_id=facility_id,
+        from_status=from_status,
+        to_status=payment.payment_status,
+        amount=payment.total_amount,
+        actor_id=getattr(actor, 'id', None),
+        source=source,
+    )
+
+
+def record(*events):
+    """
+    Append events, skipping transitions that did not change the status.
+    Call it inside the transaction that makes the state change.
+    """
+    events = [event for event in events if event.from_status != event.to_status]
+    now = timezone.now()
+    for event in events:
+        event.created_at = now
+    return BookingEvent.objects.bulk_create(events)
+
+
+def events_between(start, end, kind=None, facility_id=None, booking_id=None):
+    """
+    Events with start <= created_at < end in (created_at, id) order. The
+    range prunes the scan to the partitions of the months it covers.
+    """
+    queryset = BookingEvent.objects.filter(created_at__gte=start, created_at__lt=end)
+    if kind:
+        queryset = queryset.filter(kind=kind)
+    if facility_id:
+        queryset = queryset.filter(facility_id=facility_id)
+    if booking_id:
+        queryset = queryset.filter(booking_id=booking_id)
+    return queryset.order_by('created_at', 'id')
+
+
+def _month_start(year, month):
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return date(year, month, 1)
+
+
+def ensure_partitions(months_ahead=3, today=None):
+    """
+    Create the monthly partitions from the current month up to months_ahead
+    months ahead. Returns the names of the partitions created.
+    """
+    today = today or timezone.localdate()
+    parent = BookingEvent._meta.db_table
+    created = []
+    for offset in range(months_ahead + 1):
+        low = _month_start(today.year, today.month + offset)
+        high = _month_start(today.year, today.month + offset + 1)
+        name = f'{parent}_y{low:%Y}m{low:%m}'
+        if add_range_partition(parent, name, low, high, 'created_at'):
+            created.append(name)
+    return created
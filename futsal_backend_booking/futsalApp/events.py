@@ -0,0 +1,251 @@
+# futsalApp/events.py
+import asyncio
+import json
+import select
+import threading
+import time
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils.dateparse import parse_date
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Booking status -> event emitted on the slot's (facility, date) channel
+BOOKING_STATUS_EVENTS = {
+    'pending': 'held',
+    'confirmed': 'booked',
+    'completed': 'booked',
+    'canceled': 'released',
+}
+
+
+class Subscriber:
+    __slots__ = ('loop', 'queue', 'overflowed')
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+
+class SlotEventHub:
+    """
+    In-process fan-out of slot events to SSE subscribers.
+
+    A subscriber is just a bounded asyncio.Queue owned by the event loop that
+    serves its connection, so idle subscribers cost no thread. Events can be
+    dispatched from any thread; delivery is handed to each subscriber's loop.
+    A subscriber that falls behind is dropped and told to resync.
+    """
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscriber = Subscriber(asyncio.get_running_loop(), settings.SLOT_EVENT_QUEUE_SIZE)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._channels.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._channels[channel]
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._channels.get(channel, ()))
+            return sum(len(subscribers) for subscribers in self._channels.values())
+
+    def dispatch(self, channel, event):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(self._deliver, channel, subscriber, event)
+            except RuntimeError:
+                # The subscriber's event loop is gone
+                self.unsubscribe(channel, subscriber)
+
+    def resync_all(self):
+        """Tell every subscriber to resync, e.g. after events may have been missed."""
+        with self._lock:
+            channels = {channel: list(subscribers) for channel, subscribers in self._channels.items()}
+        for channel, subscribers in channels.items():
+            for subscriber in subscribers:
+                try:
+                    subscriber.loop.call_soon_threadsafe(self._deliver, channel, subscriber, {'type': 'resync'})
+                except RuntimeError:
+                    self.unsubscribe(channel, subscriber)
+
+    def _deliver(self, channel, subscriber, event):
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            subscriber.overflowed = True
+            self.unsubscribe(channel, subscriber)
+
+
+class LocalBroker:
+    """
+    Delivers straight to the hub of the current process, so only streams
+    served by the process that made the change see it. For a single-process
+    development server and tests.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, channel, event):
+        self.hub.dispatch(channel, event)
+
+    def listen(self):
+        pass
+
+    async def wait_listening(self):
+        return True
+
+
+class PostgresBroker:
+    """
+    Forwards events between processes with PostgreSQL LISTEN/NOTIFY.
+
+    publish() sends a NOTIFY on SLOT_EVENT_PG_CHANNEL from whichever process
+    made the change: a web worker, run_booking_lifecycle or
+    process_payment_callbacks. A process serving streams starts one listener
+    thread on its first subscriber; the thread holds its own connection and
+    hands every notification to the local hub. If that connection drops,
+    events may be missed, so after reconnecting every subscriber is told to
+    resync.
+    """
+    RECONNECT_DELAY = 1  # seconds
+
+    def __init__(self, hub):
+        self.hub = hub
+        self._thread = None
+        self._lock = threading.Lock()
+        self._listening = threading.Event()
+
+    def publish(self, channel, event):
+        payload = json.dumps({'channel': channel, 'event': event}, separators=(',', ':'))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [settings.SLOT_EVENT_PG_CHANNEL, payload])
+
+    def listen(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen, name='slot-event-listener', daemon=True)
+                self._thread.start()
+
+    def _listen(self):
+        database = connections['default']
+        reconnecting = False
+        while True:
+            conn = None
+            try:
+                conn = database.get_new_connection(database.get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {database.ops.quote_name(settings.SLOT_EVENT_PG_CHANNEL)}')
+                self._listening.set()
+                if reconnecting:
+                    self.hub.resync_all()
+                while True:
+                    if select.select([conn], [], [], settings.SLOT_EVENT_KEEPALIVE)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            message = json.loads(conn.notifies.pop(0).payload)
+                            self.hub.dispatch(message['channel'], message['event'])
+                    else:
+                        # Idle: a round trip detects a dead connection
+                        with conn.cursor() as cursor:
+                            cursor.execute('SELECT 1')
+            except Exception:
+                logger.exception("Slot event listener lost its connection, reconnecting")
+                self._listening.clear()
+                reconnecting = True
+                if conn is not None:
+                    conn.close()
+                time.sleep(self.RECONNECT_DELAY)
+
+    async def wait_listening(self):
+        """Wait until LISTEN is in effect; False if it is not within SLOT_EVENT_KEEPALIVE."""
+        return await asyncio.to_thread(self._listening.wait, settings.SLOT_EVENT_KEEPALIVE)
+
+
+hub = SlotEventHub()
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.SLOT_EVENT_BROKER)(hub)
+    return _broker
+
+
+def slot_channel(facility_id, day):
+    if isinstance(day, str):
+        day = parse_date(day)
+    return f'slots:{facility_id}:{day.isoformat()}'
+
+
+def publish_booking_event(booking, event_type=None):
+    """Publish the booking's slot state change once the surrounding transaction commits."""
+    event_type = event_type or BOOKING_STATUS_EVENTS.get(booking.status)
+    if not event_type or not booking.date or not booking.slot_id:
+        return
+    channel = slot_channel(booking.facility_id, booking.date)
+    event = {
+        'type': event_type,
+        'slot_id': booking.slot_id,
+        'booking_id': booking.id,
+        'date': str(booking.date),
+    }
+    transaction.on_commit(lambda: get_broker().publish(channel, event))
+
+
+def format_sse(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def stream_slot_events(channel, load_snapshot):
+    """
+    Yield a snapshot followed by live slot events for the channel. The
+    snapshot is only read, by calling load_snapshot in a thread, once this
+    stream is subscribed and the broker is listening, so no change can fall
+    between the two; one made meanwhile may arrive as an event as well,
+    which restates what the snapshot shows.
+    """
+    broker = get_broker()
+    broker.listen()
+    subscriber = hub.subscribe(channel)
+    try:
+        if not await broker.wait_listening():
+            # Events cannot be relied on yet; the client reconnects and tries again
+            yield format_sse('resync', {})
+            return
+        yield format_sse('snapshot', await sync_to_async(load_snapshot)())
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.SLOT_EVENT_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event['type'] == 'resync':
+                yield format_sse('resync', {})
+                break
+            yield format_sse(event['type'], event)
+            if subscriber.overflowed and subscriber.queue.empty():
+                yield format_sse('resync', {})
+                break
+    finally:
+        hub.unsubscribe(channel, subscriber)
@@ -0,0 +1,149 @@
+# futsalApp/filters.py
+from decimal import Decimal, InvalidOperation
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from rest_framework import status
+from .exceptions import CustomAPIException
+from .models import Facility, TimeSlot
+
+# Bucket edges used for the capacity and price range facets: (label, lower, upper),
+# both inclusive like the capacity_*/price_* filters, so selecting a bucket
+# (price_min=1000&price_max=1499.99) returns what its count promised
+CAPACITY_BUCKETS = [
+    ('1-5', 1, 5),
+    ('6-10', 6, 10),
+    ('11-14', 11, 14),
+    ('15+', 15, None),
+]
+PRICE_BUCKETS = [  # TimeSlot.price has two decimal places, so these leave no gaps
+    ('0-999', Decimal('0'), Decimal('999.99')),
+    ('1000-1499', Decimal('1000'), Decimal('1499.99')),
+    ('1500-1999', Decimal('1500'), Decimal('1999.99')),
+    ('2000+', Decimal('2000'), None),
+]
+
+
+def priced_slots(price_min=None, price_max=None):
+    """Slots of the outer facility priced within the inclusive range, for an Exists() predicate."""
+    slots = TimeSlot.objects.filter(field=OuterRef('pk'))
+    if price_min is not None:
+        slots = slots.filter(price__gte=price_min)
+    if price_max is not None:
+        slots = slots.filter(price__lte=price_max)
+    return slots
+
+
+class FacilityFilter:
+    """
+    Applies the facility list query parameters to a queryset and computes
+    facet counts for the filtered result in a single grouped query.
+
+    Supported parameters: features (comma separated), features_match
+    (all|any), type, surface, status, capacity_min, capacity_max,
+    price_min, price_max.
+    """
+
+    def __init__(self, params):
+        self.params = params
+
+    def _get_number(self, name, cast):
+        value = self.params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            number = cast(value)
+        except (ValueError, InvalidOperation):
+            raise CustomAPIException(f"{name} must be a number", status.HTTP_400_BAD_REQUEST)
+        # Decimal reads NaN and Infinity, which no DecimalField lookup accepts
+        if isinstance(number, Decimal) and not number.is_finite():
+            raise CustomAPIException(f"{name} must be a number", status.HTTP_400_BAD_REQUEST)
+        return number
+
+    def filter_queryset(self, queryset):
+        features = [f.strip() for f in self.params.get('features', '').split(',') if f.strip()]
+        if features:
+            invalid = [f for f in features if f not in Facility.FEATURE_CHOICES]
+            if invalid:
+                raise CustomAPIException(f"Invalid feature name(s): {', '.join(invalid)}", status.HTTP_400_BAD_REQUEST)
+            match = self.params.get('features_match', 'all')
+            if match == 'all':
+                queryset = queryset.filter(features__contains=features)
+            elif match == 'any':
+                queryset = queryset.filter(features__overlap=features)
+            else:
+                raise CustomAPIException("features_match must be 'all' or 'any'", status.HTTP_400_BAD_REQUEST)
+
+        for field in ('type', 'surface', 'status'):
+            value = self.params.get(field)
+            if value:
+                queryset = queryset.filter(**{field: value})
+
+        capacity_min = self._get_number('capacity_min', int)
+        capacity_max = self._get_number('capacity_max', int)
+        if capacity_min is not None:
+            queryset = queryset.filter(capacity__gte=capacity_min)
+        if capacity_max is not None:
+            queryset = queryset.filter(capacity__lte=capacity_max)
+
+        price_min = self._get_number('price_min', Decimal)
+        price_max = self._get_number('price_max', Decimal)
+        if price_min is not None or price_max is not None:
+            queryset = queryset.filter(Exists(priced_slots(price_min, price_max)))
+        return queryset
+
+    @staticmethod
+    def _bucket_case(column, buckets):
+        whens, params = [], []
+        for label, lower, upper in buckets:
+            if upper is None:
+                whens.append(f"WHEN {column} >= %s THEN %s")
+                params.extend([lower, label])
+            else:
+                whens.append(f"WHEN {column} BETWEEN %s AND %s THEN %s")
+                params.extend([lower, upper, label])
+        return f"CASE {' '.join(whens)} END", params
+
+    def facet_counts(self, queryset):
+        """
+        Count facilities per value of every filter dimension. The filtered
+        queryset is scanned once; each row fans out into one (dimension, value)
+        pair per dimension through a lateral join and is grouped in the same query.
+
+        A facility counts towards every price bucket in which it has a slot,
+        tested with the same Exists() predicate the price_min/price_max filter
+        uses, so a bucket's count is what selecting it returns.
+        """
+        rows = queryset.order_by().values(
+            'id', 'type', 'surface', 'status', 'features', 'capacity',
+            **{
+                f'price_bucket_{position}': Exists(priced_slots(lower, upper))
+                for position, (_, lower, upper) in enumerate(PRICE_BUCKETS)
+            },
+        )
+        inner_sql, inner_params = rows.query.sql_with_params()
+        capacity_case, capacity_params = self._bucket_case('f.capacity', CAPACITY_BUCKETS)
+        price_selects = ' '.join(
+            f"UNION ALL SELECT 'price', %s WHERE f.price_bucket_{position}" for position in range(len(PRICE_BUCKETS))
+        )
+        price_params = [label for label, _, _ in PRICE_BUCKETS]
+        sql = f"""
+            SELECT facet.dimension, facet.value, COUNT(*)
+            FROM ({inner_sql}) AS f
+            CROSS JOIN LATERAL (
+                SELECT 'type', f.type
+                UNION ALL SELECT 'surface', f.surface
+                UNION ALL SELECT 'status', f.status
+                UNION ALL SELECT 'capacity', {capacity_case}
+                {price_selects}
+                UNION ALL SELECT 'features', feature FROM unnest(f.features) AS feature
+            ) AS facet(dimension, value)
+            WHERE facet.value IS NOT NULL
+            GROUP BY facet.dimension, facet.value
+            ORDER BY facet.dimension, COUNT(*) DESC, facet.value
+        """
+        facets = {dimension: {} for dimension in ('type', 'surface', 'status', 'capacity', 'price', 'features')}
+        with connection.cursor() as cursor:
+            cursor.execute(sql, (*inner_params, *capacity_params, *price_params))
+            for dimension, value, count in cursor.fetchall():
+                facets[dimension][value] = count
+        return facets
@@ -0,0 +1,275 @@
+# futsalApp/flat_serializers.py
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .serializers import BookingSerializer, FacilitySerializer, FieldSelection, ReviewSerializer, UserSerializer
+from .utils import generate_file_url
+
+# Plan entry kinds
+_VALUE, _DATETIME, _FILE, _METHOD, _NESTED, _MANY = range(6)
+
+
+def _is_iso(output_format):
+    return output_format is not None and output_format.lower() == ISO_8601
+
+
+def _decimal_converter(field):
+    places = field.decimal_places
+
+    def convert(value):
+        # Database values already carry the column scale; anything else takes DRF's quantizing path
+        if places is not None and value.as_tuple().exponent == -places:
+            return '{:f}'.format(value)
+        return field.to_representation(value)
+    return convert
+
+
+def _value_converter(field):
+    """Converter for a plain value, or None when the value is emitted as-is."""
+    if isinstance(field, serializers.DecimalField):
+        if not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) or field.localize:
+            return field.to_representation
+        return _decimal_converter(field)
+    if isinstance(field, (serializers.DateField, serializers.TimeField)):
+        default = api_settings.DATE_FORMAT if isinstance(field, serializers.DateField) else api_settings.TIME_FORMAT
+        if _is_iso(getattr(field, 'format', default)):
+            return lambda value: value.isoformat()
+        return field.to_representation
+    if isinstance(field, serializers.BooleanField):
+        return None
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.FloatField):
+        return float
+    if isinstance(field, (serializers.CharField, serializers.ChoiceField, serializers.JSONField,
+                          serializers.PrimaryKeyRelatedField)):
+        return None
+    if isinstance(field, serializers.ListField) and _value_converter(field.child) is None:
+        return list
+    raise ImproperlyConfigured(
+        f'{field.parent.__class__.__name__}.{field.field_name}: {field.__class__.__name__} has no flat converter'
+    )
+
+
+def _facility_rating(values, context):
+    rating_sum, rating_count, *histogram = values
+    return {
+        'average': round(rating_sum / rating_count, 2) if rating_count else 0,
+        'count': rating_count,
+        'histogram': {str(stars): count for stars, count in enumerate(histogram, start=1)},
+    }
+
+
+def _user_avatar(values, context):
+    name = values[0]
+    if context.request is None or not name:
+        return None
+    return context.cached_url(('avatar', name), lambda: generate_file_url(context.request, name))
+
+
+# SerializerMethodFields are code, so each one used on a flat path is mirrored
+# here as (model columns it reads, function of those values and the context).
+METHOD_FIELDS = {
+    (FacilitySerializer, 'rating'): (
+        ('rating_sum', 'rating_count', 'rating_1_count', 'rating_2_count',
+         'rating_3_count', 'rating_4_count', 'rating_5_count'),
+        _facility_rating,
+    ),
+    (UserSerializer, 'avatar'): (('avatar',), _user_avatar),
+}
+
+
+class _Context:
+    """Per-call state: the request, the active timezone and resolved media URLs."""
+
+    def __init__(self, request):
+        self.request = request
+        self.timezone = timezone.get_current_timezone()
+        self.objects = {}
+        self._urls = {}
+
+    def cached_url(self, key, build):
+        url = self._urls.get(key)
+        if url is None:
+            url = self._urls[key] = build()
+        return url
+
+    def file_url(self, name):
+        def build():
+            url = default_storage.url(name)
+            return self.request.build_absolute_uri(url) if self.request is not None else url
+        return self.cached_url(('file', name), build)
+
+    def datetime(self, value):
+        value = value.astimezone(self.timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+
+class _Plan:
+    """Flattened description of one serializer: which columns to read and how to shape them."""
+
+    def __init__(self, serializer, prefix=''):
+        self.entries = []
+        self.paths = []
+        self.many = []
+        model = serializer.Meta.model
+        for key, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            path = prefix + field.source.replace('.', '__')
+            if isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField)):
+                relation = model._meta.get_field(field.source)
+                fk = relation.field.attname
+                if isinstance(field, serializers.ManyRelatedField):
+                    child = _KeyPlan(relation.related_model, fk)
+                else:
+                    child = _Plan(field.child)
+                    child.paths.append(fk)
+                owner = prefix + relation.field.target_field.attname
+                self.paths.append(owner)
+                entry = (_MANY, key, owner, (relation.related_model, fk, child))
+                self.many.append(entry)
+            elif isinstance(field, serializers.BaseSerializer):
+                nested = _Plan(field, prefix=path + '__')
+                pk_path = path + '__' + field.Meta.model._meta.pk.attname
+                self.paths.append(pk_path)
+                self.paths.extend(nested.paths)
+                self.many.extend(nested.many)
+                entry = (_NESTED, key, pk_path, nested)
+            elif isinstance(field, serializers.SerializerMethodField):
+                try:
+                    columns, method = METHOD_FIELDS[(type(serializer), key)]
+                except KeyError:
+                    raise ImproperlyConfigured(
+                        f'{type(serializer).__name__}.{key} has no flat equivalent in METHOD_FIELDS'
+                    )
+                columns = tuple(prefix + column for column in columns)
+                self.paths.extend(columns)
+                entry = (_METHOD, key, columns, method)
+            elif isinstance(field, serializers.FileField):
+                self.paths.append(path)
+                entry = (_FILE, key, path, None)
+            elif isinstance(field, serializers.DateTimeField):
+                self.paths.append(path)
+                if _is_iso(getattr(field, 'format', api_settings.DATETIME_FORMAT)):
+                    entry = (_DATETIME, key, path, None)
+                else:
+                    entry = (_VALUE, key, path, field.to_representation)
+            else:
+                self.paths.append(path)
+                entry = (_VALUE, key, path, _value_converter(field))
+            self.entries.append(entry)
+        self.paths = list(dict.fromkeys(self.paths))
+
+    def build(self, row, context, children):
+        data = {}
+        for kind, key, path, extra in self.entries:
+            if kind == _VALUE:
+                value = row[path]
+                data[key] = value if value is None or extra is None else extra(value)
+            elif kind == _DATETIME:
+                value = row[path]
+                data[key] = None if value is None else context.datetime(value)
+            elif kind == _FILE:
+                value = row[path]
+                data[key] = context.file_url(value) if value else None
+            elif kind == _METHOD:
+                data[key] = extra([row[column] for column in path], context)
+            elif kind == _NESTED:
+                pk = row[path]
+                if pk is None:
+                    data[key] = None
+                else:
+                    # A related object repeated across rows is shaped once and shared
+                    nested = context.objects.get((extra, pk))
+                    if nested is None:
+                        nested = context.objects[extra, pk] = extra.build(row, context, children)
+                    data[key] = nested
+            else:
+                data[key] = children[key, path].get(row[path], [])
+        return data
+
+
+class _KeyPlan:
+    """Plan of a to-many relation that is output as a list of primary keys."""
+    many = ()
+
+    def __init__(self, model, fk):
+        self.pk = model._meta.pk.attname
+        self.paths = [self.pk, fk]
+
+    def build(self, row, context, children):
+        return row[self.pk]
+
+
+class FlatSerializer:
+    """
+    Read-only counterpart of a ModelSerializer for list endpoints.
+
+    The serializer's field tree is compiled once into a flat plan: nested
+    to-one serializers become joined columns of a single values() query,
+    to-many serializers one extra values() query each, and every field a
+    precomputed converter. Rows are shaped straight into dicts, so no model
+    instances or field objects are touched per row; related objects and media
+    URLs are resolved once per distinct value per call, which means nested
+    dicts may be shared between rows and must be treated as read-only. The
+    output is the same data the wrapped serializer produces for the same rows
+    and context.
+    """
+
+    # Plans compiled for ?fields= / ?expand= selections are kept up to this many
+    MAX_CACHED_PLANS = 64
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._plans = {}
+
+    @property
+    def plan(self):
+        return self.plan_for(None)
+
+    def plan_for(self, selection):
+        key = None if selection is None else selection.key
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = _Plan(self.serializer_class(selection=selection))
+            if len(self._plans) < self.MAX_CACHED_PLANS:
+                self._plans[key] = plan
+        return plan
+
+    def serialize(self, queryset, request=None, selection=None):
+        """
+        The rows of the queryset, limited to the request's ?fields= / ?expand=
+        selection unless one is passed. Relations that are left out are not
+        joined or queried at all.
+        """
+        if selection is None:
+            selection = FieldSelection.from_request(request)
+        context = _Context(request)
+        return self._serialize(self.plan_for(selection), queryset, context)
+
+    def _serialize(self, plan, queryset, context):
+        return [item for _, item in self._serialize_rows(plan, queryset, context)]
+
+    def _serialize_rows(self, plan, queryset, context):
+        rows = list(queryset.values(*plan.paths))
+        children = {}
+        for _, key, owner, (model, fk, child) in plan.many:
+            owner_ids = {row[owner] for row in rows} - {None}
+            grouped = {}
+            if owner_ids:
+                related = model._default_manager.filter(**{f'{fk}__in': owner_ids}).order_by('pk')
+                for row, item in self._serialize_rows(child, related, context):
+                    grouped.setdefault(row[fk], []).append(item)
+            children[key, owner] = grouped
+        return [(row, plan.build(row, context, children)) for row in rows]
+
+
+booking_list_serializer = FlatSerializer(BookingSerializer)
+facility_list_serializer = FlatSerializer(FacilitySerializer)
+review_list_serializer = FlatSerializer(ReviewSerializer)
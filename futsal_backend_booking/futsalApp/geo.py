@@ -0,0 +1,194 @@
+# futsalApp/geo.py
+import csv
+import heapq
+import io
+import math
+import threading
+from django.db import transaction
+from django.db.models import Max
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Subtrees this small are scanned rather than split further
+LEAF_SIZE = 8
+
+
+def _unit_vector(latitude, longitude):
+    lat, lng = math.radians(latitude), math.radians(longitude)
+    return math.cos(lat) * math.cos(lng), math.cos(lat) * math.sin(lng), math.sin(lat)
+
+
+def _chord(distance_km):
+    """Straight-line distance through the unit sphere between points distance_km apart on the surface."""
+    return 2 * math.sin(min(distance_km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def _arc_km(chord):
+    return 2 * math.asin(min(chord / 2, 1.0)) * EARTH_RADIUS_KM
+
+
+class FacilityGeoIndex:
+    """
+    KD-tree over facility locations. Points are placed on the unit sphere in
+    3D, where straight-line (chord) distance grows with great-circle
+    distance, so the tree needs no special cases for the poles or the
+    antimeridian. The tree is implicit: each subtree is a slice of the point
+    arrays with its splitting point in the middle, split along the axis on
+    which the slice is most spread out.
+    """
+
+    def __init__(self, rows):
+        points = [(*_unit_vector(latitude, longitude), facility_id) for facility_id, latitude, longitude in rows]
+        self._axes = [0] * len(points)
+        self._build(points, 0, len(points))
+        self._xs = [point[0] for point in points]
+        self._ys = [point[1] for point in points]
+        self._zs = [point[2] for point in points]
+        self._coords = (self._xs, self._ys, self._zs)
+        self._ids = [point[3] for point in points]
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _build(self, points, lo, hi):
+        # Iterative, so a degenerate input cannot exhaust the recursion limit
+        stack = [(lo, hi)]
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo <= LEAF_SIZE:
+                continue
+            part = points[lo:hi]
+            axis = max(range(3), key=lambda axis: max(p[axis] for p in part) - min(p[axis] for p in part))
+            part.sort(key=lambda point: point[axis])
+            points[lo:hi] = part
+            mid = (lo + hi) // 2
+            self._axes[mid] = axis
+            stack.append((lo, mid))
+            stack.append((mid + 1, hi))
+
+    def nearest(self, latitude, longitude, k, radius_km):
+        """Up to k (distance in km, facility id) pairs within radius_km, nearest first."""
+        if k <= 0 or not self._ids:
+            return []
+        query = _unit_vector(latitude, longitude)
+        qx, qy, qz = query
+        xs, ys, zs, ids, axes, coords = self._xs, self._ys, self._zs, self._ids, self._axes, self._coords
+        limit = _chord(radius_km) ** 2
+        heap = []  # (-squared chord, id): the worst of the best k on top
+
+        def consider(index):
+            nonlocal limit
+            dx, dy, dz = xs[index] - qx, ys[index] - qy, zs[index] - qz
+            distance = dx * dx + dy * dy + dz * dz
+            if distance <= limit:
+                if len(heap) < k:
+                    heapq.heappush(heap, (-distance, ids[index]))
+                    if len(heap) == k:
+                        limit = -heap[0][0]
+                elif distance < -heap[0][0]:
+                    heapq.heapreplace(heap, (-distance, ids[index]))
+                    limit = -heap[0][0]
+
+        # (slice, lower bound of the squared distance to any point in it)
+        stack = [(0, len(ids), 0.0)]
+        while stack:
+            lo, hi, bound = stack.pop()
+            if bound > limit:
+                continue
+            if hi - lo <= LEAF_SIZE:
+                for index in range(lo, hi):
+                    consider(index)
+                continue
+            mid = (lo + hi) // 2
+            axis = axes[mid]
+            offset = query[axis] - coords[axis][mid]
+            near, far = ((lo, mid), (mid + 1, hi)) if offset < 0 else ((mid + 1, hi), (lo, mid))
+            # Pushed first, the far side is searched last, once the near side has tightened the limit
+            stack.append((*far, max(bound, offset * offset)))
+            consider(mid)
+            stack.append((*near, bound))
+        return sorted((_arc_km(math.sqrt(-distance)), facility_id) for distance, facility_id in heap)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_geo_index():
+    """
+    Return the in-process FacilityGeoIndex of active facilities with a
+    location, rebuilding it only after a facility has changed. The version is
+    the latest Facility.updated_at, read from the database (an index lookup),
+    so every worker sees a change made by any other. A facility deleted
+    elsewhere lingers until then, but NearbyFacilityView re-reads the
+    facilities it returns and drops it.
+    """
+    global _index
+    from .models import Facility
+
+    version = Facility.objects.aggregate(latest=Max('updated_at'))['latest']
+    cached = _index
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    index = FacilityGeoIndex(
+        Facility.objects.filter(status='active', latitude__isnull=False, longitude__isnull=False)
+        .values_list('id', 'latitude', 'longitude')
+    )
+    with _index_lock:
+        _index = (version, index)
+    return index
+
+
+def invalidate_geo_index():
+    """Drop this process's index once the transaction commits; other workers see the new version."""
+    def invalidate():
+        global _index
+        with _index_lock:
+            _index = None
+
+    transaction.on_commit(invalidate)
+
+
+def nearby(latitude, longitude, radius_km, limit, keep=None):
+    """
+    Up to `limit` (distance in km, facility id) pairs within radius_km,
+    nearest first. `keep` optionally filters candidates: given a list of
+    facility ids it returns the set to keep. Candidates are fetched in
+    growing batches until enough are kept or none are left.
+    """
+    index = get_geo_index()
+    wanted = limit
+    kept = {}
+    while True:
+        candidates = index.nearest(latitude, longitude, wanted, radius_km)
+        if keep is not None:
+            undecided = [facility_id for _, facility_id in candidates if facility_id not in kept]
+            if undecided:
+                chosen = keep(undecided)
+                kept.update((facility_id, facility_id in chosen) for facility_id in undecided)
+            matches = [candidate for candidate in candidates if kept[candidate[1]]]
+        else:
+            matches = candidates
+        if len(matches) >= limit or len(candidates) < wanted:
+            return matches[:limit]
+        wanted *= 4
+
+
+def parse_locations_csv(text):
+    """
+    Read rows with id, latitude and longitude columns (lat/lng/lon are
+    accepted too) as [(facility id, latitude, longitude)].
+    """
+    locations = []
+    for line_number, row in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        try:
+            facility_id = int(row.get('id') or row.get('facility_id') or '')
+            latitude = float(row.get('latitude') or row.get('lat') or '')
+            longitude = float(row.get('longitude') or row.get('lng') or row.get('lon') or '')
+        except ValueError:
+            raise ValueError(f'Line {line_number}: id, latitude and longitude must be numbers')
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError(f'Line {line_number}: latitude/longitude out of range')
+        locations.append((facility_id, latitude, longitude))
+    return locations
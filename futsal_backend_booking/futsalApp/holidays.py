@@ -0,0 +1,206 @@
+# futsalApp/holidays.py
+import csv
+import io
+import threading
+from bisect import bisect_right
+from collections import Counter
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.dateparse import parse_date
+
+CLOSED = 'Closed'
+
+
+class HolidayIndex:
+    """
+    Sorted, non-overlapping date intervals per scope (None for calendar-wide
+    entries, else a facility id), each tagged 'holiday' or 'closure'.
+    Overlapping entries are merged when the index is built, with closures
+    winning over holidays, so a lookup is a bisect plus a walk over the
+    intervals that intersect the requested range.
+    """
+
+    def __init__(self, entries):
+        scopes = {}
+        for facility_id, start, end, kind in entries:
+            scopes.setdefault(facility_id, []).append((start, end, kind))
+        self._scopes = {scope: self._merge(intervals) for scope, intervals in scopes.items()}
+
+    @staticmethod
+    def _merge(intervals):
+        # Sweep over the interval boundaries, counting the holidays and closures
+        # that cover each stretch between two of them; closures win, and
+        # neighbouring stretches of the same kind are joined. Boundaries are
+        # ordinals so an entry ending on date.max still has somewhere to close.
+        boundaries = sorted(
+            boundary
+            for start, end, kind in intervals
+            for boundary in ((start.toordinal(), kind, 1), (end.toordinal() + 1, kind, -1))
+        )
+        active = Counter()
+        changes = []
+        for position, (ordinal, kind, delta) in enumerate(boundaries):
+            active[kind] += delta
+            if position + 1 < len(boundaries) and boundaries[position + 1][0] == ordinal:
+                continue
+            changes.append((ordinal, 'closure' if active['closure'] else 'holiday' if active['holiday'] else None))
+        merged = []
+        for (ordinal, kind), (next_ordinal, _) in zip(changes, changes[1:]):
+            if kind is None:
+                continue
+            if merged and merged[-1][2] == kind and merged[-1][1] + 1 == ordinal:
+                merged[-1][1] = next_ordinal - 1
+            else:
+                merged.append([ordinal, next_ordinal - 1, kind])
+        merged = [(date.fromordinal(start), date.fromordinal(end), kind) for start, end, kind in merged]
+        return [start for start, _, _ in merged], merged
+
+    def _kinds(self, scope, start, end, kinds):
+        index = self._scopes.get(scope)
+        if index is None:
+            return
+        starts, intervals = index
+        position = max(bisect_right(starts, start) - 1, 0)
+        for interval_start, interval_end, kind in intervals[position:]:
+            if interval_start > end:
+                break
+            day = max(interval_start, start)
+            while day <= min(interval_end, end):
+                if kinds.get(day) != 'closure':
+                    kinds[day] = kind
+                day += timedelta(days=1)
+
+    def day_types(self, start, end, facility_id=None):
+        """Map every date from start to end (inclusive) to Weekdays, Weekends, Holidays or Closed."""
+        kinds = {}
+        self._kinds(None, start, end, kinds)
+        if facility_id is not None:
+            self._kinds(facility_id, start, end, kinds)
+        resolved = {}
+        day = start
+        while day <= end:
+            kind = kinds.get(day)
+            if kind == 'closure':
+                resolved[day] = CLOSED
+            elif kind == 'holiday':
+                resolved[day] = 'Holidays'
+            else:
+                resolved[day] = 'Weekends' if day.weekday() in settings.WEEKEND_DAYS else 'Weekdays'
+            day += timedelta(days=1)
+        return resolved
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_holiday_index():
+    """
+    Return the in-process HolidayIndex, rebuilding it only after the calendar
+    has changed. The version is read from the database (the number of entries
+    and the latest updated_at), so every worker sees an edit made by any other.
+    """
+    global _index
+    from .models import Holiday
+
+    version = tuple(Holiday.objects.aggregate(count=Count('id'), latest=Max('updated_at')).values())
+    cached = _index
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    index = HolidayIndex(Holiday.objects.values_list('facility_id', 'start_date', 'end_date', 'kind'))
+    with _index_lock:
+        _index = (version, index)
+    return index
+
+
+def invalidate_holiday_index():
+    """Drop this process's index once the transaction commits; other workers see the new version."""
+    def invalidate():
+        global _index
+        with _index_lock:
+            _index = None
+
+    transaction.on_commit(invalidate)
+
+
+def resolve_day_types(start, end, facility_id=None):
+    return get_holiday_index().day_types(start, end, facility_id)
+
+
+def span_error(start, end):
+    """Why an entry from start to end cannot be stored, or None when it can."""
+    if end < start:
+        return 'end_date cannot be before start_date'
+    if (end - start).days >= settings.HOLIDAY_MAX_SPAN_DAYS:
+        return f'An entry cannot cover more than {settings.HOLIDAY_MAX_SPAN_DAYS} days'
+    return None
+
+
+def _ics_date(value):
+    # DATE (20261225) or DATE-TIME (20261225T180000Z) values; only the date matters here
+    return datetime.strptime(value[:8], '%Y%m%d').date()
+
+
+def parse_ics(text):
+    """
+    Read all-day VEVENTs from an iCalendar document as
+    [{'name', 'start_date', 'end_date'}] with inclusive end dates.
+    Recurrence rules are not expanded.
+    """
+    lines = []
+    for line in text.splitlines():
+        # Long content lines are folded onto continuation lines starting with whitespace
+        if line[:1] in (' ', '\t') and lines:
+            lines[-1] += line[1:]
+        else:
+            lines.append(line)
+
+    entries, event = [], None
+    for line in lines:
+        name, _, value = line.partition(':')
+        name = name.split(';')[0].upper()
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            event = {}
+        elif name == 'END' and value.upper() == 'VEVENT' and event is not None:
+            if 'start' not in event:
+                raise ValueError('VEVENT without DTSTART')
+            start = event['start']
+            # DTEND is exclusive for all-day events
+            end = event['end'] - timedelta(days=1) if event.get('end') and event['end'] > start else start
+            error = span_error(start, end)
+            if error:
+                raise ValueError(error)
+            entries.append({'name': event.get('summary') or 'Holiday', 'start_date': start, 'end_date': end})
+            event = None
+        elif event is not None:
+            if name == 'DTSTART':
+                event['start'] = _ics_date(value)
+            elif name == 'DTEND':
+                event['end'] = _ics_date(value)
+            elif name == 'SUMMARY':
+                event['summary'] = value.replace('\\,', ',').replace('\\;', ';').replace('\\n', ' ').strip()[:100]
+    return entries
+
+
+def parse_csv(text):
+    """
+    Read rows with name, start_date and optional end_date / kind columns as
+    [{'name', 'start_date', 'end_date'[, 'kind']}].
+    """
+    entries = []
+    for line_number, row in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        start = parse_date(row.get('start_date', ''))
+        end = parse_date(row['end_date']) if row.get('end_date') else start
+        if start is None or end is None or end < start:
+            raise ValueError(f'Line {line_number}: start_date/end_date must be YYYY-MM-DD dates in order')
+        error = span_error(start, end)
+        if error:
+            raise ValueError(f'Line {line_number}: {error}')
+        entry = {'name': (row.get('name') or 'Holiday')[:100], 'start_date': start, 'end_date': end}
+        if row.get('kind'):
+            entry['kind'] = row['kind'].lower()
+        entries.append(entry)
+    return entries
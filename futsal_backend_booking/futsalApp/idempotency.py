@@ -0,0 +1,117 @@
+# futsalApp/idempotency.py
+import functools
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+from .renderers import FastJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def request_fingerprint(request):
+    """Digest of the method, path and parsed body, to tell a retry from a different request reusing its key."""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _replay(entry):
+    response = HttpResponse(bytes(entry.response), status=entry.status_code, content_type='application/json')
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _set_lock_timeout(seconds):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('lock_timeout', %s, true)", [f'{int(seconds * 1000)}ms'])
+
+
+def idempotent(handler):
+    """
+    Makes a mutating APIView handler safe to retry with an Idempotency-Key
+    header. The first request with a key runs the handler and its response
+    is stored for IDEMPOTENCY_KEY_TTL; retries with the same key get that
+    response back (marked Idempotent-Replayed) without running it again.
+
+    The key row is inserted in the transaction the handler runs in, so a
+    duplicate arriving while the first is still running blocks on the
+    unique index until the first commits, then replays its response. If the
+    first fails (an exception or a 5xx) nothing is stored and the next retry
+    runs the handler. A duplicate that waits longer than
+    IDEMPOTENCY_WAIT_TIMEOUT is answered 409. Keys are per user; requests
+    without a key, or from anonymous users, run as usual.
+    """
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None or not request.user.is_authenticated:
+            return handler(self, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"status": "error", "message": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        fingerprint = request_fingerprint(request)
+        now = timezone.now()
+
+        with transaction.atomic():
+            _set_lock_timeout(settings.IDEMPOTENCY_WAIT_TIMEOUT)
+            try:
+                with transaction.atomic():
+                    IdempotencyKey.objects.filter(user=request.user, key=key, expires_at__lte=now).delete()
+                    entry = IdempotencyKey.objects.create(
+                        user=request.user, key=key, fingerprint=fingerprint,
+                        expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                    )
+            except IntegrityError:
+                entry = IdempotencyKey.objects.get(user=request.user, key=key)
+                if entry.fingerprint != fingerprint:
+                    return Response(
+                        {"status": "error", "message": "This Idempotency-Key was already used for a different request"},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                return _replay(entry)
+            except OperationalError:  # lock_timeout: the first request is still running
+                response = Response(
+                    {"status": "error", "message": "A request with this Idempotency-Key is still in progress"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+                response['Retry-After'] = '1'
+                return response
+            _set_lock_timeout(0)
+
+            response = handler(self, request, *args, **kwargs)
+            if response.status_code >= 500 or not isinstance(response, Response):
+                transaction.set_rollback(True)
+                return response
+            entry.status_code = response.status_code
+            entry.response = FastJSONRenderer().render(response.data)
+            entry.save(update_fields=['status_code', 'response'])
+        return response
+
+    return wrapper
+
+
+def purge_expired(batch_size=None, now=None):
+    """Delete expired keys in batches of batch_size rows; returns how many were deleted."""
+    batch_size = batch_size or settings.IDEMPOTENCY_PURGE_BATCH_SIZE
+    expired = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now())
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,166 @@
+# futsalApp/lifecycle.py
+import logging
+import time
+import zlib
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import DashboardCache
+from .eventlog import booking_event, ensure_partitions, record
+from .events import publish_booking_event
+from .models import Booking, LifecycleRun, TimeSlot
+
+logger = logging.getLogger(__name__)
+
+# Each statement claims at most %(limit)s rows with SKIP LOCKED, so a batch
+# never waits on rows a request (or another node) is holding.
+EXPIRE_PENDING_SQL = """
+    UPDATE {booking} SET status = 'canceled', updated_at = %(now)s
+    WHERE id IN (
+        SELECT id FROM {booking}
+        WHERE status = 'pending' AND created_at < %(cutoff)s
+        ORDER BY id
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, facility_id, slot_id, date, status, price
+"""
+
+COMPLETE_PAST_SQL = """
+    UPDATE {booking} SET status = 'completed', updated_at = %(now)s
+    WHERE id IN (
+        SELECT b.id FROM {booking} AS b
+        LEFT JOIN {timeslot} AS t ON t.id = b.slot_id
+        WHERE b.status = 'confirmed'
+          AND (b.date < %(today)s OR (b.date = %(today)s AND t.end_time <= %(time)s))
+        ORDER BY b.id
+        LIMIT %(limit)s
+        FOR UPDATE OF b SKIP LOCKED
+    )
+    RETURNING id, facility_id, slot_id, date, status, price
+"""
+
+# A slot stays 'booked' while any confirmed booking still holds it today or later
+RELEASE_SLOTS_SQL = """
+    UPDATE {timeslot} SET status = 'available', updated_at = %(now)s
+    WHERE id IN (
+        SELECT t.id FROM {timeslot} AS t
+        WHERE t.status = 'booked'
+          AND NOT EXISTS (
+              SELECT 1 FROM {booking} AS b
+              WHERE b.slot_id = t.id AND b.status = 'confirmed' AND b.date >= %(today)s
+          )
+        ORDER BY t.id
+        LIMIT %(limit)s
+        FOR UPDATE OF t SKIP LOCKED
+    )
+    RETURNING id, field_id
+"""
+
+
+class BookingLifecycle:
+    """
+    Periodic booking state transitions, each run as bounded set-based UPDATEs:
+
+    - pending bookings older than BOOKING_PENDING_TTL are canceled,
+    - confirmed bookings whose slot has ended are completed,
+    - time slots marked 'booked' with no upcoming confirmed booking are released.
+
+    Booking transitions are appended to the BookingEvent log batch by batch,
+    and each run creates the log's upcoming monthly partitions.
+
+    A run holds a PostgreSQL advisory lock, so concurrent runs on other nodes
+    skip instead of doing the same work twice. Every run is recorded as a
+    LifecycleRun with its counts and duration.
+    """
+    LOCK_KEY = zlib.crc32(b'futsalApp.booking_lifecycle')
+
+    @staticmethod
+    def _sql(template):
+        return template.format(
+            booking=connection.ops.quote_name(Booking._meta.db_table),
+            timeslot=connection.ops.quote_name(TimeSlot._meta.db_table),
+        )
+
+    @staticmethod
+    def _run_batches(sql, params, batch_size, on_batch):
+        total = batches = 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, {**params, 'limit': batch_size})
+                rows = cursor.fetchall()
+                if rows:
+                    on_batch(rows)
+            total += len(rows)
+            batches += 1
+            if len(rows) < batch_size:
+                return total, batches
+
+    @staticmethod
+    def _booking_batch(from_status, rows):
+        bookings = [
+            Booking(id=booking_id, facility_id=facility_id, slot_id=slot_id, date=day, status=status, price=price)
+            for booking_id, facility_id, slot_id, day, status, price in rows
+        ]
+        # Same transaction as the UPDATE, so the log never disagrees with the table
+        record(*(booking_event(booking, from_status, 'lifecycle') for booking in bookings))
+        DashboardCache.invalidate_for_facilities({booking.facility_id for booking in bookings})
+        for booking in bookings:
+            publish_booking_event(booking)
+
+    @staticmethod
+    def _slot_batch(rows):
+        DashboardCache.invalidate_for_facilities({row[1] for row in rows})
+
+    @staticmethod
+    def run(now=None, batch_size=None):
+        """Run every transition once. Returns the LifecycleRun, or None if another node holds the lock."""
+        now = now or timezone.now()
+        batch_size = batch_size or settings.LIFECYCLE_BATCH_SIZE
+        local_now = timezone.localtime(now)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [BookingLifecycle.LOCK_KEY])
+            if not cursor.fetchone()[0]:
+                logger.info("Booking lifecycle run skipped: another run holds the lock")
+                return None
+        started = time.perf_counter()
+        run = LifecycleRun(started_at=now)
+        try:
+            params = {
+                'now': now,
+                'cutoff': now - timedelta(minutes=settings.BOOKING_PENDING_TTL),
+                'today': local_now.date(),
+                'time': local_now.time(),
+            }
+            batches = 0
+            run.expired, count = BookingLifecycle._run_batches(
+                BookingLifecycle._sql(EXPIRE_PENDING_SQL), params, batch_size,
+                partial(BookingLifecycle._booking_batch, 'pending'))
+            batches += count
+            run.completed, count = BookingLifecycle._run_batches(
+                BookingLifecycle._sql(COMPLETE_PAST_SQL), params, batch_size,
+                partial(BookingLifecycle._booking_batch, 'confirmed'))
+            batches += count
+            run.released, count = BookingLifecycle._run_batches(
+                BookingLifecycle._sql(RELEASE_SLOTS_SQL), params, batch_size, BookingLifecycle._slot_batch)
+            batches += count
+            run.batches = batches
+            # Keep the event log's monthly partitions created ahead of time
+            ensure_partitions(today=local_now.date())
+        except Exception as e:
+            run.error = str(e)
+            raise
+        finally:
+            run.duration_ms = int((time.perf_counter() - started) * 1000)
+            run.save()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [BookingLifecycle.LOCK_KEY])
+        logger.info(
+            f"Booking lifecycle: expired {run.expired}, completed {run.completed}, "
+            f"released {run.released} slots in {run.batches} batches ({run.duration_ms} ms)"
+        )
+        return run
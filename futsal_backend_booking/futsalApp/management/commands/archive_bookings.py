@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from futsalApp.archive import BookingArchive
+
+
+class Command(BaseCommand):
+    help = 'Move completed and canceled bookings older than --months months (and their payments) to the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=None, help='Age in months (default BOOKING_ARCHIVE_AFTER_MONTHS)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Bookings per statement (default BOOKING_ARCHIVE_BATCH_SIZE)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the bookings that would be archived')
+
+    def handle(self, *args, **options):
+        months = options['months'] or settings.BOOKING_ARCHIVE_AFTER_MONTHS
+        if months < settings.BOOKING_ARCHIVE_AFTER_MONTHS:
+            # The dashboards read the hot table only; archiving newer bookings would change their numbers
+            raise CommandError(f'--months must be at least {settings.BOOKING_ARCHIVE_AFTER_MONTHS}')
+        cutoff = BookingArchive.cutoff(months)
+        if options['dry_run']:
+            count = BookingArchive.candidates(cutoff).count()
+            self.stdout.write(f'{count} bookings before {cutoff} would be archived')
+            return
+        archived, batches = BookingArchive.run(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} bookings before {cutoff} in {batches} batches'))
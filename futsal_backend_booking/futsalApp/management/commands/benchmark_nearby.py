@@ -0,0 +1,126 @@
+import math
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from futsalApp.geo import EARTH_RADIUS_KM, get_geo_index, invalidate_geo_index
+from futsalApp.models import Facility, TimeSlot, User
+from futsalApp.views import NearbyFacilityView
+
+# (latitude, longitude, share of facilities) of the cities the synthetic facilities cluster around
+CITIES = [
+    (27.7172, 85.3240, 0.45),  # Kathmandu
+    (27.6710, 85.3240, 0.15),  # Lalitpur
+    (28.2096, 83.9856, 0.15),  # Pokhara
+    (26.4525, 87.2718, 0.10),  # Biratnagar
+    (27.6710, 84.4300, 0.05),  # Bharatpur
+]
+COUNTRY = ((26.35, 30.45), (80.05, 88.20))  # the rest are spread over Nepal's bounding box
+
+
+def haversine_km(latitude, longitude, other_latitude, other_longitude):
+    lat, lng, other_lat, other_lng = map(math.radians, (latitude, longitude, other_latitude, other_longitude))
+    h = math.sin((other_lat - lat) / 2) ** 2 + math.cos(lat) * math.cos(other_lat) * math.sin((other_lng - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark nearby facility search against a synthetic dataset: index build, KD-tree queries '
+        'against a brute-force scan, and the endpoint with and without availability (rolled back afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--facilities', type=int, default=50_000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        try:
+            with transaction.atomic():
+                rows = self.seed(rng, options['facilities'], options['batch_size'])
+                self.benchmark(rng, rows, options['queries'])
+                transaction.set_rollback(True)
+        finally:
+            # The index was built from the rolled-back rows
+            invalidate_geo_index()
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, synthetic data rolled back'))
+
+    def point(self, rng):
+        draw = rng.random()
+        for latitude, longitude, share in CITIES:
+            if draw < share:
+                return latitude + rng.gauss(0, 0.05), longitude + rng.gauss(0, 0.05)
+            draw -= share
+        return rng.uniform(*COUNTRY[0]), rng.uniform(*COUNTRY[1])
+
+    def seed(self, rng, count, batch_size):
+        started = time.perf_counter()
+        owner = User.objects.create_user(email='benchmark-nearby@example.com', name='Benchmark', role='OWNER')
+        rows = []
+        for offset in range(0, count, batch_size):
+            batch = []
+            for _ in range(min(batch_size, count - offset)):
+                latitude, longitude = self.point(rng)
+                batch.append(Facility(
+                    name='Nearby Futsal', surface='Artificial Turf', size='40x20', capacity=10, created_by=owner,
+                    latitude=latitude, longitude=longitude,
+                    status=rng.choice(['active'] * 9 + ['maintenance']),
+                ))
+            for facility in Facility.objects.bulk_create(batch):
+                if facility.status == 'active':
+                    rows.append((facility.id, facility.latitude, facility.longitude))
+            TimeSlot.objects.bulk_create([
+                TimeSlot(field=facility, day=day, start_time=f'{hour:02}:00', end_time=f'{hour + 1:02}:00',
+                         price=1200, discounted_price=1000, created_by=owner)
+                for facility in batch for day in ('Weekdays', 'Weekends') for hour in (6, 18, 20)
+            ])
+        invalidate_geo_index()
+        self.stdout.write(f'Seeded {count} facilities ({len(rows)} active) in {time.perf_counter() - started:.1f}s')
+        return rows
+
+    def benchmark(self, rng, rows, query_count):
+        started = time.perf_counter()
+        index = get_geo_index()
+        self.stdout.write(f'Index of {len(index)} facilities built in {(time.perf_counter() - started) * 1000:.0f}ms')
+
+        queries = [(*self.point(rng), rng.choice([2, 5, 10, 25]), 20) for _ in range(query_count)]
+        tree, brute, mismatches = [], [], 0
+        for latitude, longitude, radius, limit in queries:
+            started = time.perf_counter()
+            found = index.nearest(latitude, longitude, limit, radius)
+            tree.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            scanned = sorted(
+                (distance, facility_id) for facility_id, other_latitude, other_longitude in rows
+                if (distance := haversine_km(latitude, longitude, other_latitude, other_longitude)) <= radius
+            )[:limit]
+            brute.append((time.perf_counter() - started) * 1000)
+            mismatches += [facility_id for _, facility_id in found] != [facility_id for _, facility_id in scanned]
+        self.stdout.write(f'KD-tree      p50={statistics.median(tree):8.3f}ms max={max(tree):8.3f}ms')
+        self.stdout.write(f'brute force  p50={statistics.median(brute):8.3f}ms max={max(brute):8.3f}ms')
+        self.stdout.write(f'{mismatches} of {len(queries)} queries disagreed with the brute-force scan')
+
+        view = NearbyFacilityView.as_view()
+        factory = APIRequestFactory()
+        day = timezone.localdate()
+        for label, extra in (('endpoint', {}), ('endpoint+availability', {'date': day.isoformat(), 'time': '18:30'})):
+            timings, sizes = [], []
+            for latitude, longitude, radius, limit in queries[:50]:
+                request = factory.get('/api/facilities/nearby/', {
+                    'lat': latitude, 'lng': longitude, 'radius': radius, 'limit': limit, **extra,
+                })
+                started = time.perf_counter()
+                response = view(request)
+                timings.append((time.perf_counter() - started) * 1000)
+                sizes.append(len(response.data['data']['results']))
+            self.stdout.write(
+                f'{label:<22} p50={statistics.median(timings):8.2f}ms max={max(timings):8.2f}ms '
+                f'results p50={statistics.median(sizes):.0f}'
+            )
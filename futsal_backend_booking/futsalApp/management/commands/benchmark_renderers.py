@@ -0,0 +1,102 @@
+import gzip
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from futsalApp import views
+from futsalApp.middleware import brotli
+from futsalApp.models import Booking, Facility, Payment, Review, TimeSlot, User
+from futsalApp.renderers import FastJSONRenderer
+
+# The ten largest payloads: (label, view, url kwargs, query params)
+ENDPOINTS = [
+    ('bookings', views.BookingListView, {}, {}),
+    ('my bookings', views.MyBookingListView, {}, {}),
+    ('dashboard', views.DashboardView, {}, {'period': 'year'}),
+    ('facilities', views.FacilityListCreateView, {}, {}),
+    ('facilities + facets', views.FacilityListCreateView, {}, {'facets': 'true'}),
+    ('facility search', views.FacilitySearchView, {}, {'q': 'futsal', 'limit': 100}),
+    ('time slots', views.TimeSlotListCreateView, {}, {}),
+    ('reviews', views.ReviewListView, {}, {}),
+    ('facility reviews', views.FacilityReviewListView, {'pk': None}, {}),
+    ('facility images', views.FacilityImageListView, {}, {}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare stdlib and orjson rendering time and compressed sizes for the largest endpoints (synthetic data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=2000)
+        parser.add_argument('--reviews', type=int, default=2000)
+        parser.add_argument('--runs', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            owner, facility = self.seed(options['bookings'], options['reviews'])
+            factory = APIRequestFactory()
+            stock, fast = JSONRenderer(), FastJSONRenderer()
+            self.stdout.write(
+                f"{'endpoint':<22}{'stdlib ms':>10}{'orjson ms':>10}{'same':>6}{'raw B':>10}{'gzip B':>10}{'br B':>10}"
+            )
+            for label, view, kwargs, params in ENDPOINTS:
+                kwargs = {key: facility.id for key in kwargs}
+                request = factory.get('/', params)
+                force_authenticate(request, owner)
+                data = view.as_view()(request, **kwargs).data
+
+                stock_ms = self.time(stock.render, data, options['runs'])
+                fast_ms = self.time(fast.render, data, options['runs'])
+                body = fast.render(data)
+                same = body == stock.render(data)
+                gzip_size = len(gzip.compress(body, compresslevel=6))
+                br_size = len(brotli.compress(body, quality=5)) if brotli else '-'
+                self.stdout.write(
+                    f"{label:<22}{stock_ms:>10.2f}{fast_ms:>10.2f}{'yes' if same else 'NO':>6}"
+                    f"{len(body):>10}{gzip_size:>10}{br_size:>10}"
+                )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def time(render, data, runs):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            render(data)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def seed(self, booking_count, review_count):
+        rng = random.Random(7)
+        owner = User.objects.create_user(email='benchmark-render@example.com', name='Benchmark', role='OWNER')
+        facility = Facility.objects.create(
+            name='Benchmark Futsal Arena', surface='Artificial Turf', size='40x20', capacity=10,
+            address='Benchmark Marg, Kathmandu', features=['goals', 'lights'], created_by=owner,
+        )
+        slots = TimeSlot.objects.bulk_create([
+            TimeSlot(field=facility, start_time=f'{hour:02}:00', end_time=f'{hour + 1:02}:00',
+                     price=1200, discounted_price=1000, created_by=owner)
+            for hour in range(6, 22)
+        ])
+        bookings = Booking.objects.bulk_create([
+            Booking(customer=owner, facility=facility, slot=rng.choice(slots), email='player@example.com',
+                    phone='9800000000', date=f'2026-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}',
+                    time='18:00 - 19:00', price=1200, status=rng.choice(['pending', 'confirmed', 'completed']))
+            for _ in range(booking_count)
+        ])
+        Payment.objects.bulk_create([
+            Payment(booking=booking, amount=1200, total_amount=1200, transaction_uuid=str(uuid.uuid4()))
+            for booking in bookings
+        ])
+        Review.objects.bulk_create([
+            Review(facility=facility, user=owner, rating=rng.randint(1, 5),
+                   comment='Great futsal ground, clean showers and friendly staff. ' * rng.randint(1, 4))
+            for _ in range(review_count)
+        ])
+        return owner, facility
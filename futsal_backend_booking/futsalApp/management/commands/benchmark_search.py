@@ -0,0 +1,89 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory
+
+from futsalApp.models import Facility, Review, User
+from futsalApp.views import FacilitySearchView
+
+WORDS = [
+    'futsal', 'arena', 'turf', 'indoor', 'outdoor', 'court', 'premium', 'city', 'night', 'club',
+    'kathmandu', 'lalitpur', 'bhaktapur', 'pokhara', 'street', 'chowk', 'marg', 'tole', 'park', 'ground',
+    'great', 'clean', 'friendly', 'staff', 'lights', 'parking', 'shower', 'expensive', 'cheap', 'crowded',
+]
+SURFACES = ['Artificial Turf', 'Rubber', 'Wooden', 'Concrete', 'Natural Grass']
+TYPES = ['Indoor', 'Outdoor', 'Covered Outdoor']
+QUERIES = ['futsal', 'kathmandu turf', 'clean shower', '"night club"', 'parking -expensive']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark full-text facility and review search against a synthetic dataset (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--facilities', type=int, default=100_000)
+        parser.add_argument('--reviews', type=int, default=1_000_000)
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        with transaction.atomic():
+            self.seed(rng, options['facilities'], options['reviews'], options['batch_size'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE "futsalApp_facility", "futsalApp_review"')
+
+            view = FacilitySearchView.as_view()
+            factory = APIRequestFactory()
+            for scope in ('facilities', 'reviews'):
+                for term in QUERIES:
+                    timings = []
+                    for _ in range(options['runs']):
+                        request = factory.get('/api/facilities/search/', {'q': term, 'scope': scope})
+                        started = time.perf_counter()
+                        response = view(request)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    self.stdout.write(
+                        f"{scope:<10} q={term!r:<24} results={len(response.data['data']['results']):>3} "
+                        f"p50={statistics.median(timings):7.2f}ms max={max(timings):7.2f}ms"
+                    )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, synthetic data rolled back'))
+
+    def seed(self, rng, facility_count, review_count, batch_size):
+        owner = User.objects.create_user(email='benchmark-search@example.com', name='Benchmark', role='OWNER')
+
+        def text(words):
+            return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+        started = time.perf_counter()
+        facility_ids = []
+        for offset in range(0, facility_count, batch_size):
+            batch = [
+                Facility(
+                    name=f"{text(2).title()} Futsal",
+                    type=rng.choice(TYPES),
+                    surface=rng.choice(SURFACES),
+                    size='40x20',
+                    capacity=10,
+                    address=text(4),
+                    created_by=owner,
+                )
+                for _ in range(min(batch_size, facility_count - offset))
+            ]
+            facility_ids.extend(facility.id for facility in Facility.objects.bulk_create(batch))
+        for offset in range(0, review_count, batch_size):
+            Review.objects.bulk_create([
+                Review(
+                    facility_id=rng.choice(facility_ids),
+                    user=owner,
+                    rating=rng.randint(1, 5),
+                    comment=text(rng.randint(5, 30)),
+                )
+                for _ in range(min(batch_size, review_count - offset))
+            ])
+        self.stdout.write(
+            f"Seeded {facility_count} facilities and {review_count} reviews in {time.perf_counter() - started:.1f}s"
+        )
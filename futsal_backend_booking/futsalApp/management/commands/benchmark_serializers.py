@@ -0,0 +1,123 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from rest_framework.test import APIRequestFactory
+
+from futsalApp.flat_serializers import booking_list_serializer, facility_list_serializer, review_list_serializer
+from futsalApp.models import Booking, Facility, FacilityImage, Payment, Review, TimeSlot, User
+from futsalApp.renderers import FastJSONRenderer
+from futsalApp.serializers import BookingSerializer, FacilitySerializer, FieldSelection, ReviewSerializer, with_related
+
+
+class Command(BaseCommand):
+    help = 'Compare per-row cost and output of the DRF and flat list serializers (synthetic data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--runs', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            facility_ids = self.seed(rows)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            request = APIRequestFactory().get('/', HTTP_HOST='testserver')
+            sparse_request = APIRequestFactory().get(
+                '/?fields=id,date,time,status,facility.name&expand=facility', HTTP_HOST='testserver',
+            )
+            bookings = Booking.objects.filter(facility_id__in=facility_ids).order_by('pk')
+            # The DRF side gets the joins and prefetches it would need at best; images are
+            # ordered like the flat serializer orders them so that the outputs are comparable
+            images = Prefetch('images', queryset=FacilityImage.objects.order_by('pk'))
+            facility_images = Prefetch('facility__images', queryset=FacilityImage.objects.order_by('pk'))
+            booking_models = bookings.select_related('facility', 'customer', 'slot', 'payment').prefetch_related(facility_images)
+            facilities = Facility.objects.filter(pk__in=facility_ids).order_by('pk')
+            reviews = Review.objects.filter(facility_id__in=facility_ids).order_by('pk')
+            cases = [
+                ('bookings', BookingSerializer, booking_list_serializer, booking_models, bookings, request),
+                ('bookings (no request)', BookingSerializer, booking_list_serializer, booking_models, bookings, None),
+                ('bookings (sparse)', BookingSerializer, booking_list_serializer,
+                 with_related(bookings, BookingSerializer, FieldSelection.from_request(sparse_request)), bookings,
+                 sparse_request),
+                ('facilities', FacilitySerializer, facility_list_serializer,
+                 facilities.prefetch_related(images), facilities, request),
+                ('reviews', ReviewSerializer, review_list_serializer, reviews, reviews, request),
+            ]
+            renderer = FastJSONRenderer()
+            self.stdout.write(f"{'serializer':<24}{'rows':>8}{'drf us/row':>12}{'flat us/row':>12}{'speedup':>9}{'same':>6}{'bytes/row':>11}")
+            for label, serializer_class, flat, model_queryset, queryset, case_request in cases:
+                context = {'request': case_request} if case_request else {}
+                count = queryset.count()
+
+                def drf():
+                    return serializer_class(model_queryset.all(), many=True, context=context).data
+
+                def compiled():
+                    return flat.serialize(queryset.all(), case_request)
+
+                drf_us = self.time(drf, options['runs']) / count
+                flat_us = self.time(compiled, options['runs']) / count
+                output = renderer.render(compiled())
+                same = renderer.render(drf()) == output
+                self.stdout.write(
+                    f"{label:<24}{count:>8}{drf_us:>12.1f}{flat_us:>12.1f}{drf_us / flat_us:>8.1f}x{'yes' if same else 'NO':>6}"
+                    f"{len(output) // count:>11}"
+                )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def time(func, runs):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        return statistics.median(timings)
+
+    def seed(self, rows):
+        rng = random.Random(7)
+        customers = [
+            User.objects.create_user(
+                email=f'benchmark-serializer-{index}@example.com', name='Benchmark Player', role='USER',
+                avatar=f'avatars/player {index}.png' if index % 2 else None,
+            )
+            for index in range(20)
+        ]
+        facilities = Facility.objects.bulk_create([
+            Facility(name=f'Benchmark Arena {index}', surface='Artificial Turf', size='40x20', capacity=10,
+                     address='Benchmark Marg, Kathmandu', features=['goals', 'lights'], created_by=customers[0],
+                     thumbnail=f'facility-thumbnail/arena-{index}.jpg', rating_count=4, rating_sum=15,
+                     rating_4_count=1, rating_3_count=3)
+            for index in range(max(rows // 100, 1))
+        ])
+        FacilityImage.objects.bulk_create([
+            FacilityImage(facility=facility, image=f'facility-images/arena-{facility.id}-{index}.jpg')
+            for facility in facilities for index in range(3)
+        ])
+        slots = TimeSlot.objects.bulk_create([
+            TimeSlot(field=facility, start_time=f'{hour:02}:00', end_time=f'{hour + 1:02}:00',
+                     price=1200, discounted_price=1000, created_by=customers[0])
+            for facility in facilities for hour in range(6, 22, 4)
+        ])
+        bookings = Booking.objects.bulk_create([
+            Booking(customer=rng.choice(customers), facility=slot.field, slot=slot, email='player@example.com',
+                    phone='9800000000', date=f'2026-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}',
+                    time='18:00 - 19:00', price=1200, status=rng.choice(['pending', 'confirmed', 'completed']))
+            for slot in (rng.choice(slots) for _ in range(rows))
+        ])
+        Payment.objects.bulk_create([
+            Payment(booking=booking, amount=1200, total_amount=1200, transaction_uuid=str(uuid.uuid4()))
+            for booking in bookings[::2]
+        ])
+        Review.objects.bulk_create([
+            Review(facility=rng.choice(facilities), user=rng.choice(customers), rating=rng.randint(1, 5),
+                   comment='Great futsal ground, clean showers and friendly staff.')
+            for _ in range(rows)
+        ])
+        return [facility.id for facility in facilities]
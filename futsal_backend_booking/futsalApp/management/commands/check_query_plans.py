@@ -0,0 +1,173 @@
+import json
+import random
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from futsalApp.models import Booking, Facility, Payment, Review, TimeSlot, User
+from futsalApp.services import BookingService
+
+# Tables whose hot queries must never fall back to a sequential scan
+HOT_TABLES = {model._meta.db_table for model in (Booking, Review, TimeSlot, Payment)}
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN every hot query against a seeded dataset and fail if any of them '
+        'sequentially scans a hot table (synthetic data is rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=50000)
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the JSON plan of every query')
+        parser.add_argument('--disable-index-scans', action='store_true',
+                            help='Plan with index scans turned off, to see the check fail')
+
+    def handle(self, *args, **options):
+        failures = []
+        with transaction.atomic():
+            owner, customer, facilities, slots = self.seed(options['bookings'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+                if options['disable_index_scans']:
+                    cursor.execute('SET LOCAL enable_indexscan = off; SET LOCAL enable_bitmapscan = off')
+            self.stdout.write(f"{'query':<32}{'scans':<66} result")
+            for label, queryset in self.queries(owner, customer, facilities, slots):
+                plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+                if options['verbose_plans']:
+                    self.stdout.write(json.dumps(plan, indent=2))
+                scans = list(self.scans(plan))
+                sequential = self.sequential_scans(plan)
+                summary = ', '.join(f'{node} {index or relation}' for node, relation, index in scans if relation in HOT_TABLES)
+                self.stdout.write(f"{label:<32}{summary:<66} {'SEQ SCAN' if sequential else 'ok'}")
+                if sequential:
+                    failures.append(f"{label} ({', '.join(sequential)})")
+            transaction.set_rollback(True)
+        if failures:
+            raise CommandError(f"Sequential scans on hot tables: {'; '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('Every hot query uses an index'))
+
+    @staticmethod
+    def scans(node):
+        """Yield (node type, relation, index) for every scan node of a plan."""
+        if 'Relation Name' in node:
+            index = node.get('Index Name')
+            if node['Node Type'] == 'Bitmap Heap Scan':
+                # The indexes are on the Bitmap Index Scan nodes (possibly under BitmapAnd/Or) below
+                index = '+'.join(Command.bitmap_indexes(node))
+            yield node['Node Type'], node['Relation Name'], index
+        for child in node.get('Plans', ()):
+            yield from Command.scans(child)
+
+    @staticmethod
+    def sequential_scans(plan):
+        """The hot tables a plan scans sequentially."""
+        return [relation for node, relation, _ in Command.scans(plan) if node == 'Seq Scan' and relation in HOT_TABLES]
+
+    @staticmethod
+    def bitmap_indexes(node):
+        for child in node.get('Plans', ()):
+            if child['Node Type'] == 'Bitmap Index Scan':
+                yield child['Index Name']
+            elif child['Node Type'] in ('BitmapAnd', 'BitmapOr'):
+                yield from Command.bitmap_indexes(child)
+
+    @staticmethod
+    def queries(owner, customer, facilities, slots):
+        """The hot queries, built the way the views and services build them."""
+        now = timezone.now()
+        today = timezone.localdate()
+        owned = Facility.objects.filter(created_by=owner)
+        facility = facilities[0]
+        return [
+            ('dashboard bookings', Booking.objects.filter(
+                facility__in=owned, created_at__gte=now - timedelta(days=30), status__in=['confirmed', 'completed'],
+            ).values('price')),
+            ('dashboard previous period', Booking.objects.filter(
+                facility__in=owned, created_at__lt=now - timedelta(days=30), created_at__gte=now - timedelta(days=60),
+                status__in=['confirmed', 'completed'],
+            ).values('price')),
+            ('upcoming bookings', Booking.objects.filter(
+                facility__in=owned, date__gte=today, date__lte=today + timedelta(days=2), status__in=['pending', 'confirmed'],
+            ).order_by('date', 'time')),
+            ('customer history', Booking.objects.filter(
+                customer=customer, created_at__gte=now - timedelta(days=90),
+            ).order_by('-created_at')),
+            ('slot availability', Booking.objects.filter(
+                facility_id=facility.id, date=today, status__in=['pending', 'confirmed', 'completed'],
+            ).values_list('slot_id', 'status')),
+            ('booking conflicts', Booking.objects.filter(
+                slot_id__in=[slot.id for slot in slots[:4]], date__in=[today + timedelta(days=day) for day in range(7)],
+                status__in=BookingService.ACTIVE_STATUSES,
+            ).values_list('slot_id', 'date')),
+            ('bookings of a slot on a date', Booking.objects.filter(date=today, slot_id=slots[0].id)),
+            ('stale pending bookings', Booking.objects.filter(
+                status='pending', created_at__lt=now - timedelta(minutes=30),
+            ).order_by('id').values('id')[:500]),
+            ('confirmed bookings to close', Booking.objects.filter(status='confirmed', date__lt=today).values('id')),
+            ('bookings due a reminder', Booking.objects.filter(
+                status='confirmed', date__gte=today, date__lte=today + timedelta(days=2),
+            ).order_by('date', 'start_time').values('id')[:500]),
+            ('facility reviews', Review.objects.filter(facility_id=facility.id).order_by('-created_at')[:20]),
+            ('booked slots of a facility', TimeSlot.objects.filter(field=facility, status='booked')),
+            ('payments by status', Payment.objects.filter(payment_status='Pending Payment').order_by('created_at')),
+        ]
+
+    def seed(self, count):
+        rng = random.Random(11)
+        owner = User.objects.create_user(email='plan-check-owner@example.com', name='Plan Owner', role='OWNER')
+        other_owners = [
+            User.objects.create_user(email=f'plan-check-owner-{index}@example.com', name='Plan Owner', role='OWNER')
+            for index in range(49)
+        ]
+        customers = [
+            User.objects.create_user(email=f'plan-check-player-{index}@example.com', name='Plan Player', role='USER')
+            for index in range(500)
+        ]
+        facilities = Facility.objects.bulk_create([
+            Facility(name=f'Plan Arena {index}', surface='Artificial Turf', size='40x20', capacity=10,
+                     address='Plan Marg, Kathmandu', created_by=owner if index < 4 else other_owners[index % 49])
+            for index in range(200)
+        ])
+        slots = TimeSlot.objects.bulk_create([
+            TimeSlot(field=facility, start_time=f'{hour:02}:00', end_time=f'{hour + 1:02}:00', price=1200,
+                     discounted_price=1000, created_by=facility.created_by,
+                     status=rng.choice(['available'] * 8 + ['booked', 'unavailable']))
+            for facility in facilities for hour in range(6, 22, 2)
+        ])
+        today = timezone.localdate()
+        # Statuses as the booking lifecycle leaves them: past bookings are completed or canceled
+        upcoming = ['confirmed'] * 7 + ['pending'] + ['canceled'] * 2
+        past = ['completed'] * 6 + ['canceled']
+        bookings = []
+        for _ in range(count):
+            slot = rng.choice(slots)
+            day = today - timedelta(days=rng.randint(-14, 730))
+            bookings.append(Booking(
+                customer=rng.choice(customers), facility=slot.field, slot=slot, email='player@example.com',
+                phone='9800000000', date=day, time=f'{slot.start_time} - {slot.end_time}', start_time=slot.start_time,
+                price=1200,
+                status=rng.choice(upcoming if day >= today else past),
+            ))
+        ids = [booking.id for booking in Booking.objects.bulk_create(bookings)]
+        # Bookings are made up to two weeks before their date
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {connection.ops.quote_name(Booking._meta.db_table)} '
+                "SET created_at = LEAST(now(), date - random() * interval '14 days') WHERE id = ANY(%s)",
+                [ids],
+            )
+        Payment.objects.bulk_create([
+            Payment(booking_id=booking_id, amount=1200, total_amount=1200, transaction_uuid=str(uuid.uuid4()),
+                    payment_status='Pending Payment' if rng.random() < 0.02 else 'Fully Paid')
+            for booking_id in ids
+        ])
+        Review.objects.bulk_create([
+            Review(facility=rng.choice(facilities), user=rng.choice(customers), rating=rng.randint(1, 5),
+                   comment='Good pitch, decent lights.')
+            for _ in range(count // 5)
+        ])
+        return owner, customers[0], facilities, slots
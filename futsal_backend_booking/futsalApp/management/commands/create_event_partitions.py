@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from futsalApp.eventlog import ensure_partitions
+
+
+class Command(BaseCommand):
+    help = 'Create the booking event log partitions for the current month and the months ahead'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+
+    def handle(self, *args, **options):
+        created = ensure_partitions(options['months_ahead'])
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} partition(s) created'))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from futsalApp.geo import invalidate_geo_index, parse_locations_csv
+from futsalApp.models import Facility
+
+
+class Command(BaseCommand):
+    help = (
+        'Set facility coordinates from a CSV of id,latitude,longitude rows geocoded offline '
+        '(all rows are applied in one transaction, or none if any row is invalid)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without saving anything')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as file:
+                locations = parse_locations_csv(file.read())
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+
+        positions = {facility_id: (latitude, longitude) for facility_id, latitude, longitude in locations}
+        known = set(Facility.objects.filter(id__in=positions).values_list('id', flat=True))
+        unknown = sorted(set(positions) - known)
+        if unknown:
+            self.stderr.write(f"Skipping {len(unknown)} unknown facility id(s): {', '.join(map(str, unknown[:20]))}")
+        if options['dry_run']:
+            self.stdout.write(f'{len(known)} facilities would be located')
+            return
+
+        now = timezone.now()
+        facilities = [
+            Facility(id=facility_id, latitude=positions[facility_id][0], longitude=positions[facility_id][1], updated_at=now)
+            for facility_id in sorted(known)
+        ]
+        with transaction.atomic():
+            # bulk_update bypasses Facility.save, so the geo index is invalidated here
+            Facility.objects.bulk_update(facilities, ['latitude', 'longitude', 'updated_at'], batch_size=options['batch_size'])
+            invalidate_geo_index()
+        self.stdout.write(self.style.SUCCESS(f'Located {len(facilities)} facilities'))
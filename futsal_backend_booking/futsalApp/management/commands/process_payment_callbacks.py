@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from futsalApp.esewa import PaymentCallbackWorker
+
+
+class Command(BaseCommand):
+    help = 'Apply the recorded eSewa callbacks to their payments and bookings (once, or periodically with --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds')
+        parser.add_argument('--interval', type=int, default=None, help='Seconds between runs (default PAYMENT_CALLBACK_INTERVAL)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Callbacks read per query (default PAYMENT_CALLBACK_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or settings.PAYMENT_CALLBACK_INTERVAL
+        while True:
+            close_old_connections()
+            finished = PaymentCallbackWorker.run(batch_size=options['batch_size'])
+            if finished is None:
+                self.stdout.write(self.style.WARNING('Skipped: another worker is processing callbacks'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Processed {finished} payment callbacks'))
+            if not options['loop']:
+                return
+            time.sleep(interval)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from futsalApp.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete idempotency keys whose stored responses have expired (run periodically, e.g. hourly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows deleted per statement (default IDEMPOTENCY_PURGE_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+
+from futsalApp.models import Facility, Review
+
+# Recomputes the summary for one id range of facilities from Review in a single
+# statement, touching only rows whose stored summary has drifted.
+REPAIR_SQL = """
+    UPDATE {facility} AS f
+    SET rating_count = s.rating_count,
+        rating_sum = s.rating_sum,
+        rating_1_count = s.rating_1_count,
+        rating_2_count = s.rating_2_count,
+        rating_3_count = s.rating_3_count,
+        rating_4_count = s.rating_4_count,
+        rating_5_count = s.rating_5_count
+    FROM (
+        SELECT fa.id,
+               COUNT(r.id) AS rating_count,
+               COALESCE(SUM(r.rating), 0) AS rating_sum,
+               COUNT(r.id) FILTER (WHERE r.rating = 1) AS rating_1_count,
+               COUNT(r.id) FILTER (WHERE r.rating = 2) AS rating_2_count,
+               COUNT(r.id) FILTER (WHERE r.rating = 3) AS rating_3_count,
+               COUNT(r.id) FILTER (WHERE r.rating = 4) AS rating_4_count,
+               COUNT(r.id) FILTER (WHERE r.rating = 5) AS rating_5_count
+        FROM {facility} AS fa
+        LEFT JOIN {review} AS r ON r.facility_id = fa.id
+        WHERE fa.id >= %s AND fa.id < %s
+        GROUP BY fa.id
+    ) AS s
+    WHERE f.id = s.id
+      AND (f.rating_count, f.rating_sum, f.rating_1_count, f.rating_2_count,
+           f.rating_3_count, f.rating_4_count, f.rating_5_count)
+          IS DISTINCT FROM
+          (s.rating_count, s.rating_sum, s.rating_1_count, s.rating_2_count,
+           s.rating_3_count, s.rating_4_count, s.rating_5_count)
+"""
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized Facility rating summary from Review'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Facilities per UPDATE statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        max_id = Facility.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        sql = REPAIR_SQL.format(
+            facility=connection.ops.quote_name(Facility._meta.db_table),
+            review=connection.ops.quote_name(Review._meta.db_table),
+        )
+        repaired = 0
+        for start in range(1, max_id + 1, batch_size):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, [start, start + batch_size])
+                repaired += cursor.rowcount
+        self.stdout.write(self.style.SUCCESS(f'Repaired rating summary for {repaired} facilities'))
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from futsalApp.lifecycle import BookingLifecycle
+
+
+class Command(BaseCommand):
+    help = 'Expire stale pending bookings, complete past ones and release their slots (once, or periodically with --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds')
+        parser.add_argument('--interval', type=int, default=None, help='Seconds between runs (default LIFECYCLE_INTERVAL)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows per UPDATE (default LIFECYCLE_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or settings.LIFECYCLE_INTERVAL
+        while True:
+            close_old_connections()
+            run = BookingLifecycle.run(batch_size=options['batch_size'])
+            if run is None:
+                self.stdout.write(self.style.WARNING('Skipped: another lifecycle run is in progress'))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Expired {run.expired}, completed {run.completed}, released {run.released} slots '
+                    f'in {run.batches} batches ({run.duration_ms} ms)'
+                ))
+            if not options['loop']:
+                return
+            time.sleep(interval)
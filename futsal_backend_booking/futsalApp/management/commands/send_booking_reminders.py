@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from futsalApp.reminders import BookingReminders
+
+
+class Command(BaseCommand):
+    help = 'Email reminders for confirmed bookings starting within their booking notice (once, or periodically with --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds')
+        parser.add_argument('--interval', type=int, default=None, help='Seconds between runs (default REMINDER_INTERVAL)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Bookings per batch (default REMINDER_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or settings.REMINDER_INTERVAL
+        while True:
+            close_old_connections()
+            reminded = BookingReminders.run(batch_size=options['batch_size'])
+            if reminded is None:
+                self.stdout.write(self.style.WARNING('Skipped: another reminder run is in progress'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Sent {reminded} booking reminders'))
+            if not options['loop']:
+                return
+            time.sleep(interval)
@@ -0,0 +1,139 @@
+# futsalApp/media.py
+import mimetypes
+import os
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, HttpResponseRedirect, StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+
+from .storage import cache_control
+from .utils import is_asgi_request, streaming_body
+
+RANGE_BLOCK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """
+    The (start, end) byte offsets, inclusive, of a single-range Range header.
+    None means send the whole file (no header, or one this does not honour,
+    such as several ranges). Raises ValueError if the range cannot be satisfied.
+    """
+    units, _, spec = header.partition('=')
+    if units.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    if not first:
+        if not last.isdigit():
+            return None
+        if int(last) == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - int(last), 0), size - 1
+    if not first.isdigit() or (last and not last.isdigit()):
+        return None
+    start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(RANGE_BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def stored_content_type(name):
+    """
+    The content type a stored file is served as: that of its extension when
+    it is one of MEDIA_UPLOAD_CONTENT_TYPES (direct uploads are named after
+    their type, once Pillow has confirmed it), else application/octet-stream,
+    so no file can be served as HTML or script.
+    """
+    content_type = mimetypes.guess_type(name)[0]
+    return content_type if content_type in settings.MEDIA_UPLOAD_CONTENT_TYPES else 'application/octet-stream'
+
+
+def media_response(request, name):
+    """
+    Response delivering the media file `name` (relative to MEDIA_ROOT), once
+    the caller has authorized the request. With MEDIA_DELIVERY 'x-accel' or
+    'x-sendfile' the front proxy sends the bytes, handling ranges itself, and
+    the worker is free as soon as the headers are out. With 'django' the file
+    goes out through FileResponse, which WSGI servers with a file_wrapper
+    send with sendfile(); under ASGI it is read in blocks from a worker
+    thread as it is sent. A single byte range is honoured. Files in an
+    object storage bucket are not on local disk: the client is redirected to
+    a short-lived presigned URL instead.
+    """
+    download_url = default_storage.download_url(name)
+    if download_url:
+        response = HttpResponseRedirect(download_url)
+        response['Cache-Control'] = 'private, max-age=60'
+        return response
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("File not found")
+    if not os.path.isfile(path):
+        raise Http404("File not found")
+
+    etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+    headers = {
+        'Cache-Control': cache_control(name),
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'X-Content-Type-Options': 'nosniff',
+    }
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type = stored_content_type(name)
+    delivery = settings.MEDIA_DELIVERY
+    if delivery == 'x-accel':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(name)
+    elif delivery == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        byte_range = None
+        range_header = request.headers.get('Range')
+        # If-Range: only send a part of the file if it is still the version the client has
+        if range_header and request.headers.get('If-Range', etag) == etag:
+            try:
+                byte_range = parse_range(range_header, stat.st_size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+                return response
+        if byte_range is None and not is_asgi_request(request):
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range or (0, stat.st_size - 1)
+            # One block per thread hop, so no more than RANGE_BLOCK_SIZE is read ahead of the client
+            chunks = streaming_body(request, _read_range(path, start, end - start + 1), batch_size=1, thread_sensitive=False)
+            response = StreamingHttpResponse(chunks, status=206 if byte_range else 200, content_type=content_type)
+            if byte_range:
+                response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = end - start + 1
+    for header, value in headers.items():
+        response[header] = value
+    return response
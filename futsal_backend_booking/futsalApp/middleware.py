@@ -2,18 +2,21 @@
 from django.http import JsonResponse
 from django.core.exceptions import PermissionDenied as DjangoPermissionDenied
 from django.http import Http404
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.cache import patch_vary_headers
+from django.conf import settings
+import gzip
 import logging
 
-logger = logging.getLogger(__name__)
-
-class JSONErrorMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
 
-    def __call__(self, request):
-        response = self.get_response(request)
-        return response
+logger = logging.getLogger(__name__)
 
+# MiddlewareMixin keeps this middleware usable from both sync and async request paths
+class JSONErrorMiddleware(MiddlewareMixin):
     def process_exception(self, request, exception):
         if isinstance(exception, Http404):
             return JsonResponse({
@@ -34,4 +37,83 @@ class JSONErrorMiddleware:
                 'message': 'InternalServerError',
                 'data': {'detail': 'An unexpected error occurred'},
             }, status=500)
-        return None
\ No newline at end of file
+        return None
+
+COMPRESSIBLE_CONTENT_TYPES = ('application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses responses of at least COMPRESSION_MIN_SIZE bytes with brotli
+    or gzip, whichever the client prefers in Accept-Encoding (brotli wins ties
+    when the package is installed). Streaming responses are left alone so SSE
+    and exports are never buffered.
+
+    Compressing a secret next to input an attacker controls leaks the secret
+    through the compressed length (BREACH), so responses that may carry one
+    are sent uncompressed: those to requests with credentials (an
+    Authorization header or a session cookie), those setting cookies, and
+    those under COMPRESSION_EXCLUDED_PATHS, where tokens are issued.
+    """
+
+    @staticmethod
+    def negotiate(accept_encoding):
+        available = ['br', 'gzip'] if brotli is not None else ['gzip']
+        weights = {}
+        for item in accept_encoding.split(','):
+            name, _, params = item.strip().partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            weights[name.strip().lower()] = quality
+        best, best_quality = None, 0.0
+        for encoding in available:
+            quality = weights.get(encoding, weights.get('*', 0.0))
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    @staticmethod
+    def may_carry_secrets(request, response):
+        return bool(
+            'HTTP_AUTHORIZATION' in request.META
+            or settings.SESSION_COOKIE_NAME in request.COOKIES
+            or response.cookies
+            or request.path.startswith(settings.COMPRESSION_EXCLUDED_PATHS)
+        )
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if self.may_carry_secrets(request, response):
+            return response
+        if not 200 <= response.status_code < 300 or response.status_code == 206:
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if not (content_type.startswith('text/') or content_type in COMPRESSIBLE_CONTENT_TYPES):
+            return response
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(response.content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        # The encoded body differs byte for byte, so a strong ETag becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
\ No newline at end of file
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:26
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('futsalApp', '0002_search_vectors'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='facility',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['features'], name='facility_features_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='facility',
+            index=models.Index(fields=['status', 'type'], name='facility_status_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facility',
+            index=models.Index(fields=['status', 'surface'], name='facility_status_surface_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facility',
+            index=models.Index(fields=['status', 'capacity'], name='facility_status_capacity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['field', 'price'], name='timeslot_field_price_idx'),
+        ),
+    ]
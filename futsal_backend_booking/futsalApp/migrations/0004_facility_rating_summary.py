@@ -0,0 +1,81 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:27
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('futsalApp', '0003_facility_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facility',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='facility',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='rating',
+            field=models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)]),
+        ),
+        # Backfill the summary for existing reviews
+        migrations.RunSQL(
+            sql="""
+                UPDATE "futsalApp_facility" AS f
+                SET rating_count = s.rating_count,
+                    rating_sum = s.rating_sum,
+                    rating_1_count = s.rating_1_count,
+                    rating_2_count = s.rating_2_count,
+                    rating_3_count = s.rating_3_count,
+                    rating_4_count = s.rating_4_count,
+                    rating_5_count = s.rating_5_count
+                FROM (
+                    SELECT facility_id,
+                           COUNT(*) AS rating_count,
+                           SUM(rating) AS rating_sum,
+                           COUNT(*) FILTER (WHERE rating = 1) AS rating_1_count,
+                           COUNT(*) FILTER (WHERE rating = 2) AS rating_2_count,
+                           COUNT(*) FILTER (WHERE rating = 3) AS rating_3_count,
+                           COUNT(*) FILTER (WHERE rating = 4) AS rating_4_count,
+                           COUNT(*) FILTER (WHERE rating = 5) AS rating_5_count
+                    FROM "futsalApp_review"
+                    GROUP BY facility_id
+                ) AS s
+                WHERE f.id = s.facility_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
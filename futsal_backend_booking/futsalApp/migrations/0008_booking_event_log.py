@@ -0,0 +1,80 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:59
+
+import django.utils.timezone
+from datetime import date
+from django.db import migrations, models
+
+
+# Django cannot declare a partitioned table, so the model state is created as
+# usual while the table itself is created by hand, partitioned by month.
+CREATE_SQL = """
+    CREATE TABLE "futsalApp_bookingevent" (
+        id bigserial NOT NULL,
+        created_at timestamp with time zone NOT NULL,
+        kind varchar(20) NOT NULL,
+        booking_id bigint NOT NULL,
+        payment_id bigint NULL,
+        facility_id bigint NOT NULL,
+        from_status varchar(50) NULL,
+        to_status varchar(50) NOT NULL,
+        amount numeric(10, 2) NULL,
+        actor_id bigint NULL,
+        source varchar(50) NOT NULL,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    CREATE INDEX bookingevent_booking_idx ON "futsalApp_bookingevent" (booking_id, created_at);
+    CREATE INDEX bookingevent_facility_idx ON "futsalApp_bookingevent" (facility_id, created_at);
+    CREATE TABLE "futsalApp_bookingevent_default" PARTITION OF "futsalApp_bookingevent" DEFAULT;
+"""
+
+DROP_SQL = 'DROP TABLE "futsalApp_bookingevent" CASCADE;'
+
+
+def create_initial_partitions(apps, schema_editor):
+    # The current month and the next three; later ones come from
+    # futsalApp.eventlog.ensure_partitions, run by the lifecycle scheduler
+    today = date.today()
+    for offset in range(4):
+        year, month = today.year + (today.month - 1 + offset) // 12, (today.month - 1 + offset) % 12 + 1
+        next_year, next_month = year + month // 12, month % 12 + 1
+        schema_editor.execute(
+            f'CREATE TABLE "futsalApp_bookingevent_y{year}m{month:02}" PARTITION OF "futsalApp_bookingevent" '
+            f"FOR VALUES FROM ('{year}-{month:02}-01') TO ('{next_year}-{next_month:02}-01')"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('futsalApp', '0007_lifecycle_run'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='BookingEvent',
+                    fields=[
+                        ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                        ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                        ('kind', models.CharField(choices=[('booking', 'Booking'), ('payment', 'Payment')], max_length=20)),
+                        ('booking_id', models.BigIntegerField()),
+                        ('payment_id', models.BigIntegerField(blank=True, null=True)),
+                        ('facility_id', models.BigIntegerField()),
+                        ('from_status', models.CharField(blank=True, max_length=50, null=True)),
+                        ('to_status', models.CharField(max_length=50)),
+                        ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                        ('actor_id', models.BigIntegerField(blank=True, null=True)),
+                        ('source', models.CharField(max_length=50)),
+                    ],
+                    options={
+                        'indexes': [models.Index(fields=['booking_id', 'created_at'], name='bookingevent_booking_idx'), models.Index(fields=['facility_id', 'created_at'], name='bookingevent_facility_idx')],
+                    },
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(CREATE_SQL, DROP_SQL),
+                migrations.RunPython(create_initial_partitions, migrations.RunPython.noop),
+            ],
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.6 on 2026-10-19 16:06
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import futsalApp.models
+from django.db import migrations, models
+
+
+# Cold storage for old bookings, range-partitioned by year on month. Yearly
+# partitions are created by futsalApp.archive as bookings are moved in.
+CREATE_SQL = """
+    CREATE TABLE "futsalApp_archivedbookingmonth" (
+        id bigserial NOT NULL,
+        facility_id bigint NOT NULL REFERENCES "futsalApp_facility" (id) DEFERRABLE INITIALLY DEFERRED,
+        month date NOT NULL,
+        customer_ids bigint[] NOT NULL,
+        first_id bigint NOT NULL,
+        last_id bigint NOT NULL,
+        count integer NOT NULL CHECK (count >= 0),
+        bookings jsonb NOT NULL,
+        archived_at timestamp with time zone NOT NULL,
+        PRIMARY KEY (id, month),
+        CONSTRAINT archivedbookingmonth_facility_month UNIQUE (facility_id, month)
+    ) PARTITION BY RANGE (month);
+    CREATE INDEX archivedmonth_customers_idx ON "futsalApp_archivedbookingmonth" USING gin (customer_ids);
+    CREATE INDEX archivedmonth_ids_idx ON "futsalApp_archivedbookingmonth" (first_id, last_id);
+    CREATE TABLE "futsalApp_archivedbookingmonth_default" PARTITION OF "futsalApp_archivedbookingmonth" DEFAULT;
+"""
+
+DROP_SQL = 'DROP TABLE "futsalApp_archivedbookingmonth" CASCADE;'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('futsalApp', '0008_booking_event_log'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ArchivedBookingMonth',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('month', models.DateField()),
+                        ('customer_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, size=None)),
+                        ('first_id', models.BigIntegerField()),
+                        ('last_id', models.BigIntegerField()),
+                        ('count', models.PositiveIntegerField(default=0)),
+                        ('bookings', models.JSONField(decoder=futsalApp.models.ArchiveJSONDecoder, default=list)),
+                        ('archived_at', models.DateTimeField()),
+                        ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_months', to='futsalApp.facility')),
+                    ],
+                    options={
+                        'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['customer_ids'], name='archivedmonth_customers_idx'), models.Index(fields=['first_id', 'last_id'], name='archivedmonth_ids_idx')],
+                        'constraints': [models.UniqueConstraint(fields=('facility', 'month'), name='archivedbookingmonth_facility_month')],
+                    },
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(CREATE_SQL, DROP_SQL),
+            ],
+        ),
+    ]
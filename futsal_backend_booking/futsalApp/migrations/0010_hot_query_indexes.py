@@ -0,0 +1,52 @@
+# Generated by Django 5.1.6 on 2026-10-19 16:07
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes on live tables are built without blocking writes, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('futsalApp', '0009_booking_archive'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status__in', ['confirmed', 'completed'])), fields=['facility', 'created_at'], name='booking_revenue_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['customer', 'created_at'], name='booking_customer_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['date', 'slot'], name='booking_date_slot_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['facility', 'date'], name='booking_facility_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at'], name='booking_pending_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'confirmed')), fields=['date'], name='booking_confirmed_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['payment_status', 'created_at'], name='payment_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='review',
+            index=models.Index(fields=['facility', 'created_at'], name='review_facility_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='timeslot',
+            index=models.Index(fields=['field', 'status'], name='timeslot_field_status_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-19 16:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('futsalApp', '0013_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentCallback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_uuid', models.CharField(max_length=50)),
+                ('status', models.CharField(max_length=20)),
+                ('source', models.CharField(choices=[('esewa_success', 'eSewa success'), ('esewa_failure', 'eSewa failure')], max_length=20)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('result', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='paymentcallback_pending_idx')],
+                'constraints': [models.UniqueConstraint(fields=('transaction_uuid', 'status'), name='paymentcallback_uuid_status')],
+            },
+        ),
+    ]
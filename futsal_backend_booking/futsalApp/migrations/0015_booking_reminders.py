@@ -0,0 +1,70 @@
+# Generated by Django 5.1.6 on 2026-10-19 16:35
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+# Bookings backfilled per statement, each committed on its own
+BACKFILL_BATCH_SIZE = 10_000
+
+# Copies the slot's start time onto one batch of bookings (those after
+# %(after)s in id order) and returns the batch's last id, NULL once done
+BACKFILL_SQL = """
+    WITH batch AS (
+        SELECT id FROM {booking} WHERE id > %(after)s ORDER BY id LIMIT %(limit)s
+    ), updated AS (
+        UPDATE {booking} AS b
+        SET start_time = t.start_time
+        FROM {timeslot} AS t
+        WHERE b.id IN (SELECT id FROM batch) AND t.id = b.slot_id AND b.start_time IS NULL
+    )
+    SELECT max(id) FROM batch
+"""
+
+
+def backfill_start_time(apps, schema_editor):
+    quote = schema_editor.quote_name
+    sql = BACKFILL_SQL.format(
+        booking=quote(apps.get_model('futsalApp', 'Booking')._meta.db_table),
+        timeslot=quote(apps.get_model('futsalApp', 'TimeSlot')._meta.db_table),
+    )
+    last_id = 0
+    with schema_editor.connection.cursor() as cursor:
+        while last_id is not None:
+            cursor.execute(sql, {'after': last_id, 'limit': BACKFILL_BATCH_SIZE})
+            last_id = cursor.fetchone()[0]
+
+
+class Migration(migrations.Migration):
+    # The backfill commits batch by batch and the indexes are built without
+    # blocking writes, neither of which can run in one transaction
+    atomic = False
+
+    dependencies = [
+        ('futsalApp', '0014_payment_callback_inbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingReminder',
+            fields=[
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reminder', serialize=False, to='futsalApp.booking')),
+                ('sent_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='start_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_start_time, migrations.RunPython.noop),
+        # The new index is in place before the one it replaces goes
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'confirmed')), fields=['date', 'start_time'], name='booking_confirmed_start_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='booking',
+            name='booking_confirmed_date_idx',
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-19 16:52
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes on live tables are built without blocking writes, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('futsalApp', '0015_booking_reminders'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='facility',
+            index=models.Index(fields=['updated_at'], name='facility_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-19 16:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('futsalApp', '0016_facility_updated_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='payment_status',
+            field=models.CharField(choices=[('Pending Payment', 'Pending Payment'), ('Fully Paid', 'Fully Paid'), ('Partially Paid', 'Partially Paid'), ('Refunded', 'Refunded'), ('Refund Due', 'Refund Due')], default='Pending Payment', max_length=50),
+        ),
+    ]
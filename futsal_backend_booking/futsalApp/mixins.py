@@ -0,0 +1,66 @@
+# futsalApp/mixins.py
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+# Cache-Control for the public catalogue: browsers revalidate after a minute,
+# a shared cache (CDN) may keep the response a little longer.
+PUBLIC_CACHE_CONTROL = {'public': True, 'max_age': 60, 's_maxage': 300, 'stale_while_revalidate': 60}
+PRIVATE_CACHE_CONTROL = {'private': True, 'no_cache': True}
+
+
+class ConditionalGetMixin:
+    """
+    Adds strong ETag / Last-Modified validators to GET on generic views and
+    answers If-None-Match / If-Modified-Since with 304 Not Modified.
+
+    Validators come from a single aggregate query over updated_at (and the
+    row count for lists), so a matching request never serializes the payload.
+    Detail views need a `pk` URL kwarg. Lists whose rows or filters depend on
+    other models name them in `list_dependencies`; the latest updated_at of
+    those goes into the list validators too.
+    """
+    public_cache = False
+    list_dependencies = ()
+
+    def _get_validator_source(self, kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        if 'pk' in kwargs:
+            state = queryset.filter(pk=kwargs['pk']).aggregate(count=Count('pk'), last_modified=Max('updated_at'))
+            return state['count'], state['last_modified']
+        state = queryset.aggregate(count=Count('pk'), last_modified=Max('updated_at'))
+        last_modified = state['last_modified']
+        for model in self.list_dependencies:
+            changed = model.objects.aggregate(last_modified=Max('updated_at'))['last_modified']
+            if changed and (last_modified is None or changed > last_modified):
+                last_modified = changed
+        return state['count'], last_modified
+
+    def get_validators(self, request, *args, **kwargs):
+        count, last_modified = self._get_validator_source(kwargs)
+        if not count:
+            return None, None
+        fingerprint = '|'.join([
+            self.__class__.__name__,
+            request.get_full_path(),
+            str(count),
+            last_modified.isoformat() if last_modified else '',
+        ])
+        etag = f'"{hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:32]}"'
+        return etag, int(last_modified.timestamp()) if last_modified else None
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, *args, **kwargs)
+        response = None
+        if etag:
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            if etag:
+                response['ETag'] = etag
+                if last_modified:
+                    response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, **(PUBLIC_CACHE_CONTROL if self.public_cache else PRIVATE_CACHE_CONTROL))
+        return response
@@ -1,11 +1,23 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
+import json
 import uuid
 import bcrypt
+from decimal import Decimal
 from django.conf import settings
 from cryptography.fernet import Fernet
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from .cache import DashboardCache
+from .pricing import invalidate_tariff_table
+from .holidays import invalidate_holiday_index
+from .geo import invalidate_geo_index
 
 # Custom User Manager
 class UserManager(BaseUserManager):
@@ -134,11 +146,14 @@ class OAuthProvider(models.Model):
 # Login Device Model
 class LoginDevice(models.Model):
     user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='login_devices')
-    device_id = models.UUIDField(default=uuid.uuid4, editable=False)
+    device_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     device_name = models.CharField(max_length=100)
     location = models.CharField(max_length=100, blank=True, null=True)
     last_login_at = models.DateTimeField(default=timezone.now)
     hashed_rt = models.TextField(blank=True, null=True)
+    # Bumped on every refresh token rotation; a token of an older generation is a replay
+    rt_generation = models.PositiveIntegerField(default=0)
+    rt_expires_at = models.DateTimeField(blank=True, null=True)
 
     def __str__(self):
         return f"{self.device_name} - {self.location}"
@@ -164,6 +179,11 @@ class PasswordResetToken(models.Model):
 
 # Facility Model
 class Facility(models.Model):
+    FEATURE_CHOICES = (
+        'goals', 'scoreboard', 'lights', 'benches',
+        'referee', 'ac', 'recording', 'spectator',
+    )
+
     name = models.CharField(max_length=100)
     type = models.CharField(max_length=20, choices=[('Indoor', 'Indoor'), ('Outdoor', 'Outdoor'), ('Covered Outdoor', 'Covered Outdoor')], default='Indoor')
     surface = models.CharField(max_length=50)
@@ -173,23 +193,124 @@ class Facility(models.Model):
     features = ArrayField(models.CharField(max_length=50), default=list, blank=True)
     thumbnail = models.ImageField(upload_to='facility-thumbnail/', null=True, blank=True)
     address = models.TextField(null=True, blank=True)
+    # WGS84 position, indexed in process by futsalApp.geo for nearby search
+    latitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)])
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='facilities')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized rating summary, kept in step with Review writes (see apply_rating_change)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    # Full-text search document, maintained by PostgreSQL on every write
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', weight='A', config='english')
+            + SearchVector('type', 'surface', weight='B', config='english')
+            + SearchVector('address', weight='C', config='english')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='facility_search_gin'),
+            GinIndex(fields=['features'], name='facility_features_gin'),
+            models.Index(fields=['status', 'type'], name='facility_status_type_idx'),
+            models.Index(fields=['status', 'surface'], name='facility_status_surface_idx'),
+            models.Index(fields=['status', 'capacity'], name='facility_status_capacity_idx'),
+            # Max(updated_at) is the version of the nearby-search index (see get_geo_index)
+            models.Index(fields=['updated_at'], name='facility_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    # Location and status decide what the nearby-search index holds
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_geo_index()
+
+    def delete(self, *args, **kwargs):
+        invalidate_geo_index()
+        return super().delete(*args, **kwargs)
+
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else 0
+
+    @property
+    def rating_histogram(self):
+        return {str(star): getattr(self, f'rating_{star}_count') for star in range(1, 6)}
+
+    @classmethod
+    def apply_rating_change(cls, facility_id, added=None, removed=None):
+        """
+        Adjust the rating summary of a facility with F() expressions so that
+        concurrent review writes never overwrite each other's increments.
+        """
+        if added == removed:
+            return
+        updates = {}
+        count_delta = (added is not None) - (removed is not None)
+        if count_delta:
+            updates['rating_count'] = F('rating_count') + count_delta
+        updates['rating_sum'] = F('rating_sum') + (added or 0) - (removed or 0)
+        if added is not None:
+            updates[f'rating_{added}_count'] = F(f'rating_{added}_count') + 1
+        if removed is not None:
+            updates[f'rating_{removed}_count'] = F(f'rating_{removed}_count') - 1
+        # Bump updated_at as well so cached representations (ETags) are invalidated
+        cls.objects.filter(pk=facility_id).update(updated_at=timezone.now(), **updates)
+
 class Review(models.Model):
     facility = models.ForeignKey('Facility', on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reviews')
-    rating = models.PositiveIntegerField()
+    rating = models.PositiveIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Full-text search document, maintained by PostgreSQL on every write
+    search_vector = models.GeneratedField(
+        expression=SearchVector('comment', config='english'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='review_search_gin'),
+            models.Index(fields=['facility', 'created_at'], name='review_facility_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.facility.name} - {self.user.email}"
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Review.objects.select_for_update().filter(pk=self.pk).values('facility_id', 'rating').first()
+            super().save(*args, **kwargs)
+            if previous and previous['facility_id'] != self.facility_id:
+                Facility.apply_rating_change(previous['facility_id'], removed=previous['rating'])
+                previous = None
+            Facility.apply_rating_change(self.facility_id, added=self.rating, removed=previous and previous['rating'])
+            DashboardCache.invalidate_for_facilities([self.facility_id])
+
+# A receiver rather than a delete() override: reviews also go through cascades
+# (deleting their user) and queryset deletes, which never call Review.delete().
+# It runs inside the deletion's transaction.
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    Facility.apply_rating_change(instance.facility_id, removed=instance.rating)
+    DashboardCache.invalidate_for_facilities([instance.facility_id])
     
 class FacilityImage(models.Model):
     facility = models.ForeignKey('Facility', on_delete=models.CASCADE, related_name='images')
@@ -198,6 +319,16 @@ class FacilityImage(models.Model):
     def __str__(self):
         return f"{self.facility.name} - {self.image.name}"
 
+    # Images are part of the facility representation, so changing them bumps its updated_at
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Facility.objects.filter(pk=self.facility_id).update(updated_at=timezone.now())
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Facility.objects.filter(pk=self.facility_id).update(updated_at=timezone.now())
+        return result
+
 # TimeSlot Model
 class TimeSlot(models.Model):
     field = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='time_slots')
@@ -211,9 +342,23 @@ class TimeSlot(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['field', 'price'], name='timeslot_field_price_idx'),
+            models.Index(fields=['field', 'status'], name='timeslot_field_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.field.name} - {self.start_time} to {self.end_time}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_tariff_table(self.field_id)
+
+    def delete(self, *args, **kwargs):
+        invalidate_tariff_table(self.field_id)
+        return super().delete(*args, **kwargs)
+
 # Amenity Model
 class Amenity(models.Model):
     name = models.CharField(max_length=100)
@@ -246,6 +391,63 @@ class BusinessInfo(models.Model):
     def __str__(self):
         return self.name
 
+class Holiday(models.Model):
+    """
+    A public holiday (priced with Holidays slots) or a closure (nothing can be
+    booked) over an inclusive date range, for one facility or, without a
+    facility, for every facility.
+    """
+    KIND_CHOICES = (
+        ('holiday', 'Holiday'),
+        ('closure', 'Closure'),
+    )
+
+    name = models.CharField(max_length=100)
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='holidays', blank=True, null=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='holiday')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='holidays')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_date__gte=F('start_date')), name='holiday_dates_ordered'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.start_date} - {self.end_date})"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_holiday_index()
+
+    def delete(self, *args, **kwargs):
+        invalidate_holiday_index()
+        return super().delete(*args, **kwargs)
+
+class BookingSeries(models.Model):
+    """
+    A group of bookings reserved together (a team's season or a tournament)
+    and paid through one aggregated payment, which is attached to the first
+    booking of the series.
+    """
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='booking_series')
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='booking_series')
+    recurrence = models.JSONField(blank=True, null=True)  # The rule the dates were expanded from, if any
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Booking series {self.id} at {self.facility.name}"
+
+    def update_status(self, status, keep=()):
+        """Move every booking of the series, except those in a `keep` status, to the given status with one UPDATE."""
+        updated = self.bookings.exclude(status=status).exclude(status__in=keep).update(status=status, updated_at=timezone.now())
+        DashboardCache.invalidate_for_facilities([self.facility_id])
+        return updated
+
 class Booking(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -257,24 +459,53 @@ class Booking(models.Model):
     customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
     facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='bookings')
     slot = models.ForeignKey(TimeSlot, on_delete=models.CASCADE, related_name='bookings',blank=True, null=True)
+    series = models.ForeignKey(BookingSeries, on_delete=models.SET_NULL, related_name='bookings', blank=True, null=True)
     email = models.EmailField(blank=True, null=True)
     phone = models.CharField(max_length=15,blank=True, null=True)
     date = models.DateField(blank=True, null=True)
     time = models.CharField(max_length=50)  # e.g., "18:00 - 19:00"
+    start_time = models.TimeField(blank=True, null=True)  # the slot's start, copied so (date, start_time) can be range-scanned
     price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Each index serves a hot query; `manage.py check_query_plans` verifies they are used
+    class Meta:
+        indexes = [
+            # Dashboard stats and trends: an owner's facilities over a created_at window
+            models.Index(fields=['facility', 'created_at'], name='booking_revenue_idx',
+                         condition=Q(status__in=['confirmed', 'completed'])),
+            # A customer's booking history
+            models.Index(fields=['customer', 'created_at'], name='booking_customer_created_idx'),
+            # Slot availability on a date and bulk reservation conflicts
+            models.Index(fields=['date', 'slot'], name='booking_date_slot_idx'),
+            # Availability snapshots and upcoming bookings of a facility
+            models.Index(fields=['facility', 'date'], name='booking_facility_date_idx'),
+            # Booking lifecycle: stale pending bookings and confirmed bookings to complete;
+            # booking reminders: confirmed bookings starting within a notice window
+            models.Index(fields=['created_at'], name='booking_pending_created_idx', condition=Q(status='pending')),
+            models.Index(fields=['date', 'start_time'], name='booking_confirmed_start_idx', condition=Q(status='confirmed')),
+        ]
+
     def __str__(self):
         return f"Booking {self.id} - {self.customer.username} at {self.facility.name}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        DashboardCache.invalidate_for_facilities([self.facility_id])
+
+    def delete(self, *args, **kwargs):
+        DashboardCache.invalidate_for_facilities([self.facility_id])
+        return super().delete(*args, **kwargs)
+
 class Payment(models.Model):
     PAYMENT_STATUS_CHOICES = (
         ('Pending Payment', 'Pending Payment'),
         ('Fully Paid', 'Fully Paid'),
         ('Partially Paid', 'Partially Paid'),
         ('Refunded', 'Refunded'),
+        ('Refund Due', 'Refund Due'),  # paid for bookings that could no longer be confirmed
     )
 
     booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='payment')
@@ -291,5 +522,191 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['payment_status', 'created_at'], name='payment_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Payment for Booking {self.booking.id} - {self.payment_status}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        DashboardCache.invalidate_for_facilities(Booking.objects.filter(pk=self.booking_id).values('facility_id'))
+
+    def delete(self, *args, **kwargs):
+        DashboardCache.invalidate_for_facilities(Booking.objects.filter(pk=self.booking_id).values('facility_id'))
+        return super().delete(*args, **kwargs)
+
+class PaymentCallback(models.Model):
+    """
+    Inbox of payment gateway callbacks. The callback views verify and record
+    each (transaction_uuid, status) once and answer straight away; the
+    `process_payment_callbacks` worker applies them to the payment and its
+    booking in the order they arrived (see futsalApp.esewa).
+    """
+    SOURCE_CHOICES = (
+        ('esewa_success', 'eSewa success'),
+        ('esewa_failure', 'eSewa failure'),
+    )
+
+    transaction_uuid = models.CharField(max_length=50)
+    status = models.CharField(max_length=20)  # as reported by the gateway: COMPLETE, PENDING, CANCELED, ...
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    result = models.TextField(blank=True, null=True)  # what the worker did, or its last error
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['transaction_uuid', 'status'], name='paymentcallback_uuid_status'),
+        ]
+        indexes = [
+            models.Index(fields=['id'], condition=Q(processed_at__isnull=True), name='paymentcallback_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.transaction_uuid}: {self.status}"
+
+class BookingReminder(models.Model):
+    """
+    Marks a booking whose reminder has been sent. The reminder run claims
+    bookings by inserting these rows, so a booking is never reminded twice
+    (see futsalApp.reminders).
+    """
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, primary_key=True, related_name='reminder')
+    sent_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Reminder for booking {self.booking_id} sent at {self.sent_at}"
+
+class LifecycleRun(models.Model):
+    """Metrics of one booking lifecycle run (see futsalApp.lifecycle)."""
+    started_at = models.DateTimeField(db_index=True)
+    duration_ms = models.PositiveIntegerField(default=0)
+    expired = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    released = models.PositiveIntegerField(default=0)
+    batches = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Lifecycle run at {self.started_at}"
+
+class BookingEvent(models.Model):
+    """
+    Append-only log of booking and payment status transitions, written in the
+    transaction that makes the change (see futsalApp.eventlog). The table is
+    range-partitioned by month on created_at, so its primary key in the
+    database is (id, created_at); rows are never updated or deleted.
+    """
+    KIND_CHOICES = (
+        ('booking', 'Booking'),
+        ('payment', 'Payment'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    booking_id = models.BigIntegerField()
+    payment_id = models.BigIntegerField(blank=True, null=True)
+    facility_id = models.BigIntegerField()
+    from_status = models.CharField(max_length=50, blank=True, null=True)
+    to_status = models.CharField(max_length=50)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    actor_id = models.BigIntegerField(blank=True, null=True)  # User who made the change; None for the system
+    source = models.CharField(max_length=50)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['booking_id', 'created_at'], name='bookingevent_booking_idx'),
+            models.Index(fields=['facility_id', 'created_at'], name='bookingevent_facility_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.booking_id}: {self.from_status} -> {self.to_status}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Booking events are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Booking events are append-only")
+
+class IdempotencyKey(models.Model):
+    """
+    The stored first response to a request sent with an Idempotency-Key
+    header, replayed to retries until expires_at (see futsalApp.idempotency;
+    expired rows are deleted by `manage.py purge_idempotency_keys`).
+    """
+    # The unique (user, key) index serves lookups by user too
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # sha256 of the method, path and body
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)  # None until the first request finishes
+    response = models.BinaryField(blank=True, null=True)  # rendered JSON body
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotencykey_user_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key}"
+
+class ArchiveJSONDecoder(json.JSONDecoder):
+    """Reads JSON numbers with a fraction as Decimal, so archived amounts keep their scale."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, parse_float=Decimal, **kwargs)
+
+class ArchivedBookingMonth(models.Model):
+    """
+    One facility's archived bookings of one calendar month: the booking rows
+    (each with its payment under 'payment') moved out of the hot Booking
+    table by the archive_bookings command, kept as one JSON array so that
+    PostgreSQL compresses them. The table is range-partitioned by year on
+    month, with the primary key (id, month) in the database. See
+    futsalApp.archive for the move and the history read path.
+    """
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='archived_months')
+    month = models.DateField()  # first day of the month of the bookings' date
+    customer_ids = ArrayField(models.BigIntegerField(), default=list)
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    bookings = models.JSONField(default=list, decoder=ArchiveJSONDecoder)
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['facility', 'month'], name='archivedbookingmonth_facility_month'),
+        ]
+        indexes = [
+            GinIndex(fields=['customer_ids'], name='archivedmonth_customers_idx'),
+            models.Index(fields=['first_id', 'last_id'], name='archivedmonth_ids_idx'),
+        ]
+
     def __str__(self):
-        return f"Payment for Booking {self.booking.id} - {self.payment_status}"
\ No newline at end of file
+        return f"{self.count} archived bookings of facility {self.facility_id} in {self.month:%Y-%m}"
+
+    @staticmethod
+    def as_booking(row):
+        """An unsaved Booking (with its Payment) equal to an archived row, for serializing."""
+        booking = Booking(**{
+            field.attname: field.to_python(row.get(field.attname))
+            for field in Booking._meta.concrete_fields
+        })
+        payment = None
+        if row.get('payment') is not None:
+            payment = Payment(booking_id=booking.id, **{
+                field.attname: field.to_python(row['payment'].get(field.attname))
+                for field in Payment._meta.concrete_fields if field.attname != 'booking_id'
+            })
+        # Cache the reverse one-to-one even when it is None, so reading it never queries Payment
+        Booking.payment.related.set_cached_value(booking, payment)
+        return booking
\ No newline at end of file
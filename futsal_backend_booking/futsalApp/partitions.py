@@ -0,0 +1,33 @@
+# futsalApp/partitions.py
+from django.db import connection, transaction
+
+
+def add_range_partition(parent, name, low, high, column, options=None):
+    """
+    Create the partition `name` of the range-partitioned table `parent` for
+    low <= column < high, unless it already exists. Rows that landed in the
+    parent's default partition for that range are moved into the new
+    partition before it is attached. `options` are storage parameters for
+    the partition, e.g. {'fillfactor': 100}. Returns True if it was created.
+    """
+    quote = connection.ops.quote_name
+    storage = f" WITH ({', '.join(f'{key} = {value}' for key, value in options.items())})" if options else ''
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [quote(name)])
+        if cursor.fetchone()[0] is not None:
+            return False
+        cursor.execute(
+            f'CREATE TABLE {quote(name)} (LIKE {quote(parent)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS '
+            f'INCLUDING STORAGE INCLUDING COMPRESSION){storage}'
+        )
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {quote(parent + "_default")} '
+            f'WHERE {quote(column)} >= %s AND {quote(column)} < %s RETURNING *) '
+            f'INSERT INTO {quote(name)} SELECT * FROM moved',
+            [low, high],
+        )
+        cursor.execute(
+            f'ALTER TABLE {quote(parent)} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)',
+            [low, high],
+        )
+    return True
@@ -0,0 +1,183 @@
+# futsalApp/pricing.py
+import calendar
+import threading
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from .holidays import get_holiday_index, resolve_day_types
+
+DAY_TYPES = ('Weekdays', 'Weekends', 'Holidays')
+PAYMENT_TYPES = ('full', 'partial')
+
+# Day types whose slots stand in when a time window has no slot of the date's own type
+DAY_TYPE_FALLBACKS = {
+    'Weekdays': ('Weekdays',),
+    'Weekends': ('Weekends', 'Weekdays'),
+    'Holidays': ('Holidays', 'Weekends', 'Weekdays'),
+}
+
+CENT = Decimal('0.01')
+
+
+def day_type(day, facility_id=None):
+    """Day type of a date: Weekdays, Weekends, Holidays, or Closed when nothing can be booked."""
+    return resolve_day_types(day, day, facility_id)[day]
+
+
+class TariffTable:
+    """
+    Compiled prices of one facility: for every day type, the slots offered on
+    such a date and their price per payment type.
+
+    A slot applies to the day type it was created for. When a time window
+    has no slot of the date's day type, the slot of the nearest fallback type
+    (see DAY_TYPE_FALLBACKS) is offered at its own price. The unit price is
+    the discounted price when one is set, else the regular price; a partial
+    payment is PARTIAL_PAYMENT_SHARE of it, rounded half-up to the cent.
+    """
+
+    def __init__(self, slots):
+        share = Decimal(str(settings.PARTIAL_PAYMENT_SHARE))
+        by_window = {}
+        for slot in slots:
+            if slot['status'] == 'unavailable':
+                continue
+            by_window.setdefault((slot['start_time'], slot['end_time']), {})[slot['day']] = slot
+
+        self.offers = {}
+        self.prices = {}
+        for kind in DAY_TYPES:
+            offers = []
+            for window in sorted(by_window):
+                slot = next((by_window[window][fallback] for fallback in DAY_TYPE_FALLBACKS[kind] if fallback in by_window[window]), None)
+                if slot is None:
+                    continue
+                unit = slot['discounted_price'] or slot['price']
+                prices = {
+                    'full': unit.quantize(CENT, rounding=ROUND_HALF_UP),
+                    'partial': (unit * share).quantize(CENT, rounding=ROUND_HALF_UP),
+                }
+                offers.append((slot['id'], window, prices))
+                self.prices[slot['id'], kind] = prices
+            self.offers[kind] = offers
+
+    def price(self, slot_id, kind, payment_type='full'):
+        """Price of the slot on a date of the given day type, or None if it is not offered then (or Closed)."""
+        prices = self.prices.get((slot_id, kind))
+        return prices[payment_type] if prices else None
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def _versions(facility_ids):
+    """
+    {facility id: version} of the facilities' slots, read from the database so
+    that every worker sees the same one: the number of slots and the latest
+    updated_at changes whenever a slot is added, edited or removed.
+    """
+    from .models import TimeSlot
+
+    rows = (
+        TimeSlot.objects.filter(field_id__in=facility_ids).order_by()
+        .values('field_id').annotate(count=Count('id'), latest=Max('updated_at'))
+    )
+    return {row['field_id']: (row['count'], row['latest']) for row in rows}
+
+
+def get_tariff_tables(facility_ids):
+    """
+    Return {facility id: TariffTable}, compiling only the tables whose slots
+    have changed. Tables live in process memory, keyed by their slots' version
+    (see _versions), so two queries at most whatever the number of facilities.
+    """
+    from .models import TimeSlot
+
+    versions = _versions(facility_ids)
+    tables, stale = {}, []
+    for facility_id in facility_ids:
+        cached = _tables.get(facility_id)
+        if cached is not None and cached[0] == versions.get(facility_id):
+            tables[facility_id] = cached[1]
+        else:
+            stale.append(facility_id)
+    if stale:
+        slots = {}
+        for slot in TimeSlot.objects.filter(field_id__in=stale).values(
+            'field_id', 'id', 'day', 'start_time', 'end_time', 'price', 'discounted_price', 'status',
+        ):
+            slots.setdefault(slot['field_id'], []).append(slot)
+        with _tables_lock:
+            for facility_id in stale:
+                table = tables[facility_id] = TariffTable(slots.get(facility_id, ()))
+                _tables[facility_id] = (versions.get(facility_id), table)
+    return tables
+
+
+def get_tariff_table(facility_id):
+    return get_tariff_tables([facility_id])[facility_id]
+
+
+def invalidate_tariff_table(facility_id):
+    """Drop this process's copy of the facility's tariff table once the transaction commits; other workers see the new version."""
+    def invalidate():
+        with _tables_lock:
+            _tables.pop(facility_id, None)
+
+    transaction.on_commit(invalidate)
+
+
+def quote(facility_id, slot_id, day, payment_type='full'):
+    """Server-side price of one booking, or None if the slot is not offered on that date."""
+    return get_tariff_table(facility_id).price(slot_id, day_type(day, facility_id), payment_type)
+
+
+def bookable_slots(facility_ids, day, at=None):
+    """
+    {facility id: [(slot id, (start, end))]} of the slots each facility
+    offers on the date that nobody has booked, limited to those running at
+    the time `at` when it is given. One query for the bookings of all of them,
+    and the holiday index is fetched once rather than per facility.
+    """
+    from .models import Booking
+    from .services import BookingService
+
+    taken = set(
+        Booking.objects.filter(facility_id__in=facility_ids, date=day, status__in=BookingService.ACTIVE_STATUSES)
+        .values_list('slot_id', flat=True)
+    )
+    tables = get_tariff_tables(facility_ids)
+    holidays = get_holiday_index()
+    slots = {}
+    for facility_id in facility_ids:
+        kind = holidays.day_types(day, day, facility_id)[day]
+        slots[facility_id] = [
+            (slot_id, window) for slot_id, window, _ in tables[facility_id].offers.get(kind, ())
+            if slot_id not in taken and (at is None or window[0] <= at < window[1])
+        ]
+    return slots
+
+
+def quote_month(facility_id, year, month, payment_type='full'):
+    """Price every offered slot on every date of a calendar month."""
+    table = get_tariff_table(facility_id)
+    first = date(year, month, 1)
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    days = []
+    for day, kind in resolve_day_types(first, last, facility_id).items():
+        days.append({
+            'date': day.isoformat(),
+            'day_type': kind,
+            'slots': [
+                {
+                    'slot_id': slot_id,
+                    'time': f"{start:%H:%M} - {end:%H:%M}",
+                    'price': str(prices[payment_type]),
+                }
+                for slot_id, (start, end), prices in table.offers.get(kind, ())
+            ],
+        })
+    return days
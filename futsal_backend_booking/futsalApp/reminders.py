@@ -0,0 +1,138 @@
+# futsalApp/reminders.py
+import logging
+import re
+import zlib
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Booking, BookingReminder, BusinessInfo, Facility
+from .utils import booking_reminder_mail
+
+logger = logging.getLogger(__name__)
+
+NOTICE_PATTERN = re.compile(r'^\s*(\d+)\s*(minute|hour|day)s?\s*$', re.IGNORECASE)
+
+
+def parse_notice(notice):
+    """A booking_notice such as "2 hours" as a timedelta. Raises ValueError."""
+    match = NOTICE_PATTERN.match(notice or '')
+    if not match:
+        raise ValueError(f"Invalid booking notice: {notice!r}")
+    return timedelta(**{f'{match.group(2).lower()}s': int(match.group(1))})
+
+
+# Parsed once: every notice an owner can choose, and the one used without BusinessInfo
+NOTICE_WINDOWS = {notice: parse_notice(notice) for notice, _ in BusinessInfo._meta.get_field('booking_notice').choices}
+DEFAULT_NOTICE = BusinessInfo._meta.get_field('booking_notice').default
+
+# One statement per batch claims the due bookings by inserting their reminder
+# markers. The index on confirmed bookings' (date, start_time) is range-scanned
+# up to the widest notice window; each booking is then held to its facility
+# owner's own window. Bookings that already have a marker, or that another run
+# has just claimed, are skipped.
+CLAIM_DUE_SQL = """
+    INSERT INTO {reminder} (booking_id, sent_at)
+    SELECT b.id, %(now)s
+    FROM {booking} AS b
+    JOIN {facility} AS f ON f.id = b.facility_id
+    LEFT JOIN LATERAL (
+        SELECT bi.booking_notice FROM {businessinfo} AS bi
+        WHERE bi.created_by_id = f.created_by_id
+        ORDER BY bi.id DESC
+        LIMIT 1
+    ) AS notice ON true
+    JOIN unnest(%(notices)s::text[], %(seconds)s::int[]) AS w(notice, seconds)
+      ON w.notice = COALESCE(notice.booking_notice, %(default_notice)s)
+    WHERE b.status = 'confirmed'
+      AND (b.date, b.start_time) > (%(today)s, %(time)s)
+      AND (b.date, b.start_time) <= (%(until_date)s, %(until_time)s)
+      AND b.date + b.start_time <= %(local_now)s + make_interval(secs => w.seconds)
+      AND NOT EXISTS (SELECT 1 FROM {reminder} AS r WHERE r.booking_id = b.id)
+    ORDER BY b.date, b.start_time
+    LIMIT %(limit)s
+    ON CONFLICT (booking_id) DO NOTHING
+    RETURNING booking_id
+"""
+
+
+class BookingReminders:
+    """
+    Emails customers a reminder before their confirmed bookings start, as
+    far ahead as the facility owner's BusinessInfo.booking_notice says
+    (DEFAULT_NOTICE if the owner has none).
+
+    Bookings are claimed in batches of REMINDER_BATCH_SIZE by inserting
+    BookingReminder markers, and each batch's emails go out over one mail
+    connection in the same transaction: if sending fails the markers are
+    rolled back and the next run tries again, and once they commit the
+    bookings are never reminded again. A run holds a PostgreSQL advisory
+    lock, so concurrent runs on other nodes skip.
+    """
+    LOCK_KEY = zlib.crc32(b'futsalApp.booking_reminders')
+
+    @staticmethod
+    def _sql(template):
+        quote = connection.ops.quote_name
+        return template.format(
+            reminder=quote(BookingReminder._meta.db_table),
+            booking=quote(Booking._meta.db_table),
+            facility=quote(Facility._meta.db_table),
+            businessinfo=quote(BusinessInfo._meta.db_table),
+        )
+
+    @staticmethod
+    def _messages(booking_ids):
+        rows = Booking.objects.filter(id__in=booking_ids).values_list(
+            'email', 'customer__email', 'customer__name', 'facility__name', 'date', 'time',
+        )
+        return [
+            booking_reminder_mail(name, email or customer_email, facility, day, slot_time)
+            for email, customer_email, name, facility, day, slot_time in rows
+            if email or customer_email
+        ]
+
+    @staticmethod
+    def run(now=None, batch_size=None):
+        """Send every due reminder. Returns how many bookings were reminded, or None if another node holds the lock."""
+        now = now or timezone.now()
+        batch_size = batch_size or settings.REMINDER_BATCH_SIZE
+        local_now = timezone.localtime(now).replace(tzinfo=None)
+        until = local_now + max(NOTICE_WINDOWS.values())
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [BookingReminders.LOCK_KEY])
+            if not cursor.fetchone()[0]:
+                logger.info("Booking reminder run skipped: another run holds the lock")
+                return None
+        params = {
+            'now': now,
+            'local_now': local_now,
+            'today': local_now.date(),
+            'time': local_now.time(),
+            'until_date': until.date(),
+            'until_time': until.time(),
+            'notices': list(NOTICE_WINDOWS),
+            'seconds': [int(window.total_seconds()) for window in NOTICE_WINDOWS.values()],
+            'default_notice': DEFAULT_NOTICE,
+            'limit': batch_size,
+        }
+        reminded = 0
+        try:
+            mail = get_connection()  # opened and closed by each send_messages() call
+            while True:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(BookingReminders._sql(CLAIM_DUE_SQL), params)
+                    booking_ids = [row[0] for row in cursor.fetchall()]
+                    if booking_ids:
+                        mail.send_messages(BookingReminders._messages(booking_ids))
+                reminded += len(booking_ids)
+                if len(booking_ids) < batch_size:
+                    break
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [BookingReminders.LOCK_KEY])
+        logger.info(f"Booking reminders: sent {reminded}")
+        return reminded
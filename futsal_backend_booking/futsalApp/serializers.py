@@ -1,8 +1,164 @@
 from rest_framework import serializers
-from .models import User, Facility, TimeSlot, Amenity, BusinessInfo, FacilityImage, Review, Booking, Payment
+from .models import User, Facility, TimeSlot, Amenity, BusinessInfo, FacilityImage, Review, Booking, Payment, Holiday
 import re
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from rest_framework import status
 from .utils import generate_file_url 
+from .batch import SUB_REQUEST_HEADERS
+from .holidays import span_error
+from .exceptions import CustomAPIException
+
+def _path_tree(value):
+    """'id,facility.name,facility.images' -> {'id': {}, 'facility': {'name': {}, 'images': {}}}"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+def _frozen(tree):
+    return None if tree is None else tuple(sorted((name, _frozen(child)) for name, child in tree.items()))
+
+class FieldSelection:
+    """
+    The output a client asked for with ?fields= and ?expand=, each a comma
+    separated list of dotted paths (fields=id,date,facility.name).
+
+    `fields` keeps only the listed fields; a relation listed without
+    subfields keeps all of its own. When `expand` is given, only the
+    relations it lists are embedded and every other relation is reduced to
+    its primary key; without it, serializers embed what they always have.
+    Naming a subfield in `fields` embeds the relation too.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields or None  # {name: subtree}; None keeps every field
+        self.expand = expand  # {name: subtree}; None embeds the serializer's default relations
+
+    @classmethod
+    def from_params(cls, params):
+        """The selection in query parameters, or None when they ask for the default output."""
+        fields, expand = params.get('fields'), params.get('expand')
+        if not fields and expand is None:
+            return None
+        return cls(_path_tree(fields) if fields else None, _path_tree(expand) if expand is not None else None)
+
+    @classmethod
+    def from_request(cls, request):
+        if request is None:
+            return None
+        return cls.from_params(getattr(request, 'query_params', request.GET))
+
+    @property
+    def key(self):
+        """Hashable identity, so compiled output plans can be reused per selection."""
+        return _frozen(self.fields), _frozen(self.expand)
+
+    def including(self, *names):
+        """This selection with the given top-level fields kept, for views that need them."""
+        if self.fields is None:
+            return self
+        return FieldSelection({**{name: {} for name in names}, **self.fields}, self.expand)
+
+    def is_expanded(self, name):
+        if self.fields and self.fields.get(name):
+            return True
+        return self.expand is None or name in self.expand
+
+    def child(self, name):
+        fields = self.fields.get(name) if self.fields else None
+        expand = self.expand.get(name, {}) if self.expand is not None else None
+        if not fields and expand is None:
+            return None
+        return FieldSelection(fields, expand)
+
+class FieldSelectionMixin:
+    """
+    Applies a FieldSelection to a ModelSerializer's output fields. The
+    top-level serializer takes it from the `selection` argument or else from
+    the request in its context; nested serializers get their part from their
+    parent. Relations that are not embedded become primary keys, and fields
+    left out are never read, so nothing is fetched for them. Serializers
+    given data to validate always keep every field.
+    """
+
+    def __init__(self, *args, selection=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.selection = selection
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.selection
+        if selection is None and not hasattr(self, 'initial_data'):
+            parent = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+            if parent is None:
+                selection = FieldSelection.from_request(self.context.get('request'))
+        if selection is None:
+            return fields
+
+        if selection.fields:
+            unknown = [name for name in selection.fields if name not in fields]
+            if unknown:
+                raise CustomAPIException(f"Unknown field(s): {', '.join(unknown)}", status.HTTP_400_BAD_REQUEST)
+            fields = {name: field for name, field in fields.items() if name in selection.fields}
+        relations = {
+            name for name, field in fields.items()
+            if isinstance(getattr(field, 'child', field), serializers.BaseSerializer)
+        }
+        if selection.expand:
+            unknown = [name for name in selection.expand if name not in relations]
+            if unknown:
+                raise CustomAPIException(f"Cannot expand: {', '.join(unknown)}", status.HTTP_400_BAD_REQUEST)
+        for name in relations:
+            field = fields[name]
+            many = isinstance(field, serializers.ListSerializer)
+            if selection.is_expanded(name):
+                (field.child if many else field).selection = selection.child(name)
+            else:
+                source = {'source': field.source} if field.source and field.source != name else {}
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many, **source)
+        return fields
+
+def related_lookups(serializer, prefix=''):
+    """
+    The (select_related, prefetch_related) paths that load everything the
+    serializer embeds: to-one relations are joined, to-many ones prefetched,
+    along with whatever their own serializers embed.
+    """
+    joins, prefetches = [], []
+    model = serializer.Meta.model
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        path = prefix + field.source.replace('.', '__')
+        if isinstance(field, serializers.ListSerializer):
+            prefetches.append(path)
+            nested_joins, nested_prefetches = related_lookups(field.child, path + '__')
+            prefetches.extend(nested_joins + nested_prefetches)
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetches.append(path)
+        elif isinstance(field, serializers.BaseSerializer):
+            joins.append(path)
+            nested_joins, nested_prefetches = related_lookups(field, path + '__')
+            joins.extend(nested_joins)
+            prefetches.extend(nested_prefetches)
+        elif isinstance(field, serializers.PrimaryKeyRelatedField) and '.' not in field.source:
+            # A reverse one-to-one has no column of its own holding the key
+            if not model._meta.get_field(field.source).concrete:
+                joins.append(path)
+    return joins, prefetches
+
+def with_related(queryset, serializer_class, selection=None):
+    """The queryset loading exactly the relations serializer_class outputs for the selection."""
+    joins, prefetches = related_lookups(serializer_class(selection=selection))
+    if joins:
+        queryset = queryset.select_related(*joins)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
 
 class CreateUserSerializer(serializers.ModelSerializer):
     confirm_password = serializers.CharField(write_only=True)
@@ -69,6 +225,56 @@ class SignInSerializer(serializers.Serializer):
 class RefreshTokenSerializer(serializers.Serializer):
     refresh_token = serializers.CharField()
 
+class DirectUploadSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=['avatar', 'thumbnail', 'facility_image'])
+    facility = serializers.IntegerField(required=False)
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.CharField()
+    size = serializers.IntegerField(min_value=1)
+
+    def validate_content_type(self, value):
+        if value not in settings.MEDIA_UPLOAD_CONTENT_TYPES:
+            raise serializers.ValidationError(f"Content type must be one of {', '.join(settings.MEDIA_UPLOAD_CONTENT_TYPES)}")
+        return value
+
+    def validate_size(self, value):
+        if value > settings.MEDIA_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Files can be at most {settings.MEDIA_UPLOAD_MAX_SIZE} bytes")
+        return value
+
+    def validate(self, data):
+        if data['kind'] != 'avatar' and data.get('facility') is None:
+            raise serializers.ValidationError("facility is required for facility uploads")
+        return data
+
+class DirectUploadCompleteSerializer(serializers.Serializer):
+    ticket = serializers.CharField()
+
+class BatchSubRequestSerializer(serializers.Serializer):
+    id = serializers.CharField(max_length=100, required=False)
+    method = serializers.ChoiceField(choices=['GET'], default='GET')
+    url = serializers.CharField(max_length=2000)
+    headers = serializers.DictField(child=serializers.CharField(max_length=200), required=False)
+
+    def validate_url(self, value):
+        if not value.startswith('/api/') or value.startswith('/api/batch/'):
+            raise serializers.ValidationError("url must be an /api/ path on this server, other than /api/batch/")
+        return value
+
+    def validate_headers(self, value):
+        unknown = [name for name in value if name.lower() not in SUB_REQUEST_HEADERS]
+        if unknown:
+            raise serializers.ValidationError(f"Sub-requests can only set {', '.join(SUB_REQUEST_HEADERS)}")
+        return value
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchSubRequestSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f"A batch can hold at most {settings.BATCH_MAX_REQUESTS} requests")
+        return value
+
 class UpdateProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -133,7 +339,7 @@ class ResetPasswordSerializer(serializers.Serializer):
             raise serializers.ValidationError("Passwords do not match")
         return data
     
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     avatar = serializers.SerializerMethodField()
 
     class Meta:
@@ -147,48 +353,81 @@ class UserSerializer(serializers.ModelSerializer):
             return generate_file_url(request, obj.avatar.name)
         return None
     
-class FacilityImageSerializer(serializers.ModelSerializer):
+class FacilityImageSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     class Meta:
         model = FacilityImage
         fields = '__all__'
  
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     class Meta:
         model = Review
-        fields = '__all__'
+        exclude = ['search_vector']
         read_only_fields = ['created_by', 'created_at', 'updated_at', 'facility', 'user']
         
-class FacilitySerializer(serializers.ModelSerializer):
+class FacilitySerializer(FieldSelectionMixin, serializers.ModelSerializer):
     images = FacilityImageSerializer(many=True, read_only=True)
+    rating = serializers.SerializerMethodField()
     class Meta:
         model = Facility
-        fields = '__all__'
+        exclude = [
+            'search_vector', 'rating_count', 'rating_sum',
+            'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+        ]
         read_only_fields = ['created_by', 'created_at', 'updated_at']
 
-class TimeSlotSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        # Only the edited columns are written: a full-row save would put back the
+        # rating summary as it was read, undoing concurrent apply_rating_change() increments
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+
+    def get_rating(self, obj):
+        return {
+            'average': obj.average_rating,
+            'count': obj.rating_count,
+            'histogram': obj.rating_histogram,
+        }
+
+class TimeSlotSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     class Meta:
         model = TimeSlot
         fields = '__all__'
         read_only_fields = ['created_by', 'created_at', 'updated_at']
 
-class AmenitySerializer(serializers.ModelSerializer):
+class AmenitySerializer(FieldSelectionMixin, serializers.ModelSerializer):
     class Meta:
         model = Amenity
         fields = '__all__'
         read_only_fields = ['created_by', 'created_at', 'updated_at']
 
-class BusinessInfoSerializer(serializers.ModelSerializer):
+class BusinessInfoSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     class Meta:
         model = BusinessInfo
         fields = '__all__'
         read_only_fields = ['created_by', 'created_at', 'updated_at']
 
-class PaymentSerializer(serializers.ModelSerializer):
+class HolidaySerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Holiday
+        fields = '__all__'
+        read_only_fields = ['created_by', 'created_at', 'updated_at']
+
+    def validate(self, data):
+        start_date = data.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = data.get('end_date', getattr(self.instance, 'end_date', None))
+        error = span_error(start_date, end_date) if start_date and end_date else None
+        if error:
+            raise serializers.ValidationError(error)
+        return data
+
+class PaymentSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = ['id', 'amount', 'tax_amount', 'service_charge', 'delivery_charge', 'total_amount', 'transaction_uuid', 'payment_status', 'transaction_code', 'ref_id', 'payment_type', 'created_at', 'updated_at']
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     facility = FacilitySerializer(read_only=True)
     customer = UserSerializer(read_only=True)
     slot = TimeSlotSerializer(read_only=True)
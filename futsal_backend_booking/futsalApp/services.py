@@ -1,13 +1,21 @@
 # futsalApp/services.py
-from .models import User, EmailVerificationToken, OAuthProvider, LoginDevice, PasswordResetToken
+from .models import User, EmailVerificationToken, OAuthProvider, LoginDevice, PasswordResetToken, Facility, TimeSlot, Booking, BookingSeries, Payment
 from rest_framework.exceptions import ValidationError, AuthenticationFailed, PermissionDenied
 from .exceptions import CustomAPIException
-from rest_framework import status
+from .cache import DashboardCache
+from .events import publish_booking_event
+from .eventlog import booking_event, payment_event, record
+from .holidays import resolve_day_types
+from .pricing import PAYMENT_TYPES, get_tariff_table
+from rest_framework import serializers, status
 from .utils import generate_otp, send_registration_mail, send_welcome_mail, send_new_device_detected_mail, send_password_changed_mail, send_password_reset_mail, generate_file_url, delete_file
 import bcrypt
+from datetime import timedelta
+from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 import uuid
-import jwt
+from . import tokens
 from django.conf import settings
 from django.contrib.auth import authenticate
 from knox.models import AuthToken
@@ -140,20 +148,21 @@ class AuthService:
             user.save()
             raise AuthenticationFailed("Invalid email or password")
         user.login_attempts = 0
-        device_id = uuid.uuid4()
+        device = LoginDevice(user=user, device_id=uuid.uuid4(), device_name=device_name, location=location)
 
-        # Create Knox tokens for both access and refresh
-        knox_access_instance, access_token = AuthToken.objects.create(user, expiry=timezone.timedelta(days=7))
-        knox_refresh_instance, refresh_token = AuthToken.objects.create(user, expiry=timezone.timedelta(days=7))
+        if settings.AUTH_TOKEN_MODE == 'jwt':
+            # Signed access token; the refresh token is derived from the device, so nothing secret is stored
+            refresh_token = tokens.set_refresh_token(device)
+            access_token = tokens.issue_access_token(user, device)
+        else:
+            # Create Knox tokens for both access and refresh
+            knox_access_instance, access_token = AuthToken.objects.create(user, expiry=timezone.timedelta(days=7))
+            knox_refresh_instance, refresh_token = AuthToken.objects.create(user, expiry=timezone.timedelta(days=7))
+            device.hashed_rt = refresh_token  # Store the Knox refresh token
 
         # Store the device information
         is_new_device = not user.login_devices.filter(device_name__iexact=device_name, location__iexact=location).exists()
-        user.login_devices.create(
-            device_id=device_id,
-            device_name=device_name,
-            location=location,
-            hashed_rt=refresh_token  # Store the Knox refresh token
-        )
+        device.save()
         if user.login_devices.count() > 5:
             user.login_devices.order_by('last_login_at').first().delete()
         user.save()
@@ -175,6 +184,10 @@ class AuthService:
 
     @staticmethod
     def refresh_token(refresh_token):
+        if tokens.is_refresh_token(refresh_token):
+            # Rotating refresh token: the old one stops working
+            device, new_refresh_token = tokens.rotate_refresh_token(refresh_token)
+            return tokens.issue_access_token(device.user, device), new_refresh_token
         try:
             # Validate the refresh token using Knox (assuming refresh_token is a Knox token)
             refresh_token_instance = AuthToken.objects.get(token_key=refresh_token[:8])  # Get by token_key (first 8 chars)
@@ -299,4 +312,204 @@ class AuthService:
         if not user:
             raise CustomAPIException("User not found", status.HTTP_404_NOT_FOUND)
         user.login_devices.all().delete()
-        return
\ No newline at end of file
+        return
+
+class BookingService:
+    # Bookings in these states hold their slot for the date
+    ACTIVE_STATUSES = ('pending', 'confirmed', 'completed')
+    RECURRENCE_STEPS = {'daily': 1, 'weekly': 7}
+
+    @staticmethod
+    def parse_day(value):
+        """The date in a YYYY-MM-DD value, or None if it is malformed or impossible (2026-02-30)."""
+        try:
+            return parse_date(str(value))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def expand_recurrence(rule):
+        """
+        Expand a recurrence rule into (slot_id, date) pairs:
+        {"slot_id": 3, "start_date": "2026-01-02", "freq": "weekly", "interval": 1, "count": 20}
+        with either "count" or an inclusive "until" date.
+        """
+        if not isinstance(rule, dict):
+            raise CustomAPIException("recurrence must be an object", status.HTTP_400_BAD_REQUEST)
+        freq = rule.get('freq', 'weekly')
+        if freq not in BookingService.RECURRENCE_STEPS:
+            raise CustomAPIException("recurrence.freq must be 'daily' or 'weekly'", status.HTTP_400_BAD_REQUEST)
+        start_date = BookingService.parse_day(rule.get('start_date', ''))
+        if start_date is None:
+            raise CustomAPIException("recurrence.start_date must be a YYYY-MM-DD date", status.HTTP_400_BAD_REQUEST)
+        try:
+            interval = int(rule.get('interval', 1))
+            count = int(rule['count']) if rule.get('count') is not None else None
+        except (TypeError, ValueError):
+            raise CustomAPIException("recurrence.interval and recurrence.count must be integers", status.HTTP_400_BAD_REQUEST)
+        until = BookingService.parse_day(rule['until']) if rule.get('until') else None
+        if rule.get('until') and until is None:
+            raise CustomAPIException("recurrence.until must be a YYYY-MM-DD date", status.HTTP_400_BAD_REQUEST)
+        if interval < 1 or (count is None) == (until is None) or (count is not None and count < 1):
+            raise CustomAPIException("recurrence needs a positive interval and exactly one of count or until", status.HTTP_400_BAD_REQUEST)
+
+        step = timedelta(days=BookingService.RECURRENCE_STEPS[freq] * interval)
+        limit = settings.BULK_BOOKING_MAX_OCCURRENCES
+        dates = []
+        day = start_date
+        while (count is None or len(dates) < count) and (until is None or day <= until):
+            if len(dates) == limit:
+                raise CustomAPIException(f"A series can have at most {limit} bookings", status.HTTP_400_BAD_REQUEST)
+            dates.append(day)
+            try:
+                day += step
+            except OverflowError:  # the next occurrence would fall after 9999-12-31
+                if count is not None and len(dates) < count:
+                    raise CustomAPIException("recurrence runs past the last representable date", status.HTTP_400_BAD_REQUEST)
+                break
+        return [(rule.get('slot_id'), day) for day in dates]
+
+    @staticmethod
+    def parse_pairs(items):
+        if not isinstance(items, list) or not items:
+            raise CustomAPIException("slots must be a non-empty list of {slot_id, date}", status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BULK_BOOKING_MAX_OCCURRENCES:
+            raise CustomAPIException(f"A series can have at most {settings.BULK_BOOKING_MAX_OCCURRENCES} bookings", status.HTTP_400_BAD_REQUEST)
+        pairs = []
+        for item in items:
+            day = BookingService.parse_day(item.get('date', '')) if isinstance(item, dict) else None
+            if day is None:
+                raise CustomAPIException("Every entry in slots needs a slot_id and a YYYY-MM-DD date", status.HTTP_400_BAD_REQUEST)
+            pairs.append((item.get('slot_id'), day))
+        return pairs
+
+    @staticmethod
+    def find_conflicts(prices, pairs):
+        """
+        Return {(slot_id, date): reason} for every distinct pair that cannot be
+        booked, checking existing bookings for all pairs with a single query.
+        prices maps each pair to its quote, None when the slot is not offered.
+        """
+        conflicts = {}
+        today = timezone.localdate()
+        for slot_id, day in pairs:
+            if day < today:
+                conflicts[slot_id, day] = 'past'
+            elif prices[slot_id, day] is None:
+                conflicts[slot_id, day] = 'unavailable'
+
+        booked = Booking.objects.filter(
+            slot_id__in={slot_id for slot_id, _ in pairs},
+            date__in={day for _, day in pairs},
+            status__in=BookingService.ACTIVE_STATUSES,
+        ).values_list('slot_id', 'date')
+        requested = set(pairs)
+        for pair in booked:
+            if pair in requested:
+                conflicts.setdefault(pair, 'booked')
+        return conflicts
+
+    @staticmethod
+    def reserve_series(user, data):
+        """
+        Reserve many (slot, date) pairs of one facility at once.
+
+        Conflicts are reported per date. Unless allow_partial is set, any
+        conflict books nothing; otherwise the free dates are booked. All
+        bookings and their single aggregated payment are written in one
+        transaction, with the facility's slots locked so that concurrent
+        series cannot book the same dates.
+        Returns (series, payment, conflicts); series is None when nothing was booked.
+        """
+        email, phone = data.get('email'), data.get('phone')
+        payment_type = data.get('payment_type', 'full')
+        if not all([data.get('facility_id'), email, phone]):
+            raise CustomAPIException("facility_id, email and phone are required", status.HTTP_400_BAD_REQUEST)
+        if payment_type not in PAYMENT_TYPES:
+            raise CustomAPIException("payment_type must be 'full' or 'partial'", status.HTTP_400_BAD_REQUEST)
+        try:
+            facility_id = int(data['facility_id'])
+        except (TypeError, ValueError):
+            raise CustomAPIException("facility_id must be an integer", status.HTTP_400_BAD_REQUEST)
+        if ('recurrence' in data) == ('slots' in data):
+            raise CustomAPIException("Provide either recurrence or slots", status.HTTP_400_BAD_REQUEST)
+        try:
+            # Form data sends "false" as a string, which is truthy
+            allow_partial = serializers.BooleanField().to_internal_value(data.get('allow_partial', False))
+        except serializers.ValidationError:
+            raise CustomAPIException("allow_partial must be a boolean", status.HTTP_400_BAD_REQUEST)
+        recurrence = data.get('recurrence')
+        pairs = BookingService.expand_recurrence(recurrence) if recurrence is not None else BookingService.parse_pairs(data['slots'])
+
+        try:
+            # Repeated pairs are booked once
+            pairs = list(dict.fromkeys((int(slot_id), day) for slot_id, day in pairs))
+        except (TypeError, ValueError):
+            raise CustomAPIException("slot_id must be an integer", status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            facility = Facility.objects.filter(id=facility_id).first()
+            if not facility:
+                raise CustomAPIException("Facility not found", status.HTTP_404_NOT_FOUND)
+            slot_ids = sorted({slot_id for slot_id, _ in pairs})
+            slots = {slot.id: slot for slot in TimeSlot.objects.select_for_update().filter(id__in=slot_ids, field=facility).order_by('id')}
+            missing = [slot_id for slot_id in slot_ids if slot_id not in slots]
+            if missing:
+                raise CustomAPIException(f"Time slots not found for this facility: {missing}", status.HTTP_404_NOT_FOUND)
+
+            tariffs = get_tariff_table(facility.id)
+            days = [day for _, day in pairs]
+            kinds = resolve_day_types(min(days), max(days), facility.id)
+            prices = {(slot_id, day): tariffs.price(slot_id, kinds[day], payment_type) for slot_id, day in pairs}
+            conflicts = BookingService.find_conflicts(prices, pairs)
+            report = [
+                {'slot_id': slot_id, 'date': day.isoformat(), 'reason': reason}
+                for (slot_id, day), reason in sorted(conflicts.items(), key=lambda item: (item[0][1], item[0][0]))
+            ]
+            free = [pair for pair in pairs if pair not in conflicts]
+            if not free or (conflicts and not allow_partial):
+                return None, None, report
+
+            series = BookingSeries.objects.create(customer=user, facility=facility, recurrence=recurrence)
+            bookings = Booking.objects.bulk_create([
+                Booking(
+                    customer=user, facility=facility, slot=slots[slot_id], series=series,
+                    email=email, phone=phone, date=day,
+                    time=f"{slots[slot_id].start_time:%H:%M} - {slots[slot_id].end_time:%H:%M}",
+                    start_time=slots[slot_id].start_time,
+                    price=prices[slot_id, day],
+                    status='pending',
+                )
+                for slot_id, day in sorted(free, key=lambda pair: (pair[1], slots[pair[0]].start_time))
+            ])
+            total_amount = sum(booking.price for booking in bookings)
+            payment = Payment.objects.create(
+                booking=bookings[0],
+                amount=total_amount,
+                total_amount=total_amount,
+                transaction_uuid=str(uuid.uuid4()),
+                payment_status='Pending Payment',
+                payment_type=payment_type,
+            )
+            record(
+                *(booking_event(booking, None, 'bulk_booking', user) for booking in bookings),
+                payment_event(payment, facility.id, None, 'bulk_booking', user),
+            )
+            # bulk_create skips Booking.save(), which is what normally refreshes the dashboards
+            DashboardCache.invalidate_for_facilities([facility.id])
+            for booking in bookings:
+                publish_booking_event(booking)
+        return series, payment, report
+
+    @staticmethod
+    def update_series_status(series, status, event_type=None, source='series', actor=None, keep=()):
+        """Apply a payment outcome to every booking of the series the payment covers, except those in a `keep` status."""
+        with transaction.atomic():
+            previous = dict(
+                series.bookings.select_for_update().exclude(status=status).exclude(status__in=keep).values_list('id', 'status')
+            )
+            series.update_status(status, keep)
+            bookings = list(series.bookings.only('id', 'facility_id', 'slot_id', 'date', 'status', 'price'))
+            record(*(booking_event(booking, previous[booking.id], source, actor) for booking in bookings if booking.id in previous))
+        for booking in bookings:
+            publish_booking_event(booking, event_type)
\ No newline at end of file
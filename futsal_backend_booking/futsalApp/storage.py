@@ -0,0 +1,244 @@
+# futsalApp/storage.py
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import secrets
+import tempfile
+from urllib.parse import quote
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, Storage
+from django.urls import reverse
+from django.utils.deconstruct import deconstructible
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except ImportError:  # boto3 is only needed for the S3 backend
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# stem.<hash>.ext as written by HashedNameMixin (get_available_name puts its
+# suffix for taken names on the stem, so the hash stays in front of the extension)
+HASHED_NAME_RE = re.compile(rf'\.[0-9a-f]{{{HASH_LENGTH}}}(\.[^./]+)?$')
+
+# Salt of the signed tokens in local upload URLs
+LOCAL_UPLOAD_SALT = 'futsalApp.storage.upload'
+
+# S3 DeleteObjects takes at most this many keys per request
+S3_DELETE_BATCH = 1000
+
+
+def is_hashed_name(name):
+    """True for names that carry a digest of their content, whose bytes therefore never change."""
+    return HASHED_NAME_RE.search(name) is not None
+
+
+def clean_media_name(name):
+    """
+    The name normalised with posixpath.normpath, or None if it is absolute or
+    has a '..' segment. Prefixes only mean something on a clean name:
+    'avatars/../private/x' starts with 'avatars/'.
+    """
+    if name.startswith('/') or '..' in name.replace('\\', '/').split('/'):
+        return None
+    return posixpath.normpath(name)
+
+
+def is_public_media(name):
+    name = clean_media_name(name)
+    return name is not None and name.startswith(settings.MEDIA_PUBLIC_PREFIXES)
+
+
+def cache_control(name):
+    """Content-hashed names never change their bytes, so they are cached for good."""
+    scope = 'public' if is_public_media(name) else 'private'
+    if is_hashed_name(name):
+        return f'{scope}, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'{scope}, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+class HashedNameMixin:
+    """
+    Stores uploads as `stem.<content hash>.ext`, so a name always refers to
+    the same bytes and can be cached forever. Re-uploading identical content
+    gets its own copy (with Django's usual suffix), because each model row
+    deletes its files independently.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        return super().save(self.hashed_name(name, content), content, max_length)
+
+    @staticmethod
+    def hashed_name(name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        root, ext = os.path.splitext(name)
+        return f'{root}.{digest.hexdigest()[:HASH_LENGTH]}{ext}'
+
+    def upload_name(self, directory, filename, content_type):
+        """
+        Name for a file the client uploads straight to the storage. Its bytes
+        are not seen before the name is handed out, so a random token takes
+        the place of the content hash; the name is still never reused. The
+        extension follows the (validated) content type, not the client's
+        filename.
+        """
+        root = os.path.splitext(self.get_valid_name(os.path.basename(filename)))[0]
+        ext = mimetypes.guess_extension(content_type) or ''
+        return f'{directory.rstrip("/")}/{root[:50] or "upload"}.{secrets.token_hex(HASH_LENGTH // 2)}{ext}'
+
+
+@deconstructible
+class LocalObjectStorage(HashedNameMixin, FileSystemStorage):
+    """
+    Files under MEDIA_ROOT, with the object storage operations of S3Storage,
+    so development and tests run without a bucket. Direct uploads go to
+    LocalUploadView and so, unlike with S3, through a Django worker.
+    """
+
+    def save_at(self, name, content):
+        """Store content under exactly this name (direct uploads land where they were promised)."""
+        self.delete(name)
+        return FileSystemStorage.save(self, name, content)
+
+    def delete_many(self, names):
+        for name in names:
+            self.delete(name)
+
+    def upload_target(self, name, content_type, max_size, expires):
+        token = signing.dumps({'name': name, 'type': content_type, 'max': max_size}, salt=LOCAL_UPLOAD_SALT)
+        return {
+            'method': 'POST',
+            'url': reverse('upload_local', args=[token]),
+            'fields': {'Content-Type': content_type},
+        }
+
+    @staticmethod
+    def read_upload_token(token, expires):
+        """The (name, content type, max size) a local upload URL was issued for. Raises signing.BadSignature."""
+        payload = signing.loads(token, salt=LOCAL_UPLOAD_SALT, max_age=expires)
+        return payload['name'], payload['type'], payload['max']
+
+    def download_url(self, name, expires=None):
+        return None  # served by MediaView
+
+
+@deconstructible
+class S3Storage(HashedNameMixin, Storage):
+    """
+    An S3-compatible bucket (AWS, MinIO, R2, Spaces, ...). Saves are streamed
+    to the bucket, in parallel multipart chunks once they exceed the
+    multipart threshold; deletes are batched; clients upload straight to the
+    bucket with presigned POSTs, so large photos never pass through Django.
+    """
+
+    def __init__(self, bucket=None, endpoint_url=None, region=None, access_key=None, secret_key=None,
+                 base_url=None, multipart_threshold=8 * 1024 * 1024, multipart_chunksize=8 * 1024 * 1024,
+                 max_concurrency=4):
+        if boto3 is None:
+            raise ImproperlyConfigured("The S3 storage backend needs boto3 (pip install boto3)")
+        if not bucket:
+            raise ImproperlyConfigured("The S3 storage backend needs a bucket")
+        self.bucket = bucket
+        self.base_url = base_url if base_url is not None else settings.MEDIA_URL
+        self.client = boto3.client(
+            's3', endpoint_url=endpoint_url or None, region_name=region or None,
+            aws_access_key_id=access_key or None, aws_secret_access_key=secret_key or None,
+            config=Config(signature_version='s3v4'),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold, multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+        )
+
+    def _open(self, name, mode='rb'):
+        file = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        self.client.download_fileobj(self.bucket, name, file, Config=self.transfer_config)
+        file.seek(0)
+        return File(file, name)
+
+    def _save(self, name, content):
+        content.seek(0)
+        content_type = getattr(content, 'content_type', None) or mimetypes.guess_type(name)[0]
+        self.client.upload_fileobj(
+            content, self.bucket, name,
+            ExtraArgs={'ContentType': content_type or 'application/octet-stream', 'CacheControl': cache_control(name)},
+            Config=self.transfer_config,
+        )
+        return name
+
+    def save_at(self, name, content):
+        return self._save(name, content if hasattr(content, 'seek') else File(content, name))
+
+    def _head(self, name):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=name)
+        except ClientError as error:
+            if error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def exists(self, name):
+        return self._head(name) is not None
+
+    def size(self, name):
+        head = self._head(name)
+        if head is None:
+            raise FileNotFoundError(name)
+        return head['ContentLength']
+
+    def get_modified_time(self, name):
+        head = self._head(name)
+        if head is None:
+            raise FileNotFoundError(name)
+        return head['LastModified']
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=name)
+
+    def delete_many(self, names):
+        names = list(names)
+        for start in range(0, len(names), S3_DELETE_BATCH):
+            response = self.client.delete_objects(Bucket=self.bucket, Delete={
+                'Objects': [{'Key': name} for name in names[start:start + S3_DELETE_BATCH]],
+                'Quiet': True,
+            })
+            for error in response.get('Errors', ()):
+                logger.error(f"Could not delete {error.get('Key')} from {self.bucket}: {error.get('Message')}")
+
+    def url(self, name):
+        return self.base_url + quote(name)
+
+    def upload_target(self, name, content_type, max_size, expires):
+        fields = {'Content-Type': content_type, 'Cache-Control': cache_control(name)}
+        post = self.client.generate_presigned_post(
+            self.bucket, name,
+            Fields=fields,
+            Conditions=[{key: value} for key, value in fields.items()] + [['content-length-range', 1, max_size]],
+            ExpiresIn=expires,
+        )
+        return {'method': 'POST', 'url': post['url'], 'fields': post['fields']}
+
+    def download_url(self, name, expires=None):
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': name},
+            ExpiresIn=expires or settings.MEDIA_DOWNLOAD_URL_TTL,
+        )
@@ -0,0 +1,94 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from futsalApp.models import Booking, BookingSeries, Facility, Payment, TimeSlot, User
+
+
+class BulkBookingTests(TestCase):
+    """
+    A series is booked whole or not at all; with allow_partial the free dates
+    are booked. Either way every conflicting date is reported with its reason.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(email='series-owner@example.com', name='Series Owner', role='OWNER')
+        cls.player = User.objects.create_user(email='series-player@example.com', name='Series Player', role='USER')
+        cls.facility = Facility.objects.create(
+            name='Series Arena', surface='Artificial Turf', size='40x20', capacity=10,
+            address='Series Marg, Kathmandu', created_by=owner,
+        )
+        cls.slot = TimeSlot.objects.create(
+            field=cls.facility, start_time='18:00', end_time='19:00', price=1200, created_by=owner,
+        )
+        # Three Mondays in a row, one to two weeks ahead: in the future and never a weekend
+        today = timezone.localdate()
+        cls.mondays = [today + timedelta(days=14 - today.weekday() + 7 * week) for week in range(3)]
+        cls.taken = Booking.objects.create(
+            customer=owner, facility=cls.facility, slot=cls.slot, date=cls.mondays[1], time='18:00 - 19:00',
+            start_time='18:00', price=1200, status='confirmed',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.player)
+
+    def post(self, **data):
+        data = {'facility_id': self.facility.id, 'email': 'player@example.com', 'phone': '9800000000', **data}
+        return self.client.post('/api/bookings/bulk/', data, format='json')
+
+    def weekly(self, count=3):
+        return {'slot_id': self.slot.id, 'start_date': self.mondays[0].isoformat(), 'freq': 'weekly', 'count': count}
+
+    def test_a_conflict_books_nothing(self):
+        response = self.post(recurrence=self.weekly())
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['data']['conflicts'], [
+            {'slot_id': self.slot.id, 'date': self.mondays[1].isoformat(), 'reason': 'booked'},
+        ])
+        self.assertFalse(BookingSeries.objects.exists())
+        self.assertEqual(list(Booking.objects.values_list('pk', flat=True)), [self.taken.pk])
+
+    def test_allow_partial_books_the_free_dates(self):
+        response = self.post(recurrence=self.weekly(), allow_partial=True)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()['data']
+        self.assertEqual([booking['date'] for booking in data['bookings']], [
+            self.mondays[0].isoformat(), self.mondays[2].isoformat(),
+        ])
+        self.assertEqual(data['conflicts'], [
+            {'slot_id': self.slot.id, 'date': self.mondays[1].isoformat(), 'reason': 'booked'},
+        ])
+        series = BookingSeries.objects.get(pk=data['series_id'])
+        self.assertEqual(series.bookings.count(), 2)
+        # One payment for the whole series
+        payment = Payment.objects.get(booking__series=series)
+        self.assertEqual(payment.total_amount, Decimal('2400'))
+
+    def test_allow_partial_with_no_free_date_books_nothing(self):
+        response = self.post(
+            slots=[{'slot_id': self.slot.id, 'date': self.mondays[1].isoformat()}], allow_partial=True,
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(BookingSeries.objects.exists())
+
+    def test_every_conflict_is_reported_in_date_order(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        response = self.post(slots=[
+            {'slot_id': self.slot.id, 'date': self.mondays[1].isoformat()},
+            {'slot_id': self.slot.id, 'date': yesterday.isoformat()},
+            {'slot_id': self.slot.id, 'date': self.mondays[2].isoformat()},
+        ])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['data']['conflicts'], [
+            {'slot_id': self.slot.id, 'date': yesterday.isoformat(), 'reason': 'past'},
+            {'slot_id': self.slot.id, 'date': self.mondays[1].isoformat(), 'reason': 'booked'},
+        ])
+
+    def test_a_non_numeric_facility_id_is_a_bad_request(self):
+        response = self.post(facility_id='abc', recurrence=self.weekly())
+        self.assertEqual(response.status_code, 400)
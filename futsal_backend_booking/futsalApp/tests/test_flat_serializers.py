@@ -0,0 +1,98 @@
+import uuid
+from decimal import Decimal
+
+from django.db.models import Prefetch
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from futsalApp.flat_serializers import booking_list_serializer, facility_list_serializer, review_list_serializer
+from futsalApp.models import Booking, Facility, FacilityImage, Payment, Review, TimeSlot, User
+from futsalApp.renderers import FastJSONRenderer
+from futsalApp.serializers import BookingSerializer, FacilitySerializer, FieldSelection, ReviewSerializer, with_related
+
+
+class FlatSerializerOutputTests(TestCase):
+    """
+    The flat list serializers stand in for the DRF ones on the list views, so
+    both must render the same bytes: decimals, datetimes, media URLs (absolute
+    with a request, relative without one) and missing relations alike.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.player = User.objects.create_user(
+            email='flat-player@example.com', name='Flat Player', role='USER', avatar='avatars/flat player.png',
+        )
+        cls.owner = User.objects.create_user(email='flat-owner@example.com', name='Flat Owner', role='OWNER')
+        cls.arena = Facility.objects.create(
+            name='Flat Arena', surface='Artificial Turf', size='40x20', capacity=10, address='Flat Marg, Kathmandu',
+            features=['goals', 'lights'], created_by=cls.owner, thumbnail='facility-thumbnail/flat arena.jpg',
+            rating_count=3, rating_sum=11, rating_4_count=2, rating_3_count=1,
+        )
+        cls.bare_arena = Facility.objects.create(
+            name='Bare Arena', surface='Grass', size='30x15', capacity=8, address='Bare Marg, Lalitpur',
+            created_by=cls.owner,
+        )
+        FacilityImage.objects.bulk_create([
+            FacilityImage(facility=cls.arena, image=f'facility-images/flat-{index}.jpg') for index in range(2)
+        ])
+        slot = TimeSlot.objects.create(
+            field=cls.arena, start_time='18:00', end_time='19:00', price=Decimal('1200.50'),
+            discounted_price=Decimal('999.99'), created_by=cls.owner,
+        )
+        paid = Booking.objects.create(
+            customer=cls.player, facility=cls.arena, slot=slot, email='flat-player@example.com', phone='9800000000',
+            date='2026-03-14', time='18:00 - 19:00', start_time='18:00', price=Decimal('999.99'), status='confirmed',
+        )
+        Payment.objects.create(
+            booking=paid, amount=Decimal('999.99'), total_amount=Decimal('999.99'),
+            transaction_uuid=str(uuid.uuid4()), payment_status='Fully Paid',
+        )
+        # No payment, no slot, no contact details and a customer without an avatar
+        Booking.objects.create(
+            customer=cls.owner, facility=cls.bare_arena, time='07:00 - 08:00', price=Decimal('800'), status='pending',
+        )
+        Review.objects.create(facility=cls.arena, user=cls.player, rating=4, comment='Good turf.')
+        Review.objects.create(facility=cls.bare_arena, user=cls.owner, rating=3, comment='Needs lights.')
+
+    def cases(self, request):
+        bookings = Booking.objects.order_by('pk')
+        facilities = Facility.objects.order_by('pk')
+        reviews = Review.objects.order_by('pk')
+        # Images are ordered like the flat serializer orders them
+        images = Prefetch('images', queryset=FacilityImage.objects.order_by('pk'))
+        facility_images = Prefetch('facility__images', queryset=FacilityImage.objects.order_by('pk'))
+        return [
+            ('bookings', BookingSerializer, booking_list_serializer,
+             bookings.select_related('facility', 'customer', 'slot', 'payment').prefetch_related(facility_images),
+             bookings),
+            ('facilities', FacilitySerializer, facility_list_serializer, facilities.prefetch_related(images), facilities),
+            ('reviews', ReviewSerializer, review_list_serializer, reviews, reviews),
+        ]
+
+    def assertSameOutput(self, request):
+        renderer = FastJSONRenderer()
+        context = {'request': request} if request else {}
+        for label, serializer_class, flat, model_queryset, queryset in self.cases(request):
+            with self.subTest(serializer=label):
+                expected = renderer.render(serializer_class(model_queryset, many=True, context=context).data)
+                self.assertEqual(renderer.render(flat.serialize(queryset, request)), expected)
+
+    def test_same_bytes_with_a_request(self):
+        self.assertSameOutput(APIRequestFactory().get('/', HTTP_HOST='testserver'))
+
+    def test_same_bytes_without_a_request(self):
+        self.assertSameOutput(None)
+
+    def test_same_bytes_for_a_field_selection(self):
+        request = APIRequestFactory().get(
+            '/?fields=id,date,price,status,payment,facility.name,facility.thumbnail&expand=facility',
+            HTTP_HOST='testserver',
+        )
+        bookings = Booking.objects.order_by('pk')
+        expected = BookingSerializer(
+            with_related(bookings, BookingSerializer, FieldSelection.from_request(request)), many=True,
+            context={'request': request},
+        ).data
+        renderer = FastJSONRenderer()
+        self.assertEqual(renderer.render(booking_list_serializer.serialize(bookings, request)), renderer.render(expected))
@@ -0,0 +1,122 @@
+import threading
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from futsalApp.models import Booking, Facility, IdempotencyKey, Payment, TimeSlot, User
+
+
+def seed_slot():
+    owner = User.objects.create_user(email='idempotency-owner@example.com', name='Idempotency Owner', role='OWNER')
+    facility = Facility.objects.create(
+        name='Idempotency Arena', surface='Artificial Turf', size='40x20', capacity=10,
+        address='Idempotency Marg, Kathmandu', created_by=owner,
+    )
+    return TimeSlot.objects.create(field=facility, start_time='18:00', end_time='19:00', price=1200, created_by=owner)
+
+
+def booking_request(slot):
+    # A Monday one to two weeks ahead: always in the future and never a weekend
+    today = timezone.localdate()
+    return {
+        'facility_id': slot.field_id, 'slot_id': slot.id, 'date': (today + timedelta(days=14 - today.weekday())).isoformat(),
+        'time': '18:00 - 19:00', 'email': 'player@example.com', 'phone': '9800000000',
+    }
+
+
+class IdempotentReplayTests(TestCase):
+    """Retries of a booking with the same Idempotency-Key get the first response and book once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.slot = seed_slot()
+        cls.player = User.objects.create_user(email='idempotency-player@example.com', name='Player', role='USER')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.player)
+
+    def post(self, data, key):
+        return self.client.post('/api/bookings/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_a_retry_replays_the_first_response(self):
+        data = booking_request(self.slot)
+        first = self.post(data, 'book-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', first)
+
+        retry = self.post(data, 'book-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_a_key_reused_for_a_different_request_is_refused(self):
+        data = booking_request(self.slot)
+        self.assertEqual(self.post(data, 'book-1').status_code, 201)
+        response = self.post({**data, 'phone': '9811111111'}, 'book-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        data = booking_request(self.slot)
+        self.assertEqual(self.post(data, 'book-1').status_code, 201)
+        other = User.objects.create_user(email='idempotency-other@example.com', name='Other', role='USER')
+        self.client.force_authenticate(other)
+        # Not a replay of the first user's booking: the slot is taken by then
+        self.assertEqual(self.post(data, 'book-1').status_code, 409)
+
+    def test_a_client_error_is_replayed(self):
+        data = {**booking_request(self.slot), 'slot_id': 'x'}
+        self.assertEqual(self.post(data, 'book-1').status_code, 400)
+        retry = self.post(data, 'book-1')
+        self.assertEqual(retry.status_code, 400)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+
+class IdempotentInFlightTests(TransactionTestCase):
+    """A duplicate of a request that is still running waits for it, and is answered 409 once it waits too long."""
+
+    def setUp(self):
+        self.slot = seed_slot()
+        self.player = User.objects.create_user(email='idempotency-player@example.com', name='Player', role='USER')
+        self.client = APIClient()
+        self.client.force_authenticate(self.player)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0.2)
+    def test_a_duplicate_of_a_running_request_gets_409(self):
+        running, finish = threading.Event(), threading.Event()
+
+        def first_request():
+            # Holds the key's row uncommitted, as the first request does while its handler runs
+            try:
+                with transaction.atomic():
+                    IdempotencyKey.objects.create(
+                        user=self.player, key='book-1', fingerprint='first',
+                        expires_at=timezone.now() + timedelta(hours=1),
+                    )
+                    running.set()
+                    finish.wait(10)
+                    transaction.set_rollback(True)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=first_request)
+        thread.start()
+        try:
+            self.assertTrue(running.wait(10))
+            response = self.client.post(
+                '/api/bookings/', booking_request(self.slot), format='json', HTTP_IDEMPOTENCY_KEY='book-1',
+            )
+        finally:
+            finish.set()
+            thread.join()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.exists())
@@ -0,0 +1,168 @@
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import requests
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from futsalApp.esewa import PaymentCallbackWorker, record_callback
+from futsalApp.models import Booking, Facility, Payment, PaymentCallback, TimeSlot, User
+
+
+class PaymentCallbackWorkerTests(TestCase):
+    """
+    The worker applies the inbox in arrival order, once per (transaction_uuid,
+    status), and never confirms a booking it cannot honour. eSewa's status
+    check is patched: `verified` is what it answers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(email='callback-owner@example.com', name='Callback Owner', role='OWNER')
+        cls.player = User.objects.create_user(email='callback-player@example.com', name='Callback Player', role='USER')
+        cls.facility = Facility.objects.create(
+            name='Callback Arena', surface='Artificial Turf', size='40x20', capacity=10,
+            address='Callback Marg, Kathmandu', created_by=owner,
+        )
+        cls.slot = TimeSlot.objects.create(
+            field=cls.facility, start_time='18:00', end_time='19:00', price=1200, created_by=owner,
+        )
+        cls.day = timezone.localdate() + timedelta(days=7)
+
+    def book(self, day=None):
+        booking = Booking.objects.create(
+            customer=self.player, facility=self.facility, slot=self.slot, date=day or self.day, time='18:00 - 19:00',
+            start_time='18:00', price=1200, status='pending',
+        )
+        return Payment.objects.create(
+            booking=booking, amount=1200, total_amount=1200, transaction_uuid=str(uuid.uuid4()),
+            payment_status='Pending Payment',
+        )
+
+    def callback(self, payment, status, source=None, **payload):
+        record_callback(
+            {'transaction_uuid': payment.transaction_uuid, 'status': status, 'transaction_code': 'T1', **payload},
+            source or ('esewa_success' if status == 'COMPLETE' else 'esewa_failure'),
+        )
+        return PaymentCallback.objects.get(transaction_uuid=payment.transaction_uuid, status=status)
+
+    def run_worker(self, verified):
+        with mock.patch('futsalApp.esewa.check_status', return_value=verified) as check_status:
+            PaymentCallbackWorker.run()
+        return check_status
+
+    @staticmethod
+    def verified(payment, status='COMPLETE', total_amount=None):
+        return {'status': status, 'ref_id': 'R1', 'total_amount': str(total_amount or payment.total_amount)}
+
+    def test_a_complete_callback_confirms_the_booking(self):
+        payment = self.book()
+        self.callback(payment, 'COMPLETE', total_amount='1')
+        check_status = self.run_worker(self.verified(payment))
+
+        # The check asks about the payment's own amount, not the one the callback claims
+        check_status.assert_called_once_with(payment.transaction_uuid, payment.total_amount)
+        payment.refresh_from_db()
+        self.assertEqual(payment.payment_status, 'Fully Paid')
+        self.assertEqual(payment.booking.status, 'confirmed')
+        self.assertEqual(TimeSlot.objects.get(pk=self.slot.pk).status, 'booked')
+
+    def test_a_failure_after_completion_is_ignored(self):
+        payment = self.book()
+        self.callback(payment, 'COMPLETE')
+        canceled = self.callback(payment, 'CANCELED')
+        self.run_worker(self.verified(payment))
+
+        payment.refresh_from_db()
+        canceled.refresh_from_db()
+        self.assertEqual(payment.payment_status, 'Fully Paid')
+        self.assertEqual(payment.booking.status, 'confirmed')
+        self.assertEqual(canceled.result, 'Ignored: the payment is already confirmed')
+
+    def test_a_callback_waiting_for_retry_holds_back_later_ones(self):
+        payment, other = self.book(), self.book(self.day + timedelta(days=7))
+        complete = self.callback(payment, 'COMPLETE')
+        canceled = self.callback(payment, 'CANCELED')
+        other_canceled = self.callback(other, 'CANCELED')
+        self.run_worker(self.verified(payment, status='PENDING'))
+
+        complete.refresh_from_db()
+        canceled.refresh_from_db()
+        other_canceled.refresh_from_db()
+        self.assertIsNone(complete.processed_at)
+        self.assertEqual(complete.attempts, 1)
+        self.assertIsNone(canceled.processed_at)
+        self.assertEqual(canceled.attempts, 0)
+        # Other payments are not held back
+        self.assertIsNotNone(other_canceled.processed_at)
+
+        # Once eSewa confirms, the next run applies both in order
+        self.run_worker(self.verified(payment))
+        complete.refresh_from_db()
+        canceled.refresh_from_db()
+        self.assertEqual(complete.result, 'Confirmed')
+        self.assertEqual(canceled.result, 'Ignored: the payment is already confirmed')
+
+    @override_settings(PAYMENT_CALLBACK_MAX_ATTEMPTS=2)
+    def test_a_failing_status_check_is_given_up_on(self):
+        payment = self.book()
+        complete = self.callback(payment, 'COMPLETE')
+        for _ in range(2):
+            with mock.patch('futsalApp.esewa.check_status', side_effect=requests.ConnectionError('down')):
+                PaymentCallbackWorker.run()
+        complete.refresh_from_db()
+        self.assertIsNotNone(complete.processed_at)
+        self.assertEqual(complete.attempts, 2)
+        payment.refresh_from_db()
+        self.assertEqual(payment.payment_status, 'Pending Payment')
+
+    def test_a_repeated_callback_is_recorded_once(self):
+        payment = self.book()
+        for _ in range(2):
+            self.callback(payment, 'COMPLETE')
+        self.callback(payment, 'CANCELED')
+        self.assertEqual(PaymentCallback.objects.filter(transaction_uuid=payment.transaction_uuid).count(), 2)
+
+        check_status = self.run_worker(self.verified(payment))
+        check_status.assert_called_once()
+        # Recording it again after it was applied changes nothing either
+        self.callback(payment, 'COMPLETE')
+        self.assertFalse(PaymentCallback.objects.filter(processed_at__isnull=True).exists())
+
+    def test_a_canceled_booking_is_marked_for_refund(self):
+        payment = self.book()
+        Booking.objects.filter(pk=payment.booking_id).update(status='canceled')
+        complete = self.callback(payment, 'COMPLETE')
+        self.run_worker(self.verified(payment))
+
+        payment.refresh_from_db()
+        complete.refresh_from_db()
+        self.assertEqual(payment.payment_status, 'Refund Due')
+        self.assertEqual(payment.booking.status, 'canceled')
+        self.assertEqual(complete.result, 'Refund due: the booking has been canceled')
+        self.assertEqual(TimeSlot.objects.get(pk=self.slot.pk).status, 'available')
+
+    def test_a_confirmation_for_another_amount_is_marked_for_refund(self):
+        payment = self.book()
+        self.callback(payment, 'COMPLETE')
+        self.run_worker(self.verified(payment, total_amount=Decimal('10')))
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.payment_status, 'Refund Due')
+        self.assertEqual(payment.booking.status, 'pending')
+
+    def test_a_taken_slot_is_marked_for_refund(self):
+        payment = self.book()
+        # Booked by someone else while this payment was pending
+        Booking.objects.create(
+            customer=self.player, facility=self.facility, slot=self.slot, date=self.day, time='18:00 - 19:00',
+            start_time='18:00', price=1200, status='confirmed',
+        )
+        self.callback(payment, 'COMPLETE')
+        self.run_worker(self.verified(payment))
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.payment_status, 'Refund Due')
+        self.assertEqual(payment.booking.status, 'pending')
@@ -0,0 +1,34 @@
+import json
+
+from django.db import connection
+from django.test import TestCase
+
+from futsalApp.management.commands.check_query_plans import Command
+
+
+class HotQueryPlanTests(TestCase):
+    """
+    The hot queries of `manage.py check_query_plans`, planned against its
+    seeded dataset: none of them may sequentially scan a hot table.
+    """
+    BOOKINGS = 20000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.customer, cls.facilities, cls.slots = Command().seed(cls.BOOKINGS)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def plans(self):
+        for label, queryset in Command.queries(self.owner, self.customer, self.facilities, self.slots):
+            yield label, json.loads(queryset.explain(format='json'))[0]['Plan']
+
+    def test_hot_queries_use_an_index(self):
+        for label, plan in self.plans():
+            with self.subTest(query=label):
+                self.assertEqual(Command.sequential_scans(plan), [])
+
+    def test_sequential_scans_are_detected(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_indexscan = off; SET LOCAL enable_bitmapscan = off')
+        self.assertTrue(any(Command.sequential_scans(plan) for _, plan in self.plans()))
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from futsalApp import tokens
+from futsalApp.models import LoginDevice, User
+
+
+class RefreshTokenRotationTests(TestCase):
+    """
+    Every refresh replaces the token with one of the next generation. A
+    genuine token of an older generation is a replay and revokes the device;
+    a token that does not authenticate is only refused.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='token-player@example.com', name='Token Player', role='USER')
+
+    def setUp(self):
+        self.device = LoginDevice.objects.create(user=self.user, device_name='Phone', location='Kathmandu')
+        self.token = tokens.set_refresh_token(self.device)
+        self.device.save()
+
+    def test_rotation_issues_the_next_generation(self):
+        device, token = tokens.rotate_refresh_token(self.token)
+        self.assertEqual(device.pk, self.device.pk)
+        self.assertNotEqual(token, self.token)
+        self.assertEqual(LoginDevice.objects.get(pk=self.device.pk).rt_generation, 2)
+        # The new token rotates in turn
+        self.assertEqual(tokens.rotate_refresh_token(token)[0].pk, self.device.pk)
+
+    def test_a_reused_token_revokes_the_device(self):
+        _, token = tokens.rotate_refresh_token(self.token)
+        with self.assertRaises(AuthenticationFailed):
+            tokens.rotate_refresh_token(self.token)
+        self.assertFalse(LoginDevice.objects.filter(pk=self.device.pk).exists())
+        # Whoever holds the newer token has to log in again too
+        with self.assertRaises(AuthenticationFailed):
+            tokens.rotate_refresh_token(token)
+
+    def test_a_forged_token_is_refused_without_revoking(self):
+        device_hex, generation, secret = self.token.split('.')
+        for token in (
+            f'{device_hex}.{generation}.{"0" * len(secret)}',
+            f'{device_hex}.0.{secret}',
+            'not-a-token',
+        ):
+            with self.subTest(token=token), self.assertRaises(AuthenticationFailed):
+                tokens.rotate_refresh_token(token)
+        self.assertTrue(LoginDevice.objects.filter(pk=self.device.pk).exists())
+        self.assertEqual(tokens.rotate_refresh_token(self.token)[0].pk, self.device.pk)
+
+    def test_an_expired_token_is_refused(self):
+        LoginDevice.objects.filter(pk=self.device.pk).update(rt_expires_at=timezone.now() - timedelta(seconds=1))
+        with self.assertRaises(AuthenticationFailed):
+            tokens.rotate_refresh_token(self.token)
+        self.assertTrue(LoginDevice.objects.filter(pk=self.device.pk).exists())
+
+    def test_a_token_signed_with_a_retired_secret_key_still_rotates(self):
+        with override_settings(SECRET_KEY='retired-secret-key', SECRET_KEY_FALLBACKS=[]):
+            device = LoginDevice.objects.get(pk=self.device.pk)
+            token = tokens.set_refresh_token(device)
+            device.save()
+        with override_settings(SECRET_KEY_FALLBACKS=['retired-secret-key']):
+            self.assertEqual(tokens.rotate_refresh_token(token)[0].pk, self.device.pk)
+
+
+@override_settings(AUTH_JWT_KEYS={'k1': 'first-test-key', 'k2': 'second-test-key'}, AUTH_JWT_ACTIVE_KID='k2')
+class AccessTokenTests(TestCase):
+    """Access tokens carry the user's identity; what the user may do is read from the database."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='token-owner@example.com', name='Token Owner', role='OWNER')
+        cls.device = LoginDevice.objects.create(user=cls.user, device_name='Laptop')
+
+    def setUp(self):
+        tokens._user_states.clear()
+
+    def test_a_token_authenticates_its_user(self):
+        claims = tokens.decode_access_token(tokens.issue_access_token(self.user, self.device))
+        user = tokens.user_from_claims(claims)
+        self.assertEqual((user.pk, user.email, user.role), (self.user.pk, self.user.email, 'OWNER'))
+
+    def test_a_token_signed_with_an_older_key_is_accepted(self):
+        with self.settings(AUTH_JWT_ACTIVE_KID='k1'):
+            token = tokens.issue_access_token(self.user, self.device)
+        self.assertEqual(tokens.decode_access_token(token)['sub'], str(self.user.pk))
+        with self.settings(AUTH_JWT_KEYS={'k2': 'second-test-key'}), self.assertRaises(AuthenticationFailed):
+            tokens.decode_access_token(token)
+
+    def test_a_tampered_token_is_refused(self):
+        header, payload, signature = tokens.issue_access_token(self.user, self.device).split('.')
+        with self.assertRaises(AuthenticationFailed):
+            tokens.decode_access_token(f'{header}.{payload}.{signature[::-1]}')
+
+    def test_the_user_state_is_reused_until_it_expires(self):
+        claims = tokens.decode_access_token(tokens.issue_access_token(self.user, self.device))
+        tokens.user_from_claims(claims)
+        User.objects.filter(pk=self.user.pk).update(role='USER', disabled_by_admin=True)
+        with self.assertNumQueries(0):
+            self.assertEqual(tokens.user_from_claims(claims).role, 'OWNER')
+        # As if AUTH_USER_STATE_TTL had passed
+        tokens._user_states.clear()
+        with self.assertRaises(AuthenticationFailed):
+            tokens.user_from_claims(claims)
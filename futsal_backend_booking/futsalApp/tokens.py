@@ -0,0 +1,179 @@
+# futsalApp/tokens.py
+import hmac
+import logging
+import threading
+import time
+import uuid
+from datetime import timedelta
+import jwt
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+
+from .models import LoginDevice, User
+
+logger = logging.getLogger(__name__)
+
+# User fields carried in the access token
+CLAIM_FIELDS = {'id': 'sub', 'name': 'name', 'email': 'email'}
+
+# User fields that grant or withdraw access. They are never taken from the
+# token: authenticating reads them from the database and each worker reuses
+# them for AUTH_USER_STATE_TTL, so demoting or disabling a user takes effect
+# within that long, while a user's steady stream of requests costs no query.
+AUTHORIZATION_FIELDS = ('role', 'is_staff', 'is_superuser', 'is_active', 'disabled_by_admin')
+
+_user_states = {}
+_user_states_lock = threading.Lock()
+
+
+def issue_access_token(user, device):
+    """
+    A signed access token for the user on this login device, signed with
+    the active key and naming it in the `kid` header.
+    """
+    now = timezone.now()
+    payload = {
+        'iss': settings.AUTH_JWT_ISSUER,
+        'typ': 'access',
+        'iat': now,
+        'exp': now + timedelta(seconds=settings.AUTH_ACCESS_TOKEN_TTL),
+        'dev': str(device.device_id),
+        **{claim: getattr(user, field) for field, claim in CLAIM_FIELDS.items()},
+        'sub': str(user.id),  # registered claims are strings
+    }
+    kid = settings.AUTH_JWT_ACTIVE_KID
+    return jwt.encode(
+        payload, settings.AUTH_JWT_KEYS[kid], algorithm=settings.AUTH_JWT_ALGORITHM, headers={'kid': kid},
+    )
+
+
+def decode_access_token(token):
+    """Verify an access token against the key its `kid` names. Raises AuthenticationFailed."""
+    try:
+        kid = jwt.get_unverified_header(token).get('kid')
+        key = settings.AUTH_JWT_KEYS.get(kid)
+        if key is None:
+            raise AuthenticationFailed("Access token is signed with an unknown key")
+        claims = jwt.decode(
+            token, key,
+            algorithms=[settings.AUTH_JWT_ALGORITHM],
+            issuer=settings.AUTH_JWT_ISSUER,
+            leeway=settings.AUTH_JWT_LEEWAY,
+            options={'require': ['exp', 'iat', 'sub', 'typ']},
+        )
+    except jwt.ExpiredSignatureError:
+        raise AuthenticationFailed("Access token has expired")
+    except jwt.InvalidTokenError:
+        raise AuthenticationFailed("Invalid access token")
+    if claims['typ'] != 'access':
+        raise AuthenticationFailed("Invalid access token")
+    return claims
+
+
+def authorization_state(user_id):
+    """
+    The user's AUTHORIZATION_FIELDS, or None if there is no such user, read
+    with one primary-key lookup at most once per AUTH_USER_STATE_TTL in this
+    process.
+    """
+    now = time.monotonic()
+    cached = _user_states.get(user_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    row = User.objects.filter(id=user_id).values(*AUTHORIZATION_FIELDS).first()
+    with _user_states_lock:
+        if len(_user_states) >= settings.AUTH_USER_STATE_MAX_ENTRIES:
+            for key in [key for key, (expires, _) in _user_states.items() if expires <= now]:
+                del _user_states[key]
+            if len(_user_states) >= settings.AUTH_USER_STATE_MAX_ENTRIES:
+                _user_states.clear()
+        _user_states[user_id] = (now + settings.AUTH_USER_STATE_TTL, row)
+    return row
+
+
+def user_from_claims(claims):
+    """
+    The token's user: its identity from the claims, its AUTHORIZATION_FIELDS
+    from authorization_state(). Other fields are deferred: reading one loads
+    it, and save() only writes the fields that were loaded. Raises
+    AuthenticationFailed if the user is gone or disabled.
+    """
+    values = {field: claims.get(claim) for field, claim in CLAIM_FIELDS.items()}
+    values['id'] = int(claims['sub'])
+    row = authorization_state(values['id'])
+    if row is None or not row['is_active'] or row['disabled_by_admin']:
+        raise AuthenticationFailed("User not found or disabled")
+    values.update(row)
+    fields = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    return User.from_db('default', fields, [values[name] for name in fields])
+
+
+REFRESH_TOKEN_SALT = 'futsalApp.tokens.refresh'
+
+
+def _refresh_secrets(device_id, generation):
+    """
+    The secret part of the device's refresh token of this generation, under
+    SECRET_KEY first and then each of SECRET_KEY_FALLBACKS. It is derived
+    rather than random, so a token of any generation can be authenticated,
+    not only the current one, and nothing secret is stored.
+    """
+    value = f'{device_id.hex}.{generation}'
+    return [
+        salted_hmac(REFRESH_TOKEN_SALT, value, secret=key, algorithm='sha256').hexdigest()
+        for key in (settings.SECRET_KEY, *settings.SECRET_KEY_FALLBACKS)
+    ]
+
+
+def is_refresh_token(token):
+    return token.count('.') == 2
+
+
+def set_refresh_token(device):
+    """Give the device a new refresh token of the next generation and return it. The caller saves the device."""
+    device.rt_generation += 1
+    token = f'{device.device_id.hex}.{device.rt_generation}.{_refresh_secrets(device.device_id, device.rt_generation)[0]}'
+    device.rt_expires_at = timezone.now() + timedelta(seconds=settings.AUTH_REFRESH_TOKEN_TTL)
+    return token
+
+
+def rotate_refresh_token(token):
+    """
+    Exchange a refresh token for (device, new refresh token). A genuine token
+    of an older generation than the device's current one has already been
+    rotated, so someone is replaying it: the device is revoked and both
+    holders have to log in again. A token that does not authenticate is
+    merely refused, so guessing cannot log anyone out. Raises
+    AuthenticationFailed.
+    """
+    try:
+        device_hex, generation, secret = token.split('.')
+        device_id, generation = uuid.UUID(hex=device_hex), int(generation)
+    except ValueError:
+        raise AuthenticationFailed("Invalid refresh token")
+    if not any(hmac.compare_digest(secret, expected) for expected in _refresh_secrets(device_id, generation)):
+        raise AuthenticationFailed("Invalid refresh token")
+
+    with transaction.atomic():
+        device = LoginDevice.objects.select_for_update(of=('self',)).select_related('user').filter(device_id=device_id).first()
+        if device is None or generation > device.rt_generation:
+            raise AuthenticationFailed("Invalid refresh token")
+        user = device.user
+        reused = generation < device.rt_generation
+        if reused:
+            logger.warning(f"Refresh token reuse for user {user.id} on device {device_id}, revoking the device")
+            device.delete()
+        else:
+            if device.rt_expires_at is None or device.rt_expires_at < timezone.now():
+                raise AuthenticationFailed("Refresh token has expired")
+            if not user.is_active or user.disabled_by_admin:
+                raise PermissionDenied("User account has been disabled by admin, please contact support")
+            new_token = set_refresh_token(device)
+            device.save(update_fields=['rt_generation', 'rt_expires_at'])
+    # Raised outside the transaction so that the revocation commits
+    if reused:
+        raise AuthenticationFailed("Refresh token has already been used, please log in again")
+    return device, new_token
@@ -0,0 +1,115 @@
+# futsalApp/uploads.py
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import PermissionDenied
+
+from .exceptions import CustomAPIException
+from .models import Facility, FacilityImage, User
+from .utils import delete_files
+
+# Where each kind of direct upload is attached
+UPLOAD_FIELDS = {
+    'avatar': User._meta.get_field('avatar'),
+    'thumbnail': Facility._meta.get_field('thumbnail'),
+    'facility_image': FacilityImage._meta.get_field('image'),
+}
+
+TICKET_SALT = 'futsalApp.uploads.ticket'
+
+
+def is_image(file, content_type):
+    """True if the file holds a well-formed image of the given content type (checked with Pillow)."""
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            mimetype = image.get_format_mimetype()
+            image.verify()
+        return mimetype == content_type
+    except Exception:  # Pillow raises all sorts for malformed files, as Django's ImageField knows
+        return False
+    finally:
+        file.seek(0)
+
+
+class DirectUpload:
+    """
+    Uploads that go from the client straight to the storage. start() names
+    the file and returns a presigned upload target together with a signed
+    ticket; once the client has sent the file it hands the ticket to
+    complete(), which checks the file arrived and is an image of the
+    announced type, then attaches it. The upload itself does not pass through
+    Django; the check reads the stored file back.
+    """
+
+    @staticmethod
+    def _owned_facility(user, facility_id, lock=False):
+        queryset = Facility.objects.select_for_update() if lock else Facility.objects.all()
+        facility = queryset.filter(id=facility_id).first()
+        if facility is None:
+            raise CustomAPIException("Facility not found", status.HTTP_404_NOT_FOUND)
+        if facility.created_by_id != user.id:
+            raise PermissionDenied("Only the facility owner can upload its images")
+        return facility
+
+    @staticmethod
+    def start(user, kind, filename, content_type, size, facility_id=None):
+        if kind != 'avatar':
+            DirectUpload._owned_facility(user, facility_id)
+        name = default_storage.upload_name(UPLOAD_FIELDS[kind].upload_to, filename, content_type)
+        ttl = settings.MEDIA_UPLOAD_URL_TTL
+        ticket = signing.dumps(
+            {'name': name, 'kind': kind, 'facility': facility_id, 'user': user.id, 'size': size, 'type': content_type},
+            salt=TICKET_SALT,
+        )
+        return {
+            'name': name,
+            'ticket': ticket,
+            'upload': default_storage.upload_target(name, content_type, size, ttl),
+            'expires_in': ttl,
+        }
+
+    @staticmethod
+    def complete(user, ticket):
+        """Attach an uploaded file. Returns (kind, the object it was attached to). Safe to repeat."""
+        try:
+            # The upload may start just before its URL expires
+            data = signing.loads(ticket, salt=TICKET_SALT, max_age=settings.MEDIA_UPLOAD_URL_TTL * 2)
+        except signing.BadSignature:
+            raise CustomAPIException("Invalid or expired upload ticket", status.HTTP_400_BAD_REQUEST)
+        if data['user'] != user.id:
+            raise PermissionDenied("This upload belongs to another user")
+        name, kind = data['name'], data['kind']
+        try:
+            size = default_storage.size(name)
+        except OSError:
+            raise CustomAPIException("The file has not been uploaded yet", status.HTTP_409_CONFLICT)
+        if size > data['size']:
+            default_storage.delete(name)
+            raise CustomAPIException("The uploaded file is larger than announced", status.HTTP_400_BAD_REQUEST)
+        with default_storage.open(name) as file:
+            valid = is_image(file, data['type'])
+        if not valid:
+            default_storage.delete(name)
+            raise CustomAPIException(f"The uploaded file is not a valid {data['type']} image", status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            if kind == 'facility_image':
+                facility = DirectUpload._owned_facility(user, data['facility'])
+                target, _ = FacilityImage.objects.get_or_create(facility=facility, image=name)
+                return kind, target
+            if kind == 'avatar':
+                target = User.objects.select_for_update().get(id=user.id)
+                field = 'avatar'
+            else:
+                target = DirectUpload._owned_facility(user, data['facility'], lock=True)
+                field = 'thumbnail'
+            previous = getattr(target, field).name
+            if previous != name:
+                setattr(target, field, name)
+                target.save(update_fields=[field, 'updated_at'])
+                transaction.on_commit(lambda: delete_files([previous]))
+        return kind, target
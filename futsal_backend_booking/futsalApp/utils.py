@@ -1,8 +1,13 @@
 import random
 import string
-from django.core.mail import send_mail
+import base64
+import json
+import itertools
+from asgiref.sync import sync_to_async
+from django.core.mail import EmailMessage, send_mail
 from django.conf import settings
 from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
 from rest_framework.response import Response
 
 def generate_otp(length=6):
@@ -33,12 +38,23 @@ def send_password_reset_mail(name, email, otp):
     message = f'Hi {name},\n\nYour OTP for password reset is {otp}. It is valid for 15 minutes.'
     send_mail(subject, message, settings.EMAIL_HOST_USER, [email])
 
+def booking_reminder_mail(name, email, facility_name, date, time):
+    subject = 'Booking Reminder'
+    message = f'Hi {name},\n\nThis is a reminder of your booking at {facility_name} on {date:%A, %d %B %Y} ({time}). See you there!'
+    return EmailMessage(subject, message, settings.EMAIL_HOST_USER, [email])
+
 def generate_file_url(request, file_path):
-    return request.build_absolute_uri(f'/media/{file_path}')
+    # MEDIA_URL may be another host (a CDN), which build_absolute_uri leaves as is
+    return request.build_absolute_uri(default_storage.url(file_path))
 
 def delete_file(file_path):
-    if default_storage.exists(file_path):
-        default_storage.delete(file_path)
+    # Deleting a missing file is a no-op on every backend, so there is no exists() round trip first
+    default_storage.delete(file_path)
+
+def delete_files(file_paths):
+    file_paths = [file_path for file_path in file_paths if file_path]
+    if file_paths:
+        default_storage.delete_many(file_paths)
 
 # futsalApp/utils.py
 def get_response(status, message, data=None, status_code=None):
@@ -47,4 +63,49 @@ def get_response(status, message, data=None, status_code=None):
         "message": message,
         "data": data or {}
     }
-    return Response(response_data, status=status_code or 200)
\ No newline at end of file
+    return Response(response_data, status=status_code or 200)
+
+def encode_cursor(values):
+    """Encode keyset pagination values into an opaque URL-safe cursor."""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, returning None if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+
+def is_asgi_request(request):
+    # DRF wraps the Django request; the handler that created it tells how the response is sent
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+async def _iterate_in_thread(iterable, batch_size, thread_sensitive):
+    iterator = iter(iterable)
+    next_batch = sync_to_async(lambda: list(itertools.islice(iterator, batch_size)), thread_sensitive=thread_sensitive)
+    try:
+        while True:
+            batch = await next_batch()
+            if not batch:
+                return
+            for item in batch:
+                yield item
+    finally:
+        # Closing a generator runs its cleanup (closing files or cursors), which must not block the event loop
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=thread_sensitive)()
+
+def streaming_body(request, iterable, batch_size=100, thread_sensitive=True):
+    """
+    Content for a StreamingHttpResponse. Under ASGI Django reads a synchronous
+    iterator to its end before sending the first byte, so there the iterator
+    is pulled batch_size items at a time from a worker thread instead (the
+    shared sync thread when thread_sensitive, which database cursors need).
+    Under WSGI it is returned as is.
+    """
+    if not is_asgi_request(request):
+        return iterable
+    return _iterate_in_thread(iterable, batch_size, thread_sensitive)
\ No newline at end of file
@@ -1,35 +1,64 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied
 from rest_framework import status
 from .serializers import (
     CreateUserSerializer, VerifyEmailSerializer, ResendOTPSerializer, SignInSerializer,
     RefreshTokenSerializer, UpdateProfileSerializer, ChangePasswordSerializer,
     RequestPasswordResetSerializer, VerifyPasswordResetSerializer, ResetPasswordSerializer,
     UserSerializer,
-    FacilitySerializer, TimeSlotSerializer, AmenitySerializer, BusinessInfoSerializer,FacilityImageSerializer,ReviewSerializer,PaymentSerializer,BookingSerializer
+    FacilitySerializer, TimeSlotSerializer, AmenitySerializer, BusinessInfoSerializer,FacilityImageSerializer,ReviewSerializer,PaymentSerializer,BookingSerializer,
+    HolidaySerializer, DirectUploadSerializer, DirectUploadCompleteSerializer, BatchSerializer,
+    FieldSelection, with_related
 )
 from rest_framework.decorators import action
-from .services import AuthService
+from .services import AuthService, BookingService
 from rest_framework.parsers import MultiPartParser, FormParser
-from .models import Facility, TimeSlot, Amenity, BusinessInfo, FacilityImage, Review, User, Booking, Payment
+from .models import Facility, TimeSlot, Amenity, BusinessInfo, FacilityImage, Review, User, Booking, BookingEvent, Payment, Holiday
 from rest_framework import generics, permissions
-from .utils import get_response
+from rest_framework.serializers import ListSerializer
+from .utils import get_response, encode_cursor, decode_cursor, delete_file, delete_files, streaming_body
+from .filters import FacilityFilter
+from .mixins import ConditionalGetMixin
+from .cache import DashboardCache
+from .exports import stream_csv, stream_xlsx
+from .events import publish_booking_event, slot_channel, stream_slot_events
+from .eventlog import EVENT_COLUMNS, booking_event, events_between, payment_event, record
+from .pricing import PAYMENT_TYPES, bookable_slots, quote, quote_month
+from .geo import nearby
+from .holidays import invalidate_holiday_index, parse_csv, parse_ics
+from .flat_serializers import booking_list_serializer, facility_list_serializer, review_list_serializer
+from .archive import archived_bookings, get_booking, resolve
+from .media import media_response
+from .storage import LocalObjectStorage, clean_media_name, is_public_media
+from .uploads import DirectUpload, is_image
+from .batch import run_batch
+from .idempotency import idempotent
+from .esewa import FAILURE_STATUSES, STATUSES, has_valid_signature, parse_callback, record_callback
 import logging
 import calendar
-import json
+import functools
+import heapq
+import itertools
 import hmac
 import hashlib
 import base64
 import uuid
-import requests
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.utils import timezone
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Sum, Avg, Q, Count
+from django.db import transaction
+from django.db.models import Sum, Avg, Q, Count, F, FloatField
+from django.db.models.functions import Cast
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchHeadline
 from rest_framework.decorators import api_view, permission_classes
 from django.conf import settings
-from django.http import HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse, JsonResponse
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
 from django.urls import reverse
 
 logger = logging.getLogger(__name__)
@@ -212,15 +241,26 @@ class FetchUserView(generics.RetrieveAPIView):
         return get_response("success", "User retrieved successfully", serializer.data)
 
 # Facility Views
-class FacilityListCreateView(generics.ListCreateAPIView):
+class FacilityListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     permission_classes = []
     queryset = Facility.objects.all()
     serializer_class = FacilitySerializer
+    public_cache = True
+    # Slot prices decide which facilities the price filter and facets return
+    list_dependencies = (TimeSlot,)
+
+    def get_queryset(self):
+        return FacilityFilter(self.request.query_params).filter_queryset(super().get_queryset())
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return get_response("success", "Facilities retrieved successfully", serializer.data)
+        data = facility_list_serializer.serialize(queryset.order_by('pk'), request)
+        if request.query_params.get('facets') in ('1', 'true'):
+            return get_response("success", "Facilities retrieved successfully", {
+                "results": data,
+                "facets": FacilityFilter(request.query_params).facet_counts(queryset),
+            })
+        return get_response("success", "Facilities retrieved successfully", data)
     
     pagination_class = [permissions.IsAuthenticated]
     def create(self, request, *args, **kwargs):
@@ -242,6 +282,154 @@ class FacilityListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
         
+class FacilitySearchView(APIView):
+    """
+    Ranked full-text search over facilities (default) or review comments
+    (?scope=reviews), paginated with an opaque (rank, id) keyset cursor.
+    """
+    permission_classes = []
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+    HEADLINE_OPTIONS = {'start_sel': '<mark>', 'stop_sel': '</mark>', 'max_fragments': 2}
+
+    def get(self, request):
+        term = request.query_params.get('q', '').strip()
+        if not term:
+            return get_response("error", "ValidationError", {"detail": "Query parameter 'q' is required"}, status.HTTP_400_BAD_REQUEST)
+
+        scope = request.query_params.get('scope', 'facilities')
+        if scope not in ('facilities', 'reviews'):
+            return get_response("error", "ValidationError", {"detail": "scope must be 'facilities' or 'reviews'"}, status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = int(request.query_params.get('limit', self.DEFAULT_LIMIT))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return get_response("error", "ValidationError", {"detail": "limit must be a positive integer"}, status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, self.MAX_LIMIT)
+
+        position = None
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            position = decode_cursor(cursor)
+            # A [rank, id] pair; bool is an int subclass, so it is ruled out explicitly
+            if not (
+                isinstance(position, list) and len(position) == 2
+                and isinstance(position[0], (int, float)) and isinstance(position[1], int)
+                and not any(isinstance(value, bool) for value in position)
+            ):
+                return get_response("error", "ValidationError", {"detail": "Invalid cursor"}, status.HTTP_400_BAD_REQUEST)
+
+        query = SearchQuery(term, search_type='websearch', config='english')
+        if scope == 'reviews':
+            queryset = Review.objects.filter(search_vector=query).annotate(
+                comment_highlight=SearchHeadline('comment', query, config='english', **self.HEADLINE_OPTIONS),
+            )
+        else:
+            queryset = with_related(
+                Facility.objects.filter(search_vector=query), FacilitySerializer, FieldSelection.from_request(request),
+            ).annotate(
+                name_highlight=SearchHeadline('name', query, config='english', **self.HEADLINE_OPTIONS),
+                address_highlight=SearchHeadline('address', query, config='english', **self.HEADLINE_OPTIONS),
+            )
+        # Cast the real-valued rank to double so it round-trips through the cursor exactly
+        queryset = queryset.annotate(rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+        if position:
+            rank, last_id = position
+            queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__lt=last_id))
+        rows = list(queryset.order_by('-rank', '-id')[:limit + 1])
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1].rank, rows[-1].id])
+
+        if scope == 'reviews':
+            results = ReviewSerializer(rows, many=True, context={'request': request}).data
+            for item, row in zip(results, rows):
+                item['rank'] = row.rank
+                item['highlights'] = {'comment': row.comment_highlight}
+        else:
+            results = FacilitySerializer(rows, many=True, context={'request': request}).data
+            for item, row in zip(results, rows):
+                item['rank'] = row.rank
+                item['highlights'] = {'name': row.name_highlight, 'address': row.address_highlight}
+
+        return get_response("success", "Search results retrieved successfully", {
+            "results": results,
+            "next_cursor": next_cursor,
+        })
+
+class NearbyFacilityView(APIView):
+    """
+    The nearest active facilities within ?radius= km (default
+    NEARBY_DEFAULT_RADIUS_KM) of ?lat=&lng=, nearest first, from the
+    in-process geo index. With ?date=YYYY-MM-DD only facilities with a free
+    slot that day are returned (running at ?time=HH:MM when given), along
+    with those slots.
+    """
+    permission_classes = []
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            latitude, longitude = float(params['lat']), float(params['lng'])
+        except (KeyError, ValueError):
+            return get_response("error", "ValidationError", {"detail": "lat and lng must be numbers"}, status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return get_response("error", "ValidationError", {"detail": "lat/lng out of range"}, status.HTTP_400_BAD_REQUEST)
+
+        try:
+            radius = float(params.get('radius', settings.NEARBY_DEFAULT_RADIUS_KM))
+            limit = int(params.get('limit', self.DEFAULT_LIMIT))
+        except ValueError:
+            radius = limit = 0
+        if radius <= 0 or limit < 1:
+            return get_response("error", "ValidationError", {"detail": "radius and limit must be positive numbers"}, status.HTTP_400_BAD_REQUEST)
+        radius = min(radius, settings.NEARBY_MAX_RADIUS_KM)
+        limit = min(limit, self.MAX_LIMIT)
+
+        day = at = None
+        if params.get('date'):
+            try:
+                day = parse_date(params['date'])
+                at = parse_time(params['time']) if params.get('time') else None
+            except ValueError:  # well formed but impossible, such as 2026-02-30 or 25:00
+                day = None
+            if day is None or (params.get('time') and at is None):
+                return get_response("error", "ValidationError", {"detail": "date must be YYYY-MM-DD and time HH:MM"}, status.HTTP_400_BAD_REQUEST)
+
+        slots = {}
+
+        def has_free_slots(facility_ids):
+            slots.update(bookable_slots(facility_ids, day, at))
+            return {facility_id for facility_id in facility_ids if slots[facility_id]}
+
+        keep = has_free_slots if day is not None else None
+        nearest = nearby(latitude, longitude, radius, limit, keep)
+        queryset = Facility.objects.filter(id__in=[facility_id for _, facility_id in nearest], status='active')
+        selection = FieldSelection.from_request(request)
+        facilities = {
+            item['id']: item
+            for item in facility_list_serializer.serialize(queryset.order_by('pk'), request, selection and selection.including('id'))
+        }
+        results = []
+        for distance, facility_id in nearest:
+            item = facilities.get(facility_id)
+            if item is None:
+                continue  # changed since this worker built its index
+            item['distance_km'] = round(distance, 3)
+            if day is not None:
+                item['available_slots'] = [
+                    {'slot_id': slot_id, 'time': f"{start:%H:%M} - {end:%H:%M}"}
+                    for slot_id, (start, end) in slots[facility_id]
+                ]
+            results.append(item)
+        return get_response("success", "Nearby facilities retrieved successfully", {"results": results})
+
 class ReviewCreateView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ReviewSerializer
@@ -265,9 +453,35 @@ class ReviewListView(generics.ListAPIView):
     serializer_class = ReviewSerializer
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return get_response("success", "Reviews retrieved successfully", serializer.data)
+        data = review_list_serializer.serialize(self.get_queryset().order_by('pk'), request)
+        return get_response("success", "Reviews retrieved successfully", data)
+
+class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ReviewSerializer
+
+    def get_queryset(self):
+        # Reviews can only be changed by their author
+        return Review.objects.filter(user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        return get_response("success", "Review retrieved successfully", serializer.data)
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        if serializer.is_valid():
+            self.perform_update(serializer)
+            return get_response("success", "Review updated successfully", serializer.data)
+        return get_response("error", "ValidationError", {"detail": serializer.errors}, status.HTTP_400_BAD_REQUEST)
+
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        self.perform_destroy(instance)
+        return get_response("success", "Review deleted successfully", {}, status.HTTP_204_NO_CONTENT)
 
 class FacilityReviewListView(generics.ListAPIView):
     serializer_class = ReviewSerializer
@@ -277,21 +491,27 @@ class FacilityReviewListView(generics.ListAPIView):
         return Review.objects.filter(facility_id=facility_id)
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return get_response("success", "Reviews retrieved successfully", serializer.data)
+        data = review_list_serializer.serialize(self.get_queryset().order_by('pk'), request)
+        return get_response("success", "Reviews retrieved successfully", data)
 
-class FacilityDetailView(generics.RetrieveUpdateDestroyAPIView):
+class FacilityDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Facility.objects.all()
     serializer_class = FacilitySerializer
 
+    def get_queryset(self):
+        if self.request.method == 'GET':
+            return with_related(super().get_queryset(), FacilitySerializer, FieldSelection.from_request(self.request))
+        return super().get_queryset()
+
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
-        facility_images = FacilityImage.objects.filter(facility=instance)
-        images_serializer = FacilityImageSerializer(facility_images, many=True)
         data = serializer.data
-        data['images'] = images_serializer.data
+        images = serializer.fields.get('images')
+        if isinstance(images, ListSerializer):
+            # Image URLs here have always been relative, unlike the rest of the payload
+            images_serializer = FacilityImageSerializer(instance.images.all(), many=True, selection=images.child.selection)
+            data['images'] = images_serializer.data
         return get_response("success", "Facility retrieved successfully", data)
 
     permission_classes = [permissions.IsAuthenticated]
@@ -302,8 +522,10 @@ class FacilityDetailView(generics.RetrieveUpdateDestroyAPIView):
         serializer.is_valid(raise_exception=True)
         thumbnail = request.FILES.get('thumbnail')
         if thumbnail:
+            previous = instance.thumbnail.name
             instance.thumbnail = thumbnail
-            instance.save()
+            instance.save(update_fields=['thumbnail', 'updated_at'])
+            delete_files([previous])
         if serializer.is_valid():
             self.perform_update(serializer)
             return get_response("success", "Facility updated successfully", serializer.data)
@@ -311,7 +533,10 @@ class FacilityDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
-        self.perform_destroy(instance)
+        files = [instance.thumbnail.name, *FacilityImage.objects.filter(facility=instance).values_list('image', flat=True)]
+        with transaction.atomic():
+            self.perform_destroy(instance)
+            transaction.on_commit(lambda: delete_files(files))
         return get_response("success", "Facility deleted successfully", {}, status.HTTP_204_NO_CONTENT)
 
     def perform_update(self, serializer):
@@ -358,6 +583,7 @@ class FacilityImageDeleteView(generics.DestroyAPIView):
             image_id = kwargs.get('pk')
             image = FacilityImage.objects.get(id=image_id)
             image.delete()
+            delete_file(image.image.name)
             return get_response("success", "Image deleted successfully", {}, status.HTTP_204_NO_CONTENT)
         except FacilityImage.DoesNotExist:
             return get_response("error", "Image not found", {}, status.HTTP_404_NOT_FOUND)
@@ -380,11 +606,7 @@ def update_facility_features(request, id):
         features = data.get('features', [])
 
         # Validate features (optional: ensure they are valid feature names)
-        valid_features = [
-            "goals", "scoreboard", "lights", "benches",
-            "referee", "ac", "recording", "spectator"
-        ]
-        if not all(feature in valid_features for feature in features):
+        if not all(feature in Facility.FEATURE_CHOICES for feature in features):
             return Response(
                 {'status': 'error', 'message': 'Invalid feature name provided'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -392,7 +614,7 @@ def update_facility_features(request, id):
 
         # Update the features field
         facility.features = features
-        facility.save()
+        facility.save(update_fields=['features', 'updated_at'])
 
         # Serialize and return the updated facility
         serializer = FacilitySerializer(facility)
@@ -407,9 +629,10 @@ def update_facility_features(request, id):
         )
 
 # TimeSlot Views
-class TimeSlotListCreateView(generics.ListCreateAPIView):
+class TimeSlotListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = TimeSlot.objects.all()
     serializer_class = TimeSlotSerializer
+    public_cache = True
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -427,7 +650,7 @@ class TimeSlotListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
         
-class TimeSlotDetailView(generics.RetrieveUpdateDestroyAPIView):
+class TimeSlotDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = TimeSlot.objects.all()
     serializer_class = TimeSlotSerializer
 
@@ -454,8 +677,134 @@ class TimeSlotDetailView(generics.RetrieveUpdateDestroyAPIView):
     def perform_update(self, serializer):
         serializer.save()
 
+def slot_availability_snapshot(facility_id, day):
+    """Current state of every slot of a facility on the given date."""
+    booking_states = dict(
+        Booking.objects.filter(facility_id=facility_id, date=day, status__in=['pending', 'confirmed', 'completed'])
+        .values_list('slot_id', 'status')
+    )
+    slots = []
+    for slot in TimeSlot.objects.filter(field_id=facility_id).order_by('start_time').values('id', 'start_time', 'end_time', 'status'):
+        booking_status = booking_states.get(slot['id'])
+        if booking_status == 'pending':
+            state = 'held'
+        elif booking_status:
+            state = 'booked'
+        else:
+            state = 'unavailable' if slot['status'] == 'unavailable' else 'available'
+        slots.append({
+            'slot_id': slot['id'],
+            'start_time': slot['start_time'].strftime('%H:%M'),
+            'end_time': slot['end_time'].strftime('%H:%M'),
+            'state': state,
+        })
+    return {'facility_id': facility_id, 'date': day.isoformat(), 'slots': slots}
+
+async def slot_availability_stream(request, pk):
+    """
+    Server-sent event stream of slot holds, bookings and releases for one
+    facility and date (?date=YYYY-MM-DD). Only served under ASGI: a WSGI
+    server would read the endless stream to its end before sending anything.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'status': 'error', 'message': 'Live availability is only served by the ASGI application (futsalBooking.asgi)'},
+            status=501,
+        )
+    try:
+        day = parse_date(request.GET.get('date', ''))
+    except ValueError:  # well formed but impossible, such as 2026-02-30
+        day = None
+    if day is None:
+        return JsonResponse({'status': 'error', 'message': 'date must be a YYYY-MM-DD date'}, status=400)
+    if not await Facility.objects.filter(id=pk).aexists():
+        return JsonResponse({'status': 'error', 'message': 'Facility not found'}, status=404)
+
+    # The snapshot is read by the stream once it is subscribed, so no change falls in between
+    load_snapshot = functools.partial(slot_availability_snapshot, pk, day)
+    response = StreamingHttpResponse(stream_slot_events(slot_channel(pk, day), load_snapshot), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+class MediaView(APIView):
+    """
+    Serves uploads from MEDIA_ROOT. Django only authorizes the request: media
+    outside MEDIA_PUBLIC_PREFIXES needs an authenticated user. The bytes are
+    handed to the front proxy or streamed per MEDIA_DELIVERY (futsalApp.media).
+    """
+
+    def get(self, request, name):
+        name = clean_media_name(name)
+        if name is None:
+            raise Http404("File not found")
+        if not is_public_media(name) and not request.user.is_authenticated:
+            raise NotAuthenticated("Authentication is required to access this file")
+        return media_response(request, name)
+
+class DirectUploadView(APIView):
+    """Presigned target for sending an avatar, thumbnail or facility image straight to the storage."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = DirectUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        upload = DirectUpload.start(
+            request.user, data['kind'], data['filename'], data['content_type'], data['size'], data.get('facility'),
+        )
+        upload['upload']['url'] = request.build_absolute_uri(upload['upload']['url'])
+        return Response({
+            'status': 'success',
+            'message': 'Upload URL created successfully',
+            'data': upload,
+        }, status=status.HTTP_201_CREATED)
+
+class DirectUploadCompleteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = DirectUploadCompleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        kind, target = DirectUpload.complete(request.user, serializer.validated_data['ticket'])
+        serializer_class = {
+            'avatar': UserSerializer, 'thumbnail': FacilitySerializer, 'facility_image': FacilityImageSerializer,
+        }[kind]
+        return Response({
+            'status': 'success',
+            'message': 'Upload completed successfully',
+            'data': serializer_class(target, context={'request': request}).data,
+        }, status=status.HTTP_200_OK)
+
+class LocalUploadView(APIView):
+    """
+    Receives direct uploads for LocalObjectStorage the way a bucket receives
+    presigned POSTs: the signed URL is the credential, and a successful
+    upload answers 204.
+    """
+    authentication_classes = []
+    permission_classes = []
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, token):
+        if not isinstance(default_storage, LocalObjectStorage):
+            raise Http404("Uploads go to the object storage")
+        try:
+            name, content_type, max_size = LocalObjectStorage.read_upload_token(token, settings.MEDIA_UPLOAD_URL_TTL)
+        except signing.BadSignature:
+            raise PermissionDenied("Invalid or expired upload URL")
+        file = request.FILES.get('file')
+        if file is None or request.data.get('Content-Type') != content_type:
+            return get_response("error", "ValidationError", {"detail": "Send the file as 'file' with the fields you were given"}, status.HTTP_400_BAD_REQUEST)
+        if file.size > max_size:
+            return get_response("error", "ValidationError", {"detail": "The file is larger than announced"}, status.HTTP_400_BAD_REQUEST)
+        if not is_image(file, content_type):
+            return get_response("error", "ValidationError", {"detail": f"The file is not a valid {content_type} image"}, status.HTTP_400_BAD_REQUEST)
+        default_storage.save_at(name, file)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 # Amenity Views
-class AmenityListCreateView(generics.ListCreateAPIView):
+class AmenityListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     queryset = Amenity.objects.all()
     serializer_class = AmenitySerializer
@@ -475,7 +824,7 @@ class AmenityListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class AmenityDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AmenityDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
     queryset = Amenity.objects.all()
     serializer_class = AmenitySerializer
@@ -503,9 +852,10 @@ class AmenityDetailView(generics.RetrieveUpdateDestroyAPIView):
         serializer.save()
 
 # BusinessInfo Views
-class BusinessInfoListCreateView(generics.ListCreateAPIView):
+class BusinessInfoListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = BusinessInfo.objects.all()
     serializer_class = BusinessInfoSerializer
+    public_cache = True
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -523,7 +873,7 @@ class BusinessInfoListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class BusinessInfoDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BusinessInfoDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
     queryset = BusinessInfo.objects.all()
     serializer_class = BusinessInfoSerializer
@@ -552,11 +902,12 @@ class BusinessInfoDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 class BookingListView(APIView):
     def get(self, request):
-        bookings = Booking.objects.all()
-        # Pass the request context to the serializer
-        serializer = BookingSerializer(bookings, many=True, context={'request': request})
-        return Response({"status": "success", "data": serializer.data}, status=status.HTTP_200_OK)
+        bookings = Booking.objects.order_by('pk')
+        # Same output as BookingSerializer with the request in its context
+        data = booking_list_serializer.serialize(bookings, request)
+        return Response({"status": "success", "data": data}, status=status.HTTP_200_OK)
 
+    @idempotent
     def post(self, request):
         facility_id = request.data.get('facility_id')
         date = request.data.get('date')
@@ -564,64 +915,462 @@ class BookingListView(APIView):
         phone = request.data.get('phone')
         slot_id = request.data.get('slot_id')
         time = request.data.get('time')
-        price = request.data.get('price')
         payment_type = request.data.get('payment_type', 'full')  # Default to full payment
 
-        if not all([facility_id, date, time, price, email, phone, slot_id]):    
+        if not all([facility_id, date, time, email, phone, slot_id]):    
             return Response({"status": "error", "message": "All fields are required"}, status=status.HTTP_400_BAD_REQUEST)
+        if payment_type not in PAYMENT_TYPES:
+            return Response({"status": "error", "message": "payment_type must be 'full' or 'partial'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            booking_date = parse_date(str(date))
+        except ValueError:  # well formed but impossible, such as 2026-02-30
+            booking_date = None
+        if booking_date is None:
+            return Response({"status": "error", "message": "date must be a YYYY-MM-DD date"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            slot_id = int(slot_id)
+        except (TypeError, ValueError):
+            return Response({"status": "error", "message": "slot_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            facility_id = int(facility_id)
+        except (TypeError, ValueError):
+            return Response({"status": "error", "message": "facility_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             facility = Facility.objects.get(id=facility_id)
         except Facility.DoesNotExist:
             return Response({"status": "error", "message": "Facility not found"}, status=status.HTTP_404_NOT_FOUND)
-        
+
+        with transaction.atomic():
+            # The slot is locked as BookingService.reserve_series locks a series' slots, so a
+            # concurrent booking or series for it waits and then sees this one as a conflict
+            slot = TimeSlot.objects.select_for_update().filter(id=slot_id, field=facility).first()
+            if slot is None:
+                return Response({"status": "error", "message": "Time slot not found"}, status=status.HTTP_404_NOT_FOUND)
+
+            # The price is quoted server-side; any client-supplied price is ignored
+            price = quote(facility.id, slot.id, booking_date, payment_type)
+            if price is None:
+                return Response({"status": "error", "message": "Time slot is not available on this date"}, status=status.HTTP_400_BAD_REQUEST)
+            conflict = BookingService.find_conflicts({(slot.id, booking_date): price}, [(slot.id, booking_date)])
+            if conflict.get((slot.id, booking_date)) == 'past':
+                return Response({"status": "error", "message": "The date has already passed"}, status=status.HTTP_400_BAD_REQUEST)
+            if conflict:
+                return Response({"status": "error", "message": "Time slot is already booked on this date"}, status=status.HTTP_409_CONFLICT)
+
+            booking = Booking.objects.create(
+                customer=request.user,
+                facility=facility,
+                slot=slot,
+                email=email,
+                phone=phone,
+                date=booking_date,
+                time=time,
+                start_time=slot.start_time,
+                price=price,
+                status='pending'
+            )
+
+            # Create a payment record
+            transaction_uuid = str(uuid.uuid4())
+            total_amount = price  # For simplicity, no tax/service/delivery charges
+            payment = Payment.objects.create(
+                booking=booking,
+                amount=price,
+                tax_amount=0,
+                service_charge=0,
+                delivery_charge=0,
+                total_amount=total_amount,
+                transaction_uuid=transaction_uuid,
+                payment_status='Pending Payment',
+                payment_type=payment_type
+            )
+            record(
+                booking_event(booking, None, 'booking', request.user),
+                payment_event(payment, facility.id, None, 'booking', request.user),
+            )
+        publish_booking_event(booking)
+
+        serializer = BookingSerializer(booking, selection=FieldSelection.from_request(request))
+        return Response({"status": "success", "data": serializer.data}, status=status.HTTP_201_CREATED)
+    
+class BulkBookingView(APIView):
+    """
+    Reserves a series of dates in one request, from either a recurrence rule
+    or an explicit list of {slot_id, date} pairs, with one aggregated payment.
+    Conflicting dates are reported per date; nothing is booked when there are
+    conflicts unless allow_partial is true.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @idempotent
+    def post(self, request):
+        series, payment, conflicts = BookingService.reserve_series(request.user, request.data)
+        if series is None:
+            return Response(
+                {"status": "error", "message": "The requested dates could not be booked", "data": {"conflicts": conflicts}},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({"status": "success", "data": {
+            "series_id": series.id,
+            "bookings": booking_list_serializer.serialize(series.bookings.order_by('pk')),
+            "payment": PaymentSerializer(payment).data,
+            "conflicts": conflicts,
+        }}, status=status.HTTP_201_CREATED)
+
+class IsOwnerOrReadOnly(permissions.BasePermission):
+    def has_permission(self, request, view):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        return bool(request.user and request.user.is_authenticated and (request.user.role == 'OWNER' or request.user.is_staff))
+
+def holiday_scope_error(user, facility):
+    """Why the user may not file a calendar entry under this facility (None: calendar-wide), or None if they may."""
+    if user.is_staff:
+        return None
+    if facility is None:
+        return "Only staff can manage calendar-wide entries"
+    if facility.created_by_id != user.id:
+        return "You can only manage entries of your own facilities"
+    return None
+
+class HolidayListCreateView(generics.ListCreateAPIView):
+    permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    serializer_class = HolidaySerializer
+
+    def get_queryset(self):
+        queryset = Holiday.objects.order_by('start_date', 'id')
+        # isdecimal(), not isdigit(): int() cannot read digits such as '²'
+        facility_id = self.request.query_params.get('facility')
+        if facility_id and facility_id.isdecimal():
+            # A facility's calendar includes the calendar-wide entries
+            queryset = queryset.filter(Q(facility_id=int(facility_id)) | Q(facility__isnull=True))
+        year = self.request.query_params.get('year')
+        if year and year.isdecimal():
+            queryset = queryset.filter(start_date__year__lte=int(year), end_date__year__gte=int(year))
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return get_response("success", "Holidays retrieved successfully", serializer.data)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if serializer.is_valid():
+            error = holiday_scope_error(request.user, serializer.validated_data.get('facility'))
+            if error:
+                return get_response("error", error, {}, status.HTTP_403_FORBIDDEN)
+            serializer.save(created_by=request.user)
+            return get_response("success", "Holiday created successfully", serializer.data, status.HTTP_201_CREATED)
+        return get_response("error", "ValidationError", {"detail": serializer.errors}, status.HTTP_400_BAD_REQUEST)
+
+class HolidayDetailView(generics.RetrieveUpdateDestroyAPIView):
+    permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    serializer_class = HolidaySerializer
+
+    def get_queryset(self):
+        # Anyone may read an entry; only its author (or staff) may change it
+        queryset = Holiday.objects.all()
+        if self.request.method not in permissions.SAFE_METHODS and not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_object())
+        return get_response("success", "Holiday retrieved successfully", serializer.data)
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        holiday = self.get_object()
+        serializer = self.get_serializer(holiday, data=request.data, partial=partial)
+        if serializer.is_valid():
+            error = holiday_scope_error(request.user, serializer.validated_data.get('facility', holiday.facility))
+            if error:
+                return get_response("error", error, {}, status.HTTP_403_FORBIDDEN)
+            serializer.save()
+            return get_response("success", "Holiday updated successfully", serializer.data)
+        return get_response("error", "ValidationError", {"detail": serializer.errors}, status.HTTP_400_BAD_REQUEST)
+
+    def destroy(self, request, *args, **kwargs):
+        holiday = self.get_object()
+        error = holiday_scope_error(request.user, holiday.facility)
+        if error:
+            return get_response("error", error, {}, status.HTTP_403_FORBIDDEN)
+        self.perform_destroy(holiday)
+        return get_response("success", "Holiday deleted successfully", {}, status.HTTP_204_NO_CONTENT)
+
+class HolidayImportView(APIView):
+    """
+    Bulk-imports holidays or closures from an uploaded iCal (.ics) or CSV
+    file (name,start_date[,end_date][,kind]). Entries already in the
+    calendar are skipped; ?facility= scopes the import to one facility and
+    ?kind= sets the kind of entries that do not carry their own.
+    """
+    permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({"status": "error", "message": "A file is required"}, status=status.HTTP_400_BAD_REQUEST)
+        kind = request.data.get('kind', 'holiday')
+        if kind not in dict(Holiday.KIND_CHOICES):
+            return Response({"status": "error", "message": "kind must be 'holiday' or 'closure'"}, status=status.HTTP_400_BAD_REQUEST)
+        facility = None
+        if request.data.get('facility'):
+            try:
+                facility = Facility.objects.filter(pk=int(request.data['facility'])).first()
+            except ValueError:
+                return Response({"status": "error", "message": "facility must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            if facility is None:
+                return Response({"status": "error", "message": "Facility not found"}, status=status.HTTP_404_NOT_FOUND)
+        error = holiday_scope_error(request.user, facility)
+        if error:
+            return Response({"status": "error", "message": error}, status=status.HTTP_403_FORBIDDEN)
+
+        file_format = request.data.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+        parsers = {'ics': parse_ics, 'ical': parse_ics, 'csv': parse_csv}
+        if file_format not in parsers:
+            return Response({"status": "error", "message": "format must be 'ics' or 'csv'"}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            slot = TimeSlot.objects.get(id=slot_id)
-        except TimeSlot.DoesNotExist:
-            return Response({"status": "error", "message": "Time slot not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        # Adjust price based on payment type
-        price = float(price)
-        if payment_type == 'partial':
-            price = price * 0.25  # 25% for partial payment
-
-        booking = Booking.objects.create(
-            customer=request.user,
-            facility=facility,
-            slot=slot,
-            email=email,
-            phone=phone,
-            date=date,
-            time=time,
-            price=price,
-            status='pending'
+            entries = parsers[file_format](upload.read().decode('utf-8-sig'))
+        except (UnicodeDecodeError, ValueError) as e:
+            return Response({"status": "error", "message": f"Invalid {file_format} file: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+        if any(entry.get('kind', kind) not in dict(Holiday.KIND_CHOICES) for entry in entries):
+            return Response({"status": "error", "message": "kind must be 'holiday' or 'closure'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        existing = set(Holiday.objects.filter(facility=facility).values_list('name', 'start_date', 'end_date', 'kind'))
+        holidays = {}
+        for entry in entries:
+            key = (entry['name'], entry['start_date'], entry['end_date'], entry.get('kind', kind))
+            if key not in existing:
+                holidays[key] = Holiday(
+                    name=key[0], start_date=key[1], end_date=key[2], kind=key[3],
+                    facility=facility, created_by=request.user,
+                )
+        with transaction.atomic():
+            Holiday.objects.bulk_create(holidays.values())
+            # bulk_create skips Holiday.save(), which is what normally rebuilds the index
+            invalidate_holiday_index()
+        return Response({"status": "success", "data": {
+            "imported": len(holidays),
+            "skipped": len(entries) - len(holidays),
+        }}, status=status.HTTP_201_CREATED)
+
+class FacilityQuoteView(APIView):
+    """
+    Prices every slot of a facility for each date of a calendar month
+    (?month=YYYY-MM, defaults to the current month) for one payment type.
+    """
+    permission_classes = []
+
+    def get(self, request, pk):
+        if not Facility.objects.filter(pk=pk).exists():
+            return Response({"status": "error", "message": "Facility not found"}, status=status.HTTP_404_NOT_FOUND)
+        payment_type = request.query_params.get('payment_type', 'full')
+        if payment_type not in PAYMENT_TYPES:
+            return Response({"status": "error", "message": "payment_type must be 'full' or 'partial'"}, status=status.HTTP_400_BAD_REQUEST)
+        month = request.query_params.get('month')
+        if month:
+            try:
+                parsed = parse_date(f'{month}-01')
+            except ValueError:  # well formed but impossible, such as 2026-13 or 0000-01
+                parsed = None
+            if parsed is None:
+                return Response({"status": "error", "message": "month must be in YYYY-MM format"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            parsed = timezone.localdate()
+        return Response({"status": "success", "data": {
+            "facility_id": pk,
+            "month": f"{parsed:%Y-%m}",
+            "payment_type": payment_type,
+            "days": quote_month(pk, parsed.year, parsed.month, payment_type),
+        }}, status=status.HTTP_200_OK)
+
+class BookingExportView(APIView):
+    """
+    Streams the owner's bookings with their payments as CSV (default) or
+    XLSX (?type=xlsx). Rows are read through a server-side cursor as flat
+    tuples, so worker memory stays flat regardless of the export size.
+    """
+    permission_classes = [IsAuthenticated]
+    CHUNK_SIZE = 2000
+    COLUMNS = (
+        ('Booking ID', 'id'),
+        ('Booked At', 'created_at'),
+        ('Date', 'date'),
+        ('Time', 'time'),
+        ('Facility', 'facility__name'),
+        ('Customer', 'customer__name'),
+        ('Email', 'email'),
+        ('Phone', 'phone'),
+        ('Booking Status', 'status'),
+        ('Price', 'price'),
+        ('Payment Amount', 'payment__amount'),
+        ('Tax Amount', 'payment__tax_amount'),
+        ('Service Charge', 'payment__service_charge'),
+        ('Total Amount', 'payment__total_amount'),
+        ('Payment Status', 'payment__payment_status'),
+        ('Payment Type', 'payment__payment_type'),
+        ('Transaction UUID', 'payment__transaction_uuid'),
+        ('Transaction Code', 'payment__transaction_code'),
+        ('Reference ID', 'payment__ref_id'),
+    )
+
+    def get(self, request):
+        if request.user.role != 'OWNER':
+            return Response({"status": "error", "message": "Only owners can export bookings"}, status=status.HTTP_403_FORBIDDEN)
+
+        export_type = request.query_params.get('type', 'csv')
+        if export_type not in ('csv', 'xlsx'):
+            return Response({"status": "error", "message": "type must be 'csv' or 'xlsx'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        bookings = Booking.objects.filter(facility__created_by=request.user)
+        history = {'owner': request.user}
+        for param, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    parsed = parse_date(value)
+                except ValueError:  # well formed but impossible, such as 2024-02-30
+                    parsed = None
+                if parsed is None:
+                    return Response({"status": "error", "message": f"{param} must be a YYYY-MM-DD date"}, status=status.HTTP_400_BAD_REQUEST)
+                bookings = bookings.filter(**{lookup: parsed})
+                history[param] = parsed
+        facility_id = request.query_params.get('facility')
+        if facility_id:
+            try:
+                facility_id = int(facility_id)
+            except ValueError:
+                return Response({"status": "error", "message": "facility must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            bookings = bookings.filter(facility_id=facility_id)
+            history['facility_id'] = facility_id
+        booking_status = request.query_params.get('status')
+        if booking_status:
+            bookings = bookings.filter(status=booking_status)
+            history['status'] = booking_status
+
+        header = [title for title, _ in self.COLUMNS]
+        fields = [field for _, field in self.COLUMNS]
+        # Archived bookings (the oldest) come first, read a facility month at a time
+        archived = (
+            tuple(resolve(booking, field) for field in fields)
+            for booking in archived_bookings(prefetch=('facility', 'customer'), **history)
         )
+        rows = itertools.chain(archived, bookings.order_by('id').values_list(*fields).iterator(chunk_size=self.CHUNK_SIZE))
+        filename = f"bookings-{timezone.now():%Y%m%d-%H%M%S}.{export_type}"
+        if export_type == 'xlsx':
+            response = StreamingHttpResponse(
+                streaming_body(request, stream_xlsx(header, rows)),
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+        else:
+            response = StreamingHttpResponse(streaming_body(request, stream_csv(header, rows)), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class BookingEventListView(APIView):
+    """
+    The owner's booking and payment status transitions between ?from and ?to
+    (ISO dates or datetimes, default the last 7 days), oldest first, as
+    column-ordered rows paginated with an opaque (created_at, id) cursor.
+    Filters: ?type=booking|payment, ?facility, ?booking.
+    """
+    permission_classes = [IsAuthenticated]
+    DEFAULT_LIMIT = 500
+    MAX_LIMIT = 5000
+    DEFAULT_RANGE = timedelta(days=7)
+
+    @staticmethod
+    def parse_moment(value):
+        try:
+            moment = parse_datetime(value)
+            if moment is None:
+                day = parse_date(value)
+                if day is None:
+                    return None
+                moment = datetime.combine(day, datetime.min.time())
+        except ValueError:  # well formed but impossible, such as 2026-13-01
+            return None
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+    def get(self, request):
+        if request.user.role != 'OWNER':
+            return Response({"status": "error", "message": "Only owners can read booking events"}, status=status.HTTP_403_FORBIDDEN)
+
+        end = timezone.now()
+        start = None
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            if value:
+                moment = self.parse_moment(value)
+                if moment is None:
+                    return Response({"status": "error", "message": f"{param} must be an ISO date or datetime"}, status=status.HTTP_400_BAD_REQUEST)
+                if param == 'from':
+                    start = moment
+                else:
+                    end = moment
+        start = start or end - self.DEFAULT_RANGE
 
-        # Create a payment record
-        transaction_uuid = str(uuid.uuid4())
-        total_amount = price  # For simplicity, no tax/service/delivery charges
-        payment = Payment.objects.create(
-            booking=booking,
-            amount=price,
-            tax_amount=0,
-            service_charge=0,
-            delivery_charge=0,
-            total_amount=total_amount,
-            transaction_uuid=transaction_uuid,
-            payment_status='Pending Payment',
-            payment_type=payment_type
+        kind = request.query_params.get('type')
+        if kind and kind not in dict(BookingEvent.KIND_CHOICES):
+            return Response({"status": "error", "message": "type must be 'booking' or 'payment'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', self.DEFAULT_LIMIT))
+            facility_id = int(request.query_params.get('facility') or 0) or None
+            booking_id = int(request.query_params.get('booking') or 0) or None
+        except ValueError:
+            return Response({"status": "error", "message": "limit, facility and booking must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"status": "error", "message": "limit must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, self.MAX_LIMIT)
+
+        events = events_between(start, end, kind, facility_id, booking_id).filter(
+            facility_id__in=list(Facility.objects.filter(created_by=request.user).values_list('id', flat=True)),
         )
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            position = decode_cursor(cursor)
+            moment = None
+            if (
+                isinstance(position, list) and len(position) == 2 and isinstance(position[0], str)
+                and isinstance(position[1], int) and not isinstance(position[1], bool)
+            ):
+                try:
+                    moment = parse_datetime(position[0])
+                except ValueError:  # well formed but out of range, e.g. month 13
+                    pass
+            if moment is None:
+                return Response({"status": "error", "message": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+            events = events.filter(Q(created_at__gt=moment) | Q(created_at=moment, id__gt=position[1]))
+        rows = list(events.values_list(*EVENT_COLUMNS)[:limit + 1])
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][1].isoformat(), rows[-1][0]])
+        return Response({"status": "success", "data": {
+            "columns": EVENT_COLUMNS,
+            "rows": rows,
+            "next_cursor": next_cursor,
+        }}, status=status.HTTP_200_OK)
 
-        serializer = BookingSerializer(booking)
-        return Response({"status": "success", "data": serializer.data}, status=status.HTTP_201_CREATED)
-    
 class MyBookingListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        bookings = Booking.objects.filter(customer=request.user)
-        serializer = BookingSerializer(bookings, many=True)
-        return Response({"status": "success", "data": serializer.data}, status=status.HTTP_200_OK)
+        bookings = Booking.objects.filter(customer=request.user).order_by('pk')
+        selection = FieldSelection.from_request(request)
+        selection = selection and selection.including('id')
+        # Serialized without a request, like BookingSerializer without context
+        data = booking_list_serializer.serialize(bookings, selection=selection)
+        archived = sorted(archived_bookings(customer=request.user), key=lambda booking: booking.id)
+        if archived:
+            archived_data = BookingSerializer(archived, many=True, selection=selection).data
+            data = list(heapq.merge(archived_data, data, key=lambda item: item['id']))
+        return Response({"status": "success", "data": data}, status=status.HTTP_200_OK)
 
 # Utility function to generate HMAC-SHA256 signature
 def generate_signature(total_amount, transaction_uuid, product_code):
@@ -642,6 +1391,7 @@ def generate_signature(total_amount, transaction_uuid, product_code):
 class InitiatePaymentView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request, booking_id):
         try:
             # Fetch the booking and payment
@@ -704,8 +1454,9 @@ class InitiatePaymentView(APIView):
 class BookingDetailView(APIView):
     def get(self, request, booking_id):
         try:
-            booking = Booking.objects.get(id=booking_id, customer=request.user)
-            serializer = BookingSerializer(booking)
+            selection = FieldSelection.from_request(request)
+            booking = get_booking(booking_id, request.user, with_related(Booking.objects.all(), BookingSerializer, selection))
+            serializer = BookingSerializer(booking, selection=selection)
             return Response(
                 {"status": "success", "data": [serializer.data]},
                 status=status.HTTP_200_OK
@@ -718,124 +1469,68 @@ class BookingDetailView(APIView):
                        
 # eSewa Success Callback
 class EsewaSuccessView(APIView):
+    """
+    Verifies the callback's signature, records it in the PaymentCallback
+    inbox (once per transaction and status) and answers straight away; the
+    process_payment_callbacks worker checks the payment with eSewa and
+    confirms the booking. Retried callbacks cost one lookup and one insert.
+    """
     def get(self, request):
         encoded_data = request.GET.get('data')
         if not encoded_data:
             return Response({"status": "error", "message": "No data provided"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Decode the Base64 response
-        try:
-            decoded_data = base64.b64decode(encoded_data).decode('utf-8')
-            response_data = json.loads(decoded_data)  # Use json.loads instead of eval for safety
-        except (base64.binascii.Error, json.JSONDecodeError) as e:
-            return Response({"status": "error", "message": f"Invalid data format: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
-
-        transaction_uuid = response_data.get('transaction_uuid')
-        status_response = response_data.get('status')
-        total_amount = response_data.get('total_amount')
-        transaction_code = response_data.get('transaction_code')
-
         try:
-            payment = Payment.objects.get(transaction_uuid=transaction_uuid)
-            booking = payment.booking
-            time_slot = booking.slot  # Get the associated TimeSlot
-        except Payment.DoesNotExist:
-            return Response({"status": "error", "message": "Payment not found"}, status=status.HTTP_404_NOT_FOUND)
-        except Booking.DoesNotExist:
-            return Response({"status": "error", "message": "Booking not found"}, status=status.HTTP_404_NOT_FOUND)
-        except TimeSlot.DoesNotExist:
-            return Response({"status": "error", "message": "Time slot not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        # Verify the signature
-        signed_field_names = response_data.get('signed_field_names').split(',')
-        # Construct the message for HMAC-SHA256
-        message = ",".join([f"{field}={response_data[field]}" for field in signed_field_names])
-        secret = settings.ESEWA_SECRET_KEY.encode('utf-8')
-        hmac_sha256 = hmac.new(secret, message.encode('utf-8'), hashlib.sha256)
-        digest = hmac_sha256.digest()
-        computed_signature = base64.b64encode(digest).decode('utf-8')
-
-        # Debugging: Log the message and signatures
-        print("Message for HMAC:", message)
-        print("Computed Signature:", computed_signature)
-        print("Provided Signature:", response_data.get('signature'))
-
-        if computed_signature != response_data.get('signature'):
+            response_data = parse_callback(encoded_data)
+        except ValueError as e:
+            return Response({"status": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not has_valid_signature(response_data):
             return Response({"status": "error", "message": "Invalid signature"}, status=status.HTTP_400_BAD_REQUEST)
 
-        if status_response == "COMPLETE":
-            # Update payment and booking status
-            payment.payment_status = "Fully Paid"
-            payment.transaction_code = transaction_code
-            payment.save()
-
-            booking.status = "confirmed"
-            booking.save()
+        booking = Payment.objects.filter(transaction_uuid=response_data['transaction_uuid']).values(
+            'booking_id', 'booking__facility_id', 'booking__slot_id',
+        ).first()
+        if booking is None:
+            return Response({"status": "error", "message": "Payment not found"}, status=status.HTTP_404_NOT_FOUND)
+        if response_data.get('status') != "COMPLETE":
+            return Response({"status": "error", "message": "Payment not completed"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Update TimeSlot status to 'booked'
-            time_slot.status = "booked"
-            time_slot.save()
+        record_callback(response_data, 'esewa_success')
+        redirect_url = f"{booking['booking__facility_id']}/{booking['booking__slot_id']}/{booking['booking_id']}"
+        return Response(
+            {
+                "status": "success",
+                "message": "Payment received, the booking will be confirmed shortly",
+                "redirect_url": redirect_url
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
 
-            # Verify payment status with eSewa
-            status_check_url = (
-                f"{settings.ESEWA_STATUS_CHECK_URL}"
-                f"?product_code={settings.ESEWA_PRODUCT_CODE}"
-                f"&total_amount={total_amount}"
-                f"&transaction_uuid={transaction_uuid}"
-            )
-            try:
-                response = requests.get(status_check_url)
-                status_data = response.json()
-
-                if status_data.get('status') == "COMPLETE":
-                    payment.ref_id = status_data.get('ref_id')
-                    payment.save()
-                    # Prepare redirect URL with facilityId and slotId
-                    redirect_url = f"{booking.facility.id}/{booking.slot.id}/{booking.id}"
-                    return Response(
-                        {
-                            "status": "success",
-                            "message": "Payment successful",
-                            "redirect_url": redirect_url
-                        },
-                        status=status.HTTP_200_OK
-                    )
-                else:
-                    payment.payment_status = "Pending Payment"
-                    booking.status = "pending"
-                    time_slot.status = "available"  # Revert TimeSlot status if verification fails
-                    payment.save()
-                    booking.save()
-                    time_slot.save()
-                    return Response({"status": "error", "message": "Payment verification failed"}, status=status.HTTP_400_BAD_REQUEST)
-            except requests.RequestException as e:
-                return Response({"status": "error", "message": f"Failed to verify payment status: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        return Response({"status": "error", "message": "Payment not completed"}, status=status.HTTP_400_BAD_REQUEST)
 # eSewa Failure Callback
 class EsewaFailureView(APIView):
+    """
+    Records a failed or pending payment in the PaymentCallback inbox for the
+    worker to release. Failure redirects may come unsigned, but then only with
+    one of eSewa's failure statuses; any other status needs a valid signature.
+    """
     def get(self, request):
         encoded_data = request.GET.get('data')
         if not encoded_data:
             return Response({"status": "error", "message": "No data provided"}, status=status.HTTP_400_BAD_REQUEST)
-
-        decoded_data = base64.b64decode(encoded_data).decode('utf-8')
-        response_data = eval(decoded_data)  # Convert string to dict (use json.loads in production)
-
-        transaction_uuid = response_data.get('transaction_uuid')
-        status_response = response_data.get('status')
-
         try:
-            payment = Payment.objects.get(transaction_uuid=transaction_uuid)
-            booking = payment.booking
-        except Payment.DoesNotExist:
-            return Response({"status": "error", "message": "Payment not found"}, status=status.HTTP_404_NOT_FOUND)
+            response_data = parse_callback(encoded_data)
+        except ValueError as e:
+            return Response({"status": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # The inbox keeps one callback per (transaction, status), so statuses are limited to eSewa's own
+        if not isinstance(response_data.get('status'), str) or response_data['status'] not in STATUSES:
+            return Response({"status": "error", "message": "Unknown payment status"}, status=status.HTTP_400_BAD_REQUEST)
+        signed = 'signature' in response_data or response_data['status'] not in FAILURE_STATUSES
+        if signed and not has_valid_signature(response_data):
+            return Response({"status": "error", "message": "Invalid signature"}, status=status.HTTP_400_BAD_REQUEST)
 
-        if status_response != "COMPLETE":
-            payment.payment_status = "Pending Payment"
-            booking.status = "pending"
-            payment.save()
-            booking.save()
+        if not Payment.objects.filter(transaction_uuid=response_data['transaction_uuid']).exists():
+            return Response({"status": "error", "message": "Payment not found"}, status=status.HTTP_404_NOT_FOUND)
+        if response_data.get('status') != "COMPLETE":
+            record_callback(response_data, 'esewa_failure')
 
         return Response({"status": "error", "message": "Payment failed or pending"}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -853,13 +1548,18 @@ class UpdateBookingStatusView(APIView):
         if new_status not in dict(Booking.STATUS_CHOICES):
             return Response({"status": "error", "message": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST)
 
-        booking.status = new_status
-        if new_status == "canceled" and booking.payment.payment_status == "Fully Paid":
-            booking.payment.payment_status = "Refunded"
-            booking.payment.save()
-        booking.save()
+        with transaction.atomic():
+            previous_status = booking.status
+            booking.status = new_status
+            if new_status == "canceled" and booking.payment.payment_status == "Fully Paid":
+                booking.payment.payment_status = "Refunded"
+                booking.payment.save()
+                record(payment_event(booking.payment, booking.facility_id, "Fully Paid", 'status_update', request.user))
+            booking.save()
+            record(booking_event(booking, previous_status, 'status_update', request.user))
+        publish_booking_event(booking)
 
-        serializer = BookingSerializer(booking)
+        serializer = BookingSerializer(booking, selection=FieldSelection.from_request(request))
         return Response({"status": "success", "data": serializer.data}, status=status.HTTP_200_OK)
  
 class BookingDetailViewSingle(APIView):
@@ -867,8 +1567,9 @@ class BookingDetailViewSingle(APIView):
 
     def get(self, request, booking_id):
         try:
-            booking = Booking.objects.get(id=booking_id, customer=request.user)
-            serializer = BookingSerializer(booking)
+            selection = FieldSelection.from_request(request)
+            booking = get_booking(booking_id, request.user, with_related(Booking.objects.all(), BookingSerializer, selection))
+            serializer = BookingSerializer(booking, selection=selection)
             return Response(
                 {"status": "success", "data": serializer.data},
                 status=status.HTTP_200_OK
@@ -879,8 +1580,27 @@ class BookingDetailViewSingle(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )  
     
+class BatchView(APIView):
+    """
+    Runs up to BATCH_MAX_REQUESTS GET sub-requests in one round-trip:
+    {"requests": [{"id": "facility", "url": "/api/facilities/1/"}, ...]}.
+    Sub-requests share the batch's authentication, but each view still
+    applies its own permissions and each answer carries its own status code.
+    """
+    permission_classes = []
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({
+            'status': 'success',
+            'message': 'Batch completed',
+            'data': {'responses': run_batch(request, serializer.validated_data['requests'])},
+        }, status=status.HTTP_200_OK)
+
 class DashboardView(APIView):
     permission_classes = [IsAuthenticated]
+    PERIODS = ('7days', '30days', '90days', 'year')
 
     def get(self, request):
         # Get the authenticated user
@@ -888,6 +1608,18 @@ class DashboardView(APIView):
 
         # Determine the time period filter (default to last 30 days)
         period = request.query_params.get('period', '30days')
+        if period not in self.PERIODS:
+            period = '30days'
+
+        entry = DashboardCache.get(user.id, period, lambda: self.build_dashboard(user, period))
+        return Response({
+            "status": "success",
+            "data": entry['data'],
+            "generated_at": entry['generated_at'],
+        }, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def build_dashboard(user, period):
         if period == '7days':
             start_date = timezone.now() - timedelta(days=7)
         elif period == '90days':
@@ -947,9 +1679,10 @@ class DashboardView(APIView):
         previous_occupancy = (previous_booked_slots / total_slots * 100) if total_slots > 0 else 0
         occupancy_change = occupancy_rate - previous_occupancy
 
-        # Customer Rating
-        reviews = Review.objects.filter(facility__in=facilities)
-        average_rating = reviews.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0
+        # Customer Rating (read from the denormalized per-facility summary)
+        rating_totals = facilities.aggregate(rating_sum=Sum('rating_sum'), rating_count=Sum('rating_count'))
+        review_count = rating_totals['rating_count'] or 0
+        average_rating = (rating_totals['rating_sum'] / review_count) if review_count else 0
         previous_reviews = Review.objects.filter(
             facility__in=facilities,
             created_at__lt=start_date,
@@ -985,7 +1718,7 @@ class DashboardView(APIView):
                 "value": f"{average_rating:.1f}",
                 "change": f"{rating_change:+.1f}" if rating_change != 0 else "0",
                 "trend": "up" if rating_change > 0 else "down" if rating_change < 0 else "neutral",
-                "description": f"Based on {reviews.count()} reviews",
+                "description": f"Based on {review_count} reviews",
             },
         ]
 
@@ -1125,21 +1858,18 @@ class DashboardView(APIView):
                 "loyaltyStatus": loyalty_status,
             })
 
-        return Response({
-            "status": "success",
-            "data": {
-                "futsalStats": futsal_stats,
-                "weeklyBookings": weekly_bookings_data,
-                "fieldUtilization": field_utilization,
-                "upcomingBookings": upcoming_bookings_data,
-                "customerSegmentation": customer_segmentation,
-                "monthlyTrend": monthly_trend,
-                "recentReviews": recent_reviews_data,
-                "repeatCustomerAnalytics": {
-                    "regularTeams": regular_teams_count,
-                    "retentionRate": retention_rate,
-                    "avgBookingsPerMonth": avg_bookings_per_month,
-                    "topCustomers": repeat_customers_data,
-                }
+        return {
+            "futsalStats": futsal_stats,
+            "weeklyBookings": weekly_bookings_data,
+            "fieldUtilization": field_utilization,
+            "upcomingBookings": upcoming_bookings_data,
+            "customerSegmentation": customer_segmentation,
+            "monthlyTrend": monthly_trend,
+            "recentReviews": recent_reviews_data,
+            "repeatCustomerAnalytics": {
+                "regularTeams": regular_teams_count,
+                "retentionRate": retention_rate,
+                "avgBookingsPerMonth": avg_bookings_per_month,
+                "topCustomers": repeat_customers_data,
             }
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        }
\ No newline at end of file
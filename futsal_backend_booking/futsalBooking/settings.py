@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import environ
 import os
+from django.core.exceptions import ImproperlyConfigured
 
 env = environ.Env()
 environ.Env.read_env()
@@ -26,14 +27,41 @@ ENCRYPTION_KEY = env('ENCRYPTION_KEY')
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-MEDIA_URL = '/media/'
+MEDIA_URL = env('MEDIA_URL', default='/media/')
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads (futsalApp.storage) are stored under content-hashed names, so they can
+# be cached as immutable. MEDIA_STORAGE 's3' keeps them in an S3-compatible
+# bucket shared by every app node (point MEDIA_URL at the bucket or its CDN, or
+# leave it local to have MediaView redirect to presigned URLs); 'local' keeps
+# them under MEDIA_ROOT for development and tests.
+MEDIA_STORAGE = env('MEDIA_STORAGE', default='local')
+if MEDIA_STORAGE == 's3':
+    DEFAULT_STORAGE = {
+        'BACKEND': 'futsalApp.storage.S3Storage',
+        'OPTIONS': {
+            'bucket': env('MEDIA_S3_BUCKET', default=''),
+            'endpoint_url': env('MEDIA_S3_ENDPOINT_URL', default=''),  # MinIO, R2, Spaces, ...
+            'region': env('MEDIA_S3_REGION', default=''),
+            'access_key': env('MEDIA_S3_ACCESS_KEY_ID', default=''),
+            'secret_key': env('MEDIA_S3_SECRET_ACCESS_KEY', default=''),
+        },
+    }
+else:
+    DEFAULT_STORAGE = {'BACKEND': 'futsalApp.storage.LocalObjectStorage'}
+STORAGES = {
+    'default': DEFAULT_STORAGE,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-wz^^y66l!t#696+=m-5k&-c_y^-h)zklkhk&-m6g+&)@2s%ww='
+# It also derives refresh tokens (futsalApp.tokens); list retired keys in
+# SECRET_KEY_FALLBACKS so that tokens issued under them keep working.
+SECRET_KEY = env('SECRET_KEY')
+SECRET_KEY_FALLBACKS = env.list('SECRET_KEY_FALLBACKS', default=[])
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -59,11 +87,16 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'knox.auth.TokenAuthentication',
+        'knox.auth.TokenAuthentication',  # preceded by JWTAuthentication in 'jwt' mode (AUTH_TOKEN_MODE below)
     ),
     'EXCEPTION_HANDLER': 'futsalApp.exceptions.custom_exception_handler',  # Custom exception handler
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',  # Ensure only JSON responses are returned
+        'futsalApp.renderers.FastJSONRenderer',  # Ensure only JSON responses are returned (orjson-backed)
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'futsalApp.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
 }
 
@@ -72,6 +105,7 @@ CORS_ALLOW_ALL_ORIGINS = True
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'futsalApp.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -125,6 +159,122 @@ ESEWA_SECRET_KEY="8gBm/:&EnhH.1/q"
 ESEWA_PRODUCT_CODE="EPAYTEST"
 ESEWA_TEST_URL="https://rc-epay.esewa.com.np/api/epay/main/v2/form"
 ESEWA_STATUS_CHECK_URL="https://rc.esewa.com.np/api/epay/transaction/status/"
+ESEWA_STATUS_CHECK_TIMEOUT = 10  # seconds
+
+# Payment callbacks (futsalApp.esewa): recorded by the callback views and
+# applied by `manage.py process_payment_callbacks --loop`
+PAYMENT_CALLBACK_BATCH_SIZE = 100  # callbacks read per query
+PAYMENT_CALLBACK_INTERVAL = 5  # seconds between runs with --loop
+PAYMENT_CALLBACK_MAX_ATTEMPTS = 5  # status checks before a callback is given up on
+
+# Cache shared by every web worker and management command (dashboards and the
+# other caches built on it). CACHE_URL picks the backend, e.g.
+# redis://host:6379/1 (needs the redis package); the default keeps entries in a
+# database table, created with `manage.py createcachetable` after migrating.
+# A per-process cache such as locmem:// is only fit for a single process.
+CACHES = {'default': env.cache('CACHE_URL', default='dbcache://futsal_cache')}
+
+# Dashboard cache: entries older than the soft TTL are served stale while a
+# background refresh runs; the hard TTL bounds how long they live at all (seconds)
+DASHBOARD_CACHE_SOFT_TTL = 60
+DASHBOARD_CACHE_HARD_TTL = 60 * 60
+DASHBOARD_REFRESH_WORKERS = 2  # refresh threads per process
+DASHBOARD_REFRESH_QUEUE = 16  # refreshes running or waiting per process; past it stale entries are served as is
+
+# Live slot availability (server-sent events, served under ASGI only). The
+# PostgreSQL broker carries events from every process (web workers and the
+# lifecycle and payment callback commands) to the ones serving streams;
+# futsalApp.events.LocalBroker only delivers within one process.
+SLOT_EVENT_BROKER = env('SLOT_EVENT_BROKER', default='futsalApp.events.PostgresBroker')
+SLOT_EVENT_PG_CHANNEL = 'slot_events'  # LISTEN/NOTIFY channel
+SLOT_EVENT_QUEUE_SIZE = 100  # events buffered per subscriber before it is told to resync
+SLOT_EVENT_KEEPALIVE = 15  # seconds between keepalive comments on idle streams
+
+# Upper bound on the bookings a single bulk reservation may create
+BULK_BOOKING_MAX_OCCURRENCES = 60
+
+# Batched GETs (futsalApp.batch): upper bound on the sub-requests of one batch
+BATCH_MAX_REQUESTS = 20
+
+# Idempotency keys (futsalApp.idempotency): how long a stored response is
+# replayed, and how long a duplicate waits for the first request to finish
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60  # seconds
+IDEMPOTENCY_WAIT_TIMEOUT = 10  # seconds
+IDEMPOTENCY_PURGE_BATCH_SIZE = 1000  # rows deleted per statement by purge_idempotency_keys
+
+# Pricing (futsalApp.pricing)
+PARTIAL_PAYMENT_SHARE = '0.25'  # share of the price paid upfront for partial payments
+WEEKEND_DAYS = (5,)  # date.weekday() values priced as weekends; Saturday in Nepal
+HOLIDAY_MAX_SPAN_DAYS = 366  # longest holiday or closure a single calendar entry may cover
+
+# Nearby facility search (futsalApp.geo)
+NEARBY_DEFAULT_RADIUS_KM = 10
+NEARBY_MAX_RADIUS_KM = 100
+
+# Booking lifecycle (futsalApp.lifecycle, run by `manage.py run_booking_lifecycle`)
+BOOKING_PENDING_TTL = 30  # minutes an unpaid booking holds its slot before it is canceled
+LIFECYCLE_BATCH_SIZE = 500  # rows per UPDATE statement
+LIFECYCLE_INTERVAL = 60  # seconds between runs in --loop mode
+
+# Booking reminders (futsalApp.reminders): `manage.py send_booking_reminders --loop`
+# emails customers BusinessInfo.booking_notice before a confirmed booking starts
+REMINDER_BATCH_SIZE = 500  # bookings claimed and emailed per transaction
+REMINDER_INTERVAL = 300  # seconds between runs in --loop mode
+
+# Booking archive (futsalApp.archive, run by `manage.py archive_bookings`)
+BOOKING_ARCHIVE_AFTER_MONTHS = 24  # dashboards compare periods reaching up to two years back
+BOOKING_ARCHIVE_BATCH_SIZE = 1000  # bookings moved per statement
+
+# Authentication tokens (futsalApp.tokens). 'knox' (the default) issues Knox
+# tokens; in 'jwt' mode, which is opt-in, logins get short-lived signed access
+# tokens and rotating refresh tokens, and a user's role and account flags are
+# reused by each worker for AUTH_USER_STATE_TTL, so a demotion or a disabled
+# account takes effect within that long without a query per request.
+# AUTH_JWT_KEYS maps key ids to secrets ("k1=secret,k2=secret" in the
+# environment) and must be set in 'jwt' mode. Tokens are signed with the active key and verified with any
+# listed key, so to rotate: add a key, make it active, and drop the old one
+# once AUTH_ACCESS_TOKEN_TTL has passed.
+AUTH_TOKEN_MODE = env('AUTH_TOKEN_MODE', default='knox')
+AUTH_JWT_KEYS = env.dict('AUTH_JWT_KEYS', default={})
+AUTH_JWT_ACTIVE_KID = env('AUTH_JWT_ACTIVE_KID', default='k1')
+AUTH_JWT_ALGORITHM = 'HS256'
+AUTH_JWT_ISSUER = 'futsalBooking'
+AUTH_JWT_LEEWAY = 30  # seconds of clock skew tolerated
+AUTH_ACCESS_TOKEN_TTL = 15 * 60  # seconds
+AUTH_REFRESH_TOKEN_TTL = 7 * 24 * 60 * 60  # seconds a refresh token stays usable; rotating it restarts the clock
+AUTH_USER_STATE_TTL = 60  # seconds
+AUTH_USER_STATE_MAX_ENTRIES = 10000  # users whose state one worker keeps at a time
+if AUTH_TOKEN_MODE == 'jwt':
+    if AUTH_JWT_ACTIVE_KID not in AUTH_JWT_KEYS:
+        raise ImproperlyConfigured("AUTH_TOKEN_MODE 'jwt' needs AUTH_JWT_KEYS to include the AUTH_JWT_ACTIVE_KID key")
+    # Signed access tokens; Knox tokens issued before the switch keep working until they expire
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] = (
+        'futsalApp.authentication.JWTAuthentication',
+        *REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'],
+    )
+elif AUTH_TOKEN_MODE != 'knox':
+    raise ImproperlyConfigured("AUTH_TOKEN_MODE must be 'jwt' or 'knox'")
+
+# Media delivery (futsalApp.media). After Django has authorized a request,
+# 'x-accel' hands the file to nginx through an internal location:
+#   location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+# 'x-sendfile' hands it to Apache or lighttpd, and 'django' streams it from the worker.
+MEDIA_DELIVERY = env('MEDIA_DELIVERY', default='django')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_PUBLIC_PREFIXES = ('avatars/', 'facility-images/', 'facility-thumbnail/')  # served without authentication
+MEDIA_CACHE_MAX_AGE = 60 * 60  # seconds, for files whose name carries no content hash
+MEDIA_DOWNLOAD_URL_TTL = 5 * 60  # seconds a presigned download URL stays valid
+
+# Direct uploads (futsalApp.uploads): clients get a presigned URL and send the file straight to the storage
+MEDIA_UPLOAD_URL_TTL = 15 * 60  # seconds
+MEDIA_UPLOAD_MAX_SIZE = 10 * 1024 * 1024  # bytes
+MEDIA_UPLOAD_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp')
+
+# Response compression (futsalApp.middleware.CompressionMiddleware)
+COMPRESSION_MIN_SIZE = 1024  # bytes; smaller bodies are sent as is
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_EXCLUDED_PATHS = ('/api/auth/',)  # login, refresh and reset responses carry tokens
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -15,23 +15,28 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+import re
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from futsalApp import views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('futsalApp.urls')),
     path('api/facilities/', views.FacilityListCreateView.as_view(), name='facility-list'),
+    path('api/facilities/search/', views.FacilitySearchView.as_view(), name='facility-search'),
+    path('api/facilities/nearby/', views.NearbyFacilityView.as_view(), name='facility-nearby'),
     path('api/facilities/images/', views.FacilityImageListView.as_view(), name='facility-image-list'),
     path('api/facilities/reviews/', views.ReviewListView.as_view(), name='facility-review-list'),
+    path('api/facilities/reviews/<int:pk>/', views.ReviewDetailView.as_view(), name='facility-review-detail'),
     path('api/facilities/<int:pk>/reviews/', views.ReviewCreateView.as_view(), name='facility-review-create'),
     path('api/facilities/<int:pk>/reviews/retrieve/', views.FacilityReviewListView.as_view(), name='facility-review-retrieve'),
     path('api/facilities/images/<int:pk>/', views.FacilityImageDeleteView.as_view(), name='facility-image-delete'),
     path('api/facilities/<int:pk>/', views.FacilityDetailView.as_view(), name='facility-detail'),
     path('api/facilities/<int:pk>/images/', views.FacilityImageCreateView.as_view(), name='facility-image-create'),
     path('api/facilities/<int:id>/features/', views.update_facility_features, name='update_facility_features'),
+    path('api/facilities/<int:pk>/availability/stream/', views.slot_availability_stream, name='slot-availability-stream'),
+    path('api/facilities/<int:pk>/quotes/', views.FacilityQuoteView.as_view(), name='facility_quotes'),
     path('api/time-slots/', views.TimeSlotListCreateView.as_view(), name='time-slot-list'),
     path('api/time-slots/<int:pk>/', views.TimeSlotDetailView.as_view(), name='time-slot-detail'),
     path('api/amenities/', views.AmenityListCreateView.as_view(), name='amenity-list'),
@@ -39,7 +44,13 @@ urlpatterns = [
     path('api/business-info/', views.BusinessInfoListCreateView.as_view(), name='business-info-list'),
     path('api/business-info/<int:pk>/', views.BusinessInfoDetailView.as_view(), name='business-info-detail'),
     path('api/users/<int:pk>/', views.FetchUserView.as_view(), name='user-detail'),
+    path('api/holidays/', views.HolidayListCreateView.as_view(), name='holiday_list'),
+    path('api/holidays/import/', views.HolidayImportView.as_view(), name='holiday_import'),
+    path('api/holidays/<int:pk>/', views.HolidayDetailView.as_view(), name='holiday_detail'),
     path('api/bookings/', views.BookingListView.as_view(), name='booking_list'),
+    path('api/bookings/export/', views.BookingExportView.as_view(), name='booking_export'),
+    path('api/bookings/bulk/', views.BulkBookingView.as_view(), name='booking_bulk'),
+    path('api/bookings/events/', views.BookingEventListView.as_view(), name='booking_events'),
     path('api/bookings/<int:booking_id>/', views.BookingDetailViewSingle.as_view(), name='booking-single-detail'),
     path('api/bookings/<int:booking_id>/initiate-payment/', views.InitiatePaymentView.as_view(), name='initiate_payment'),
     path('api/bookings/esewa/success/', views.EsewaSuccessView.as_view(), name='esewa_success'),
@@ -47,8 +58,16 @@ urlpatterns = [
     path('api/bookings/<int:booking_id>/update-status/', views.UpdateBookingStatusView.as_view(), name='update_booking_status'),
     path('api/bookings/my/', views.MyBookingListView.as_view(), name='my_booking_list'),
     path('api/bookings/my/<int:booking_id>/', views.BookingDetailView.as_view(), name='booking_detail'),
+    path('api/batch/', views.BatchView.as_view(), name='batch'),
     path('api/dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('api/uploads/', views.DirectUploadView.as_view(), name='upload_start'),
+    path('api/uploads/complete/', views.DirectUploadCompleteView.as_view(), name='upload_complete'),
+    path('api/uploads/local/<str:token>/', views.LocalUploadView.as_view(), name='upload_local'),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Media on this host goes through MediaView, which authorizes the request and
+# leaves sending the bytes to the front proxy (MEDIA_DELIVERY)
+if settings.MEDIA_URL.startswith('/'):
+    urlpatterns.append(re_path(
+        rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<name>.+)$', views.MediaView.as_view(), name='media',
+    ))
\ No newline at end of file